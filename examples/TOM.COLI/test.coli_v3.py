@@ -1,8 +1,19 @@
 import sys, os
 import argparse
+import asyncio
 import time
-from openai import OpenAI
+import openai
+from openai import OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletion
 import concurrent.futures
+import hashlib
+import importlib
+import itertools
+import json
+import queue
+import re
+import sqlite3
+import urllib.request
 from datetime import datetime
 import threading
 import psutil
@@ -38,35 +49,97 @@ This script processes gene IDs from a specified file and queries a vLLM server r
 
 INPUT FORMAT:
 The input file should have genome_id as the first column (tab-separated), followed by gene information:
-    genome_id\tgene_data
+    genome_id\torganism\tgene_data
 
 For example:
-    1\tb1325\tECK1321\tycjG\tL-Ala-D/L-Glu epimerase
-    1\tb0787\tECK0776\tybhM\tBax1-I family protein
-    2\tb2543\tECK2540\typhA\tputative inner membrane protein
+    1\tEscherichia coli\tb1325\tECK1321\tycjG\tL-Ala-D/L-Glu epimerase
+    1\tEscherichia coli\tb0787\tECK0776\tybhM\tBax1-I family protein
+    2\tEscherichia coli\tb2543\tECK2540\typhA\tputative inner membrane protein
+
+The column after genome_id is the organism, and the next one is the gene ID
+that identifies the gene in the output and the --resume journal; lines
+without a gene ID are skipped with a warning.
 
 OUTPUT FORMAT:
 Each result line will include the genome_id to allow parsing results by genome.
 
 Operations:
-1. Reads genome_id and gene IDs from a specified input file
-2. Constructs prompts for each gene ID
-3. Processes prompts in configurable batch sizes
-4. Sends batches to the vLLM server via API calls
-5. Handles responses and saves results with genome_id
+1. Reads genome_id and gene IDs from a specified input file, line by line on a
+   reader thread that stays at most --read-ahead prompts ahead of the requests
+2. Constructs prompts for each gene ID as they are read, so the first request
+   goes out immediately and memory stays constant regardless of input size
+3. Keeps --concurrency prompts in flight (window mode, default), refilling each
+   slot as soon as a response arrives; --mode batch instead sends --batch-size
+   prompts and waits for the whole batch before sending the next one
+4. Sends prompts to the vLLM server via API calls, from a thread per request
+   (--engine threads) or from one asyncio event loop sharing a single
+   keep-alive connection pool sized to the concurrency (--engine asyncio)
+5. Routes each request to the backend with the fewest outstanding requests
+   when several vLLM servers are given (comma-separated hosts, --hostfile, or
+   discovered through the Redis service registry with --registry); backends
+   that keep failing are ejected for a while and then re-admitted
+6. Handles responses and saves results with genome_id
+7. Journals each finished (genome_id, gene_id) next to the output file; after
+   an interrupted run (walltime, backend crash), --resume skips the genes that
+   already succeeded, retries only the ERROR rows and appends to the output
+8. With --cache, looks each prompt up in an on-disk response cache shared by
+   all client processes on the node before sending it; requests are
+   deterministic (temperature 0), so a gene seen in an earlier genome or run
+   is answered without generating it again
+9. Reports throughput and how full the request slots (and, with
+   --metrics-interval, the server's running queue) were kept
 
 ''')
 
 parser.add_argument('file', help='File containing genome_id and gene IDs (tab-separated)')
-parser.add_argument('host', help='Hostname of the vLLM server')
+parser.add_argument('host', nargs='?',
+                   help='Hostname of the vLLM server, or a comma-separated list of HOST[:PORT] backends')
 parser.add_argument('--batch-size', type=int, default=64, help='Number of prompts to send in a batch (default: 64)')
-parser.add_argument('--timeout', type=int, default=60, help='Timeout in seconds for API calls (default: 60)')
+parser.add_argument('--timeout', type=float, default=60,
+                   help='Timeout in seconds for each API call; a timed-out call counts as a backend '
+                        'failure and is retried on another backend (default: 60)')
 parser.add_argument('--model', default='meta-llama/Llama-3.1-70B-Instruct', help='Model name to use (default: meta-llama/Llama-3.1-70B-Instruct)')
 parser.add_argument('--port', default='8000', help='Port number for the vLLM server (default: 8000)')
 parser.add_argument('--key', default='EMPTY', help='API key for authentication (default: EMPTY)')
 parser.add_argument('--output', help='Output file for results (default: stdout)')
 parser.add_argument('--output-format', choices=['text', 'tsv', 'json'], default='json', 
                    help='Output format: text (default), tsv, or json')
+parser.add_argument('--mode', choices=['window', 'batch'], default='window',
+                   help='window: keep --concurrency requests in flight at all times (default); '
+                        'batch: send --batch-size prompts and wait for all of them before the next batch')
+parser.add_argument('--concurrency', type=int,
+                   help='Requests kept in flight in window mode (default: --batch-size)')
+parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads',
+                   help='threads: one blocking thread per in-flight request (default); asyncio: one event '
+                        'loop and one pooled connection per in-flight request, for hundreds to thousands '
+                        'of concurrent requests per process')
+parser.add_argument('--hostfile', help='File with one vLLM HOST[:PORT] backend per line')
+parser.add_argument('--registry', metavar='REDIS_HOST[:PORT]',
+                   help='Discover healthy backends from the Redis service registry')
+parser.add_argument('--service-type', default='vllm-inference',
+                   help='Registry service type of the backends (default: vllm-inference)')
+parser.add_argument('--registry-refresh', type=float, default=30,
+                   help='Seconds between registry lookups for joining or leaving backends (default: 30)')
+parser.add_argument('--eject-after', type=int, default=3,
+                   help='Consecutive failures before a backend is ejected (default: 3)')
+parser.add_argument('--eject-seconds', type=float, default=30,
+                   help='Seconds a backend stays ejected; doubles on each repeated ejection (default: 30)')
+parser.add_argument('--journal',
+                   help='Append-only log of finished genes used by --resume (default: OUTPUT.journal)')
+parser.add_argument('--resume', action='store_true',
+                   help='Skip genes the journal records as succeeded and append to --output '
+                        'instead of overwriting it; rows that ended in ERROR are retried, and their '
+                        'new row is appended after the old one')
+parser.add_argument('--cache', metavar='PATH',
+                   help='SQLite response cache on a local disk, shared by client processes on this node '
+                        '(default: off)')
+parser.add_argument('--cache-size', type=float, default=1024,
+                   help='Cache size limit in MB; least recently used responses are evicted (default: 1024)')
+parser.add_argument('--read-ahead', type=int,
+                   help='Prompts read and built ahead of the requests (default: twice the request slots)')
+parser.add_argument('--metrics-interval', type=float, default=0,
+                   help='Sample vllm:num_requests_running from the server /metrics endpoint every '
+                        'this many seconds and report the mean backend occupancy (default: off)')
 
 args = parser.parse_args()
 
@@ -79,19 +152,221 @@ port = args.port
 key = args.key
 output_file = args.output
 output_format = args.output_format
+mode = args.mode
+engine = args.engine
+concurrency = args.concurrency or batch_size
+slots = concurrency if mode == 'window' else batch_size
+read_ahead = args.read_ahead or 2 * slots
+
+if not (host or args.hostfile or args.registry):
+    parser.error('give a host, --hostfile or --registry')
+if (args.resume or args.journal) and not output_file:
+    parser.error('--resume and --journal need --output')
+journal_file = args.journal or (output_file + '.journal' if output_file else None)
+
+class Backend:
+    """One vLLM server and its routing state."""
+
+    def __init__(self, address, max_retries):
+        self.address = address
+        self.base_url = f"http://{address}/v1"
+        self.max_retries = max_retries
+        self.client = OpenAI(api_key=key, base_url=self.base_url, max_retries=max_retries,
+                             timeout=timeout)
+        self.async_client = None
+        self.active = True
+        self.outstanding = 0
+        self.sent = 0
+        self.completed = 0
+        self.errors = 0
+        self.failures = 0
+        self.ejections = 0
+        self.times_ejected = 0
+        self.ejected_until = 0.0
+
+    def get_async_client(self, slots):
+        """AsyncOpenAI client with a keep-alive pool of `slots` connections, created on first use."""
+        if self.async_client is None:
+            # Only the asyncio engine needs these: the pool limits come from the
+            # HTTP package the installed openai SDK is built on (httpx or a fork)
+            from openai import DefaultAsyncHttpxClient
+            http = importlib.import_module(DefaultAsyncHttpxClient.__bases__[0].__module__.split('.')[0])
+            limits = http.Limits(max_connections=slots, max_keepalive_connections=slots)
+            self.async_client = AsyncOpenAI(api_key=key, base_url=self.base_url,
+                                            max_retries=self.max_retries, timeout=timeout,
+                                            http_client=DefaultAsyncHttpxClient(limits=limits))
+        return self.async_client
+
+class BackendPool:
+    """Least-outstanding-requests routing over a changing set of backends.
+
+    A backend failing eject_after requests in a row is skipped for
+    eject_seconds (doubling on each repeated ejection). After that it is on
+    probation: it gets one request at a time until one succeeds, which
+    re-admits it fully, or fails, which ejects it again. If every backend is
+    ejected, the one due back first is still used so no request waits.
+    """
+
+    def __init__(self, eject_after, eject_seconds, max_retries):
+        self.lock = threading.Lock()
+        self.backends = {}
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        # Client-level retries; with several backends a failed request is
+        # retried on another backend instead
+        self.max_retries = max_retries
+
+    def sync(self, addresses):
+        """Make the routable backends exactly these HOST:PORT addresses."""
+        addresses = list(dict.fromkeys(addresses))
+        with self.lock:
+            for address in addresses:
+                backend = self.backends.get(address)
+                if backend is None:
+                    self.backends[address] = Backend(address, self.max_retries)
+                    print_with_timestamp(f"Backend added: {address}")
+                elif not backend.active:
+                    backend.active = True
+                    print_with_timestamp(f"Backend rejoined: {address}")
+            for address, backend in self.backends.items():
+                if backend.active and address not in addresses:
+                    # Requests already sent to it finish normally
+                    backend.active = False
+                    print_with_timestamp(f"Backend removed: {address}")
+
+    def active(self):
+        with self.lock:
+            return [backend for backend in self.backends.values() if backend.active]
+
+    def acquire(self, exclude=None):
+        """Pick the active backend with the fewest outstanding requests, or None.
+
+        exclude (a backend that just failed) is only picked if nothing else is active.
+        """
+        with self.lock:
+            now = time.time()
+            active = [backend for backend in self.backends.values() if backend.active]
+            if len(active) > 1:
+                active = [backend for backend in active if backend is not exclude]
+            candidates = [backend for backend in active
+                          if backend.ejected_until <= now and
+                          (not backend.ejections or backend.outstanding == 0)]
+            if not candidates:
+                if not active:
+                    return None
+                candidates = [min(active, key=lambda backend: backend.ejected_until)]
+            backend = min(candidates, key=lambda backend: (backend.outstanding, backend.sent))
+            backend.outstanding += 1
+            backend.sent += 1
+            return backend
+
+    def release(self, backend, ok):
+        """Record the outcome of a request sent to backend."""
+        with self.lock:
+            backend.outstanding -= 1
+            if ok:
+                if backend.ejections:
+                    print_with_timestamp(f"Backend re-admitted: {backend.address}")
+                backend.completed += 1
+                backend.failures = 0
+                backend.ejections = 0
+                return
+            backend.errors += 1
+            backend.failures += 1
+            now = time.time()
+            if backend.failures >= self.eject_after and backend.ejected_until <= now:
+                backend.ejections += 1
+                backend.times_ejected += 1
+                seconds = self.eject_seconds * 2 ** (backend.ejections - 1)
+                backend.ejected_until = now + seconds
+                print_with_timestamp(f"Backend ejected for {seconds:.0f}s after {backend.failures} "
+                                     f"consecutive failures: {backend.address}")
+
+def parse_backends(text):
+    """HOST[:PORT] entries from a comma- or newline-separated string; --port is the default port."""
+    addresses = []
+    for entry in re.split(r'[,\s]+', text.strip()):
+        if entry and not entry.startswith('#'):
+            addresses.append(entry if ':' in entry else f"{entry}:{port}")
+    return addresses
+
+def registry_backends(registry):
+    """HOST:PORT of every healthy registered backend."""
+    return [f"{service.host}:{service.port}"
+            for service in registry.get_healthy_services(service_type=args.service_type)]
+
+class RegistryWatcher(threading.Thread):
+    """Keeps the backend pool in step with the registry's healthy services."""
+
+    def __init__(self, registry, pool, interval):
+        super().__init__(name='registry-watcher', daemon=True)
+        self.registry = registry
+        self.pool = pool
+        self.interval = interval
+        self.stop_event = threading.Event()
 
-openai_api_base = f"http://{host}:{port}/v1"
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            addresses = registry_backends(self.registry)
+            if addresses:
+                self.pool.sync(static_backends + addresses)
+            else:
+                print_with_timestamp("Warning: registry returned no healthy backends, keeping current ones")
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+static_backends = parse_backends(host or '')
+if args.hostfile:
+    with open(args.hostfile, 'r', encoding='utf-8') as f:
+        static_backends += parse_backends(f.read())
+single_backend = len(set(static_backends)) == 1 and not args.registry
+pool = BackendPool(args.eject_after, args.eject_seconds,
+                   max_retries=openai.DEFAULT_MAX_RETRIES if single_backend else 0)
 
-client = OpenAI(
-    api_key=key,
-    base_url=openai_api_base,
-)
+registry_watcher = None
+if args.registry:
+    # The registry client lives in the repository's redis/ directory
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'redis'))
+    from service_registry import ServiceRegistry
+    registry_host, _, registry_port = args.registry.partition(':')
+    registry = ServiceRegistry(redis_host=registry_host, redis_port=int(registry_port or 6379))
+    discovered = registry_backends(registry)
+    while not discovered and not static_backends:
+        print_with_timestamp(f"Waiting for healthy {args.service_type} backends in the registry...")
+        time.sleep(args.registry_refresh)
+        discovered = registry_backends(registry)
+    pool.sync(static_backends + discovered)
+    registry_watcher = RegistryWatcher(registry, pool, args.registry_refresh)
+    registry_watcher.start()
+else:
+    pool.sync(static_backends)
+
+if not pool.active():
+    print_with_timestamp("Error: no backends to send requests to")
+    sys.exit(1)
 
 # Open output file if specified
+def open_for_append(path):
+    """Open a file for appending, first ending a line torn by an earlier crash."""
+    handle = open(path, 'a+', encoding='utf-8')
+    if handle.tell() > 0:
+        handle.seek(handle.tell() - 1)
+        if handle.read(1) != '\n':
+            handle.write('\n')
+    return handle
+
 output_handle = None
+resume_output = False
 if output_file:
-    output_handle = open(output_file, 'w', encoding='utf-8')
-    print_with_timestamp(f"Writing output to {output_file}")
+    if args.resume:
+        output_handle = open_for_append(output_file)
+        resume_output = output_handle.tell() > 0
+        print_with_timestamp(f"Appending output to {output_file}")
+    else:
+        output_handle = open(output_file, 'w', encoding='utf-8')
+        print_with_timestamp(f"Writing output to {output_file}")
 
 def write_output(message):
     """Write to output file or stdout."""
@@ -101,153 +376,756 @@ def write_output(message):
     else:
         print(message)
 
-def call_model(prompts):
-    """Call the model with a list of prompts without timeout."""
-    def process_single_prompt(prompt):
+class Journal:
+    """Append-only log of finished genes, keyed by (genome_id, gene_id).
+
+    Each line is one JSON record. A record is written only after its result
+    has been flushed to the output file, so the journal never claims a
+    result the output does not have; a record torn by a crash is ignored.
+    On --resume the succeeded keys are loaded into a set of 16-byte digests,
+    which keeps the index small for millions of genes. Files are fsynced at
+    most once per SYNC_INTERVAL seconds.
+    """
+
+    SYNC_INTERVAL = 1.0
+
+    def __init__(self, path, resume):
+        self.path = path
+        self.completed = set()
+        self.skipped = 0
+        if resume:
+            self._load()
+            self.handle = open_for_append(path)
+        else:
+            self.handle = open(path, 'w', encoding='utf-8')
+        self.last_sync = time.time()
+
+    @staticmethod
+    def key(genome_id, gene_id):
+        return hashlib.blake2b(f"{genome_id}\t{gene_id}".encode('utf-8'), digest_size=16).digest()
+
+    def _load(self):
         try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.0,
-                max_tokens=1024,
-                stream=False
-            )
-            return response
+            file = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        records = 0
+        with file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records += 1
+                if record.get('status') == 'SUCCESS':
+                    self.completed.add(self.key(record['genome_id'], record['gene_id']))
+        print_with_timestamp(f"Journal {self.path}: {len(self.completed)} genes already succeeded "
+                             f"({records} records)")
+
+    def is_completed(self, genome_id, gene_id):
+        return self.key(genome_id, gene_id) in self.completed
+
+    def record(self, genome_id, gene_id, ok):
+        """Journal one result; call after it has been written to the output."""
+        self.handle.write(json.dumps({
+            'genome_id': genome_id,
+            'gene_id': gene_id,
+            'status': 'SUCCESS' if ok else 'ERROR'
+        }) + "\n")
+        self.handle.flush()
+        if time.time() - self.last_sync >= self.SYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        # Output first, so a synced record always has its result on disk
+        if output_handle:
+            os.fsync(output_handle.fileno())
+        os.fsync(self.handle.fileno())
+        self.last_sync = time.time()
+
+    def close(self):
+        self.sync()
+        self.handle.close()
+
+journal = None
+if journal_file:
+    journal = Journal(journal_file, args.resume)
+
+class ResponseCache:
+    """On-disk cache of responses to deterministic requests, shared across processes.
+
+    Entries are keyed by a SHA-256 of the full request arguments (model,
+    messages and sampling parameters), so a prompt sent with different
+    settings never hits another setting's entry. Only temperature 0 requests
+    are cached. SQLite in WAL mode lets every client process on the node
+    read while one writes; triggers keep a running byte total, so the size
+    cap is checked without scanning the table. Cache errors are reported and
+    treated as misses, never as failed prompts.
+
+    Requests never wait for a write lock: lookups only read, and stores,
+    last-use updates and eviction are queued to one writer thread with its
+    own connection. The writer checks the cap at most every EVICT_INTERVAL
+    seconds (and once more in stop()) and deletes the least recently used
+    entries down to 90% of it, so the cache can briefly run over the cap.
+    The asyncio engine looks entries up with get_async(), which runs on the
+    cache's own thread instead of the event loop.
+    """
+
+    # Hits refresh an entry's last use at most this often, to keep reads cheap
+    TOUCH_INTERVAL = 60.0
+    EVICT_INTERVAL = 10.0
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = self.connect()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            BEGIN;
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, response TEXT NOT NULL,
+                size INTEGER NOT NULL, last_used REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+            CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+            INSERT OR IGNORE INTO stats VALUES (0, 0);
+            CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses
+                BEGIN UPDATE stats SET bytes = bytes + NEW.size; END;
+            CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses
+                BEGIN UPDATE stats SET bytes = bytes - OLD.size; END;
+            COMMIT;
+        """)
+        # Lookups share self.db under self.lock, so one thread is enough
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                              thread_name_prefix='response-cache')
+        # write_db is only used from the writer thread
+        self.write_db = self.connect()
+        self.writer = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                            thread_name_prefix='response-cache-writer')
+        self.last_evict = 0.0
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+
+    @staticmethod
+    def key(request):
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, request):
+        """Return the cached ChatCompletion for a request, or None."""
+        if request.get('temperature') != 0:
+            return None
+        key = self.key(request)
+        try:
+            with self.lock:
+                row = self.db.execute("SELECT response, last_used FROM responses WHERE key = ?",
+                                      (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self.hits += 1
+            now = time.time()
+            if now - row[1] >= self.TOUCH_INTERVAL:
+                self.writer.submit(self._write, "UPDATE responses SET last_used = ? WHERE key = ?",
+                                   (now, key))
+            return ChatCompletion.model_validate_json(row[0])
+        except Exception as e:
+            print_with_timestamp(f"Warning: response cache lookup failed: {e}")
+            return None
+
+    async def get_async(self, request):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.get, request)
+
+    def put(self, request, response):
+        """Queue a successful response to a deterministic request for the writer thread."""
+        if request.get('temperature') != 0:
+            return
+        text = response.model_dump_json()
+        self.writer.submit(self._write, "INSERT OR IGNORE INTO responses VALUES (?, ?, ?, ?)",
+                           (self.key(request), text, len(text), time.time()))
+
+    def _write(self, statement, parameters):
+        """Writer thread: run one statement, then evict if it is time to check the cap."""
+        try:
+            self.write_db.execute(statement, parameters)
+        except Exception as e:
+            print_with_timestamp(f"Warning: response cache store failed: {e}")
+        if time.time() - self.last_evict >= self.EVICT_INTERVAL:
+            self.evict()
+
+    def evict(self):
+        """Writer thread: delete least recently used entries, if over the cap, down to 90% of it.
+
+        Each chunk of deletions is its own short transaction, so other
+        processes' stores are never held up for a whole sweep.
+        """
+        self.last_evict = time.time()
+        db = self.write_db
+        limit = self.max_bytes
+        target = int(self.max_bytes * 0.9)
+        try:
+            while True:
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    total = db.execute("SELECT bytes FROM stats").fetchone()[0]
+                    evicted = []
+                    if total > limit:
+                        rows = db.execute("SELECT key, size FROM responses "
+                                          "ORDER BY last_used LIMIT 1000").fetchall()
+                        for key, size in rows:
+                            if total <= target:
+                                break
+                            evicted.append((key,))
+                            total -= size
+                        db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+                    db.execute("COMMIT")
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+                if not evicted:
+                    return
+                limit = target
         except Exception as e:
-            print_with_timestamp(f"Error calling model for prompt: {e}")
-            # Try one more time before giving up
+            print_with_timestamp(f"Warning: response cache eviction failed: {e}")
+
+    def stop(self):
+        """Finish queued writes and bring the cache within its cap."""
+        self.executor.shutdown()
+        self.writer.submit(self.evict)
+        self.writer.shutdown()
+
+    def summary(self):
+        with self.lock:
+            entries, size = self.db.execute("SELECT COUNT(*), (SELECT bytes FROM stats) FROM responses").fetchone()
+        return entries, size
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+        self.write_db.close()
+
+cache = None
+if args.cache:
+    cache = ResponseCache(args.cache, int(args.cache_size * 2**20))
+    print_with_timestamp(f"Using response cache {args.cache}")
+
+class InFlightTracker:
+    """Time-weighted count of requests in flight, used to report slot occupancy."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.started = time.time()
+        self.last_change = self.started
+        self.area = 0.0
+
+    def _advance(self, delta):
+        with self.lock:
+            now = time.time()
+            self.area += self.in_flight * (now - self.last_change)
+            self.last_change = now
+            self.in_flight += delta
+
+    def start(self):
+        self._advance(1)
+
+    def finish(self):
+        self._advance(-1)
+
+    def mean_in_flight(self):
+        """Average number of requests in flight since the tracker was created."""
+        self._advance(0)
+        elapsed = self.last_change - self.started
+        return self.area / elapsed if elapsed > 0 else 0.0
+
+class MetricsSampler(threading.Thread):
+    """Samples vllm:num_requests_running, summed over the backends' Prometheus endpoints."""
+
+    RUNNING = re.compile(r'^vllm:num_requests_running(?:\{[^}]*\})?\s+([0-9.eE+-]+)', re.M)
+
+    def __init__(self, urls, interval):
+        super().__init__(name='metrics-sampler', daemon=True)
+        self.urls = urls
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            running = 0.0
+            for url in self.urls():
+                try:
+                    with urllib.request.urlopen(url, timeout=self.interval) as response:
+                        text = response.read().decode('utf-8', 'replace')
+                    running += sum(float(v) for v in self.RUNNING.findall(text))
+                except Exception as e:
+                    print_with_timestamp(f"Warning: could not sample {url}: {e}")
+            self.samples.append(running)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    def mean_running(self):
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+def completion_request(prompt):
+    """Chat completion arguments for one prompt."""
+    return dict(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.0,
+        max_tokens=1024,
+        stream=False
+    )
+
+def process_single_prompt(prompt):
+    """Send one prompt, retrying once (possibly on another backend); returns the response or None."""
+    request = completion_request(prompt)
+    if cache:
+        response = cache.get(request)
+        if response is not None:
+            return response
+    tracker.start()
+    try:
+        backend = None
+        for attempt in range(2):
+            backend = pool.acquire(exclude=backend)
+            if backend is None:
+                print_with_timestamp("Error: no backends available")
+                return None
             try:
-                print_with_timestamp(f"Retrying prompt...")
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.0,
-                    max_tokens=1024,
-                    stream=False
-                )
+                response = backend.client.chat.completions.create(**request)
+                pool.release(backend, True)
+                if cache:
+                    cache.put(request, response)
                 return response
-            except Exception as e2:
-                print_with_timestamp(f"Error on retry attempt: {e2}")
+            except Exception as e:
+                pool.release(backend, False)
+                if attempt == 0:
+                    print_with_timestamp(f"Error calling model on {backend.address} for prompt: {e}")
+                    # Try one more time before giving up
+                    print_with_timestamp(f"Retrying prompt...")
+                else:
+                    print_with_timestamp(f"Error on retry attempt on {backend.address}: {e}")
+        return None
+    finally:
+        tracker.finish()
+
+async def process_single_prompt_async(prompt, slots):
+    """asyncio version of process_single_prompt."""
+    request = completion_request(prompt)
+    if cache:
+        response = await cache.get_async(request)
+        if response is not None:
+            return response
+    tracker.start()
+    try:
+        backend = None
+        for attempt in range(2):
+            backend = pool.acquire(exclude=backend)
+            if backend is None:
+                print_with_timestamp("Error: no backends available")
                 return None
+            try:
+                response = await backend.get_async_client(slots).chat.completions.create(**request)
+                pool.release(backend, True)
+                if cache:
+                    cache.put(request, response)
+                return response
+            except Exception as e:
+                pool.release(backend, False)
+                if attempt == 0:
+                    print_with_timestamp(f"Error calling model on {backend.address} for prompt: {e}")
+                    # Try one more time before giving up
+                    print_with_timestamp(f"Retrying prompt...")
+                else:
+                    print_with_timestamp(f"Error on retry attempt on {backend.address}: {e}")
+        return None
+    finally:
+        tracker.finish()
 
+def call_model(prompts):
+    """Call the model with a list of prompts; responses are returned in prompt order."""
     print_with_timestamp(f"Sending {len(prompts)} prompts to the model {model}...")
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    # One worker per prompt, so the whole batch is really in flight at once
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(prompts)) as executor:
         # Submit all prompts to be processed in parallel
-        future_to_prompt = {executor.submit(process_single_prompt, prompt): prompt for prompt in prompts}
+        future_to_index = {executor.submit(process_single_prompt, prompt): i
+                           for i, prompt in enumerate(prompts)}
         info = get_thread_info()
         print(f"Active threads after call to executor: {info['active_count']} threads")
-        responses = []
-        for future in concurrent.futures.as_completed(future_to_prompt):
-            response = future.result()
-            responses.append(response)
+        responses = [None] * len(prompts)
+        for future in concurrent.futures.as_completed(future_to_index):
+            responses[future_to_index[future]] = future.result()
     
     print_with_timestamp(f'Received {len(responses)} responses')
     return responses
 
-def call_model_with_timeout(prompts, timeout_seconds):
-    # Implementation of call_model_with_timeout function
-    pass
-
-# Collect all prompts from files
-all_prompts = []
-all_gene_ids = []
-all_genome_ids = []
-
-# Read gene IDs with genome identifiers
-print_with_timestamp(f"Reading input file: {file_path}")
-line_count = 0
-with open(file_path, "r", encoding="utf-8") as file:
-    for line in file:
-        line = line.strip()
-        if not line:
-            continue
-        
-        line_count += 1
-        # Split line into genome_id and gene data
-        parts = line.split('\t', 1)
-        if len(parts) < 2:
-            print_with_timestamp(f"Warning: Line {line_count} does not have genome_id separator, skipping: {line[:50]}...")
-            continue
-        
-        genome_id = parts[0]
-        organism = parts[1]
-        gene_data = '\t'.join(parts[2:])
-        
-        # Construct prompt
-        prompt = (
-            "Please tell me (using the knowledge you have been trained on) what you know about this bacterial gene in "
-            + organism
-            + " whose various IDs are given here, though they all refer to the same gene: "
-            + gene_data
-            + ". In particular, we want to know the following information: Is this gene well studied or is it hypothetical with unknown function? "
-            "Is the gene essential for survival? Is the gene or gene product a good antibacterial drug target? What other genes does this gene interact with? "
-            "Is this gene part of an operon (cluster of genes on the chromosome that work together to carry out complex functions)? "
-            "Is this gene involved in transcriptional regulation? Is it known what gene regulates this gene's expression? "
-            "Does this gene also occur in other bacteria? If you were starting out as a research microbiologist, what might be a hypothesis you could explore related to this protein that would have significant scientific impact? "
-            "Where possible, give concise answers to these questions as well as describe the function of the gene more generally if it is known."
-        )
-        all_prompts.append(prompt)
-        all_gene_ids.append(gene_data)
-        all_genome_ids.append(genome_id)
-
-print_with_timestamp(f"Loaded {len(all_prompts)} prompts from {line_count} lines")
-
-# Write header for TSV format
-if output_format == 'tsv':
-    write_output("genome_id\tgene_id\tresponse\tstatus")
+def batches(items):
+    """Split an iterable of items into lists of at most batch_size, reading lazily."""
+    items = iter(items)
+    for batch_number in itertools.count(1):
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            return
+        print_with_timestamp(f"Processing batch {batch_number}")
+        yield batch
 
-# Process prompts in batches
-for i in range(0, len(all_prompts), batch_size):
-    batch_prompts = all_prompts[i:i+batch_size]
-    batch_gene_ids = all_gene_ids[i:i+batch_size]
-    batch_genome_ids = all_genome_ids[i:i+batch_size]
-    
-    print_with_timestamp(f"Processing batch {i//batch_size + 1} of {(len(all_prompts) + batch_size - 1)//batch_size}")
-    
-    # Call the model with the batch of prompts
-    responses = call_model(batch_prompts)
-    
-    for j, response in enumerate(responses):
-        genome_id = batch_genome_ids[j]
-        gene_id = batch_gene_ids[j]
-        
-        if response is None:
-            print_with_timestamp(f"ERROR: Return Type is None for Genome: {genome_id}, Gene ID: {gene_id}")
-            if output_format == 'tsv':
-                write_output(f"{genome_id}\t{gene_id}\t\tERROR")
-            elif output_format == 'json':
-                import json
-                write_output(json.dumps({
-                    'genome_id': genome_id,
-                    'gene_id': gene_id,
-                    'response': None,
-                    'status': 'ERROR'
-                }))
-            else:
-                write_output(f"[GENOME: {genome_id}] [GENE: {gene_id}] ERROR: No response")
+def call_model_batches(items):
+    """Barrier mode: send batch_size items, wait for all of them, repeat.
+
+    Yields (item, response) pairs; items are (prompt, genome_id, gene_id) tuples.
+    """
+    for batch in batches(items):
+        responses = call_model([prompt for prompt, _, _ in batch])
+        yield from zip(batch, responses)
+
+def call_model_window(items):
+    """Window mode: keep `concurrency` requests in flight at all times.
+
+    Each slot is refilled as soon as its response arrives, so one slow
+    generation never idles the other slots. Yields (item, response) pairs in
+    completion order; items are (prompt, genome_id, gene_id) tuples.
+    """
+    print_with_timestamp(f"Sending prompts to the model {model} "
+                         f"with {concurrency} requests in flight...")
+    remaining = iter(items)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency,
+                                               thread_name_prefix='window') as executor:
+        pending = {executor.submit(process_single_prompt, item[0]): item
+                   for item in itertools.islice(remaining, concurrency)}
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                for next_item in itertools.islice(remaining, 1):
+                    pending[executor.submit(process_single_prompt, next_item[0])] = next_item
+                yield item, future.result()
+
+async def run_async_engine(items, results):
+    """Send all items (a ReadAhead) from one event loop, putting (item, response) pairs on results.
+
+    Each backend has one long-lived AsyncOpenAI client whose keep-alive
+    connection pool is sized to the number of slots, shared by every request
+    routed to it. In window mode `concurrency` workers pull from the shared
+    read-ahead queue, so each slot is refilled as soon as its response arrives; in
+    batch mode each batch is gathered in turn.
+
+    Items are taken with ReadAhead.get_async() and results is bounded: when
+    the reader or the writer falls behind, workers wait on a thread of the
+    read-ahead or of the results hand-off instead of blocking the event
+    loop, and responses are never buffered without limit. Each direction
+    has its own thread, so neither ties up the loop's default executor.
+    """
+    loop = asyncio.get_running_loop()
+    # The writer drains results in order, so one waiting thread is enough
+    hand_off = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='results-put')
+
+    async def emit(result):
+        try:
+            results.put_nowait(result)
+        except queue.Full:
+            await loop.run_in_executor(hand_off, results.put, result)
+
+    try:
+        if mode == 'window':
+            print_with_timestamp(f"Sending prompts to the model {model} "
+                                 f"with {concurrency} requests in flight (asyncio)...")
+
+            async def worker():
+                while True:
+                    item = await items.get_async()
+                    if item is ReadAhead.finished:
+                        return
+                    await emit((item, await process_single_prompt_async(item[0], slots)))
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        else:
+            for batch_number in itertools.count(1):
+                batch = []
+                while len(batch) < batch_size:
+                    item = await items.get_async()
+                    if item is ReadAhead.finished:
+                        break
+                    batch.append(item)
+                if not batch:
+                    break
+                print_with_timestamp(f"Processing batch {batch_number}")
+                responses = await asyncio.gather(
+                    *(process_single_prompt_async(prompt, slots) for prompt, _, _ in batch))
+                for item, response in zip(batch, responses):
+                    await emit((item, response))
+    finally:
+        hand_off.shutdown(wait=False)
+        items.executor.shutdown(wait=False)
+        for backend in list(pool.backends.values()):
+            if backend.async_client is not None:
+                await backend.async_client.close()
+                backend.async_client = None
+
+def call_model_async(items):
+    """asyncio engine: run run_async_engine on a background event loop.
+
+    Yields (item, response) pairs as they complete, so results are written
+    by the main thread exactly as with the thread engine.
+    """
+    results = queue.Queue(maxsize=slots)
+    finished = object()
+
+    def run():
+        try:
+            asyncio.run(run_async_engine(items, results))
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(finished)
+
+    thread = threading.Thread(target=run, name='asyncio-engine', daemon=True)
+    thread.start()
+    while True:
+        result = results.get()
+        if result is finished:
+            break
+        if isinstance(result, BaseException):
+            raise result
+        yield result
+    thread.join()
+
+def write_result(genome_id, gene_id, response):
+    """Write one result in the selected output format; returns True on success."""
+    if response is None:
+        print_with_timestamp(f"ERROR: Return Type is None for Genome: {genome_id}, Gene ID: {gene_id}")
+        if output_format == 'tsv':
+            write_output(f"{genome_id}\t{gene_id}\t\tERROR")
+        elif output_format == 'json':
+            write_output(json.dumps({
+                'genome_id': genome_id,
+                'gene_id': gene_id,
+                'response': None,
+                'status': 'ERROR'
+            }))
         else:
-            response_text = response.choices[0].message.content
+            write_output(f"[GENOME: {genome_id}] [GENE: {gene_id}] ERROR: No response")
+        return False
+
+    response_text = response.choices[0].message.content
+    
+    if output_format == 'tsv':
+        # Escape tabs and newlines in response text for TSV
+        response_text_escaped = response_text.replace('\t', ' ').replace('\n', ' ')
+        write_output(f"{genome_id}\t{gene_id}\t{response_text_escaped}\tSUCCESS")
+    elif output_format == 'json':
+        write_output(json.dumps({
+            'genome_id': genome_id,
+            'gene_id': gene_id,
+            'response': response_text,
+            'status': 'SUCCESS'
+        }))
+    else:
+        write_output(f"[GENOME: {genome_id}] [GENE: {gene_id}]")
+        write_output(response_text)
+        write_output("\n" + "-" * 80 + "\n")
+    return True
+
+class ReadAhead(threading.Thread):
+    """Runs the reader and prompt builder on their own thread.
+
+    Items are handed to the dispatcher through a queue of at most maxsize
+    entries, so reading stays just ahead of the requests: the first request
+    goes out as soon as the first line is parsed, and a large input file is
+    never held in memory. The asyncio engine uses get_async(), which never
+    blocks the event loop while the reader catches up: workers wait on the
+    read-ahead's own thread, one at a time, as the reader produces in order.
+    """
+
+    finished = object()
+
+    def __init__(self, items, maxsize):
+        super().__init__(name='read-ahead', daemon=True)
+        self.items = items
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                              thread_name_prefix='read-ahead-get')
+
+    def run(self):
+        try:
+            for item in self.items:
+                self.queue.put(item)
+            end = self.finished
+        except BaseException as e:
+            end = e
+        self.queue.put(end)
+
+    def get(self, block=True):
+        """Next item, or ReadAhead.finished once the input is exhausted."""
+        item = self.queue.get(block)
+        if item is self.finished or isinstance(item, BaseException):
+            # Leave the end marker for every other consumer; the reader has
+            # stopped, so there is room for it
+            self.queue.put_nowait(item)
+            if isinstance(item, BaseException):
+                raise item
+        return item
+
+    async def get_async(self):
+        """get() for the event loop: waits for the reader on the read-ahead's own thread."""
+        try:
+            return self.get(block=False)
+        except queue.Empty:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.get)
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is self.finished:
+                return
+            yield item
+
+def read_genes(path):
+    """Yield (genome_id, organism, gene_id, gene_data) for each gene line of the input file.
+
+    gene_id is the first ID after the organism; gene_data is every column
+    after the organism (IDs and description) and goes into the prompt.
+    Lines without a gene ID are skipped: (genome_id, gene_id) keys the
+    journal, so they would all share one key and --resume would skip every
+    one of them after the first succeeded.
+    """
+    print_with_timestamp(f"Reading input file: {path}")
+    line_count = gene_count = 0
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
             
-            if output_format == 'tsv':
-                # Escape tabs and newlines in response text for TSV
-                response_text_escaped = response_text.replace('\t', ' ').replace('\n', ' ')
-                write_output(f"{genome_id}\t{gene_id}\t{response_text_escaped}\tSUCCESS")
-            elif output_format == 'json':
-                import json
-                write_output(json.dumps({
-                    'genome_id': genome_id,
-                    'gene_id': gene_id,
-                    'response': response_text,
-                    'status': 'SUCCESS'
-                }))
-            else:
-                write_output(f"[GENOME: {genome_id}] [GENE: {gene_id}]")
-                write_output(response_text)
-                write_output("\n" + "-" * 80 + "\n")
+            line_count += 1
+            # Split line into genome_id, organism and gene data
+            parts = line.split('\t')
+            if len(parts) < 2:
+                print_with_timestamp(f"Warning: Line {line_count} does not have genome_id separator, skipping: {line[:50]}...")
+                continue
+            
+            if len(parts) < 3 or not parts[2].strip():
+                print_with_timestamp(f"Warning: Line {line_count} has no gene ID after the organism, skipping: {line[:50]}...")
+                continue
+            
+            genome_id = parts[0]
+            organism = parts[1]
+            gene_id = parts[2].strip()
+            gene_data = '\t'.join(parts[2:])
+            gene_count += 1
+            yield genome_id, organism, gene_id, gene_data
+
+    print_with_timestamp(f"Read {gene_count} prompts from {line_count} lines")
+
+def build_prompt(organism, gene_data):
+    """Construct the prompt for one gene."""
+    return (
+        "Please tell me (using the knowledge you have been trained on) what you know about this bacterial gene in "
+        + organism
+        + " whose various IDs are given here, though they all refer to the same gene: "
+        + gene_data
+        + ". In particular, we want to know the following information: Is this gene well studied or is it hypothetical with unknown function? "
+        "Is the gene essential for survival? Is the gene or gene product a good antibacterial drug target? What other genes does this gene interact with? "
+        "Is this gene part of an operon (cluster of genes on the chromosome that work together to carry out complex functions)? "
+        "Is this gene involved in transcriptional regulation? Is it known what gene regulates this gene's expression? "
+        "Does this gene also occur in other bacteria? If you were starting out as a research microbiologist, what might be a hypothesis you could explore related to this protein that would have significant scientific impact? "
+        "Where possible, give concise answers to these questions as well as describe the function of the gene more generally if it is known."
+    )
 
-print_with_timestamp(f"Processed {len(all_prompts)} prompts in {(len(all_prompts) + batch_size - 1)//batch_size} batches")
+def skip_completed(genes):
+    """Drop genes the journal records as succeeded (--resume)."""
+    for gene in genes:
+        if journal.is_completed(gene[0], gene[2]):
+            journal.skipped += 1
+            continue
+        yield gene
+
+def build_items(genes):
+    """Yield (prompt, genome_id, gene_id) items for the dispatcher."""
+    for genome_id, organism, gene_id, gene_data in genes:
+        yield build_prompt(organism, gene_data), genome_id, gene_id
+
+# Write header for TSV format (once, when resuming into an existing file)
+if output_format == 'tsv' and not resume_output:
+    write_output("genome_id\tgene_id\tresponse\tstatus")
 
+# Pipeline: reader -> prompt builder (read-ahead thread) -> dispatcher -> writer
+# (this thread). Every stage holds a bounded number of prompts, so memory
+# does not grow with the input file.
+genes = read_genes(file_path)
+if journal and journal.completed:
+    genes = skip_completed(genes)
+items = ReadAhead(build_items(genes), read_ahead)
+items.start()
+
+sampler = None
+if args.metrics_interval > 0:
+    sampler = MetricsSampler(lambda: [f"http://{backend.address}/metrics" for backend in pool.active()],
+                             args.metrics_interval)
+    sampler.start()
+
+start_time = time.time()
+tracker = InFlightTracker()
+succeeded = failed = 0
+if engine == 'asyncio':
+    results = call_model_async(items)
+elif mode == 'window':
+    results = call_model_window(items)
+else:
+    results = call_model_batches(items)
+for (prompt, genome_id, gene_id), response in results:
+    ok = write_result(genome_id, gene_id, response)
+    if journal:
+        journal.record(genome_id, gene_id, ok)
+    if ok:
+        succeeded += 1
+    else:
+        failed += 1
+elapsed = time.time() - start_time
+processed = succeeded + failed
+
+if sampler:
+    sampler.stop()
+if registry_watcher:
+    registry_watcher.stop()
+
+if mode == 'window':
+    print_with_timestamp(f"Processed {processed} prompts with {concurrency} requests in flight")
+else:
+    print_with_timestamp(f"Processed {processed} prompts in {(processed + batch_size - 1)//batch_size} batches")
+
+# Occupancy: how many of the request slots were busy on average. In batch
+# mode slots drain to zero at every barrier; window mode keeps them full.
+mean_in_flight = tracker.mean_in_flight()
+print_with_timestamp(f"Summary: mode={mode} engine={engine} prompts={processed} succeeded={succeeded} failed={failed} "
+                     f"elapsed={elapsed:.1f}s throughput={processed / elapsed if elapsed > 0 else 0:.2f} prompts/s")
+print_with_timestamp(f"Summary: mean in-flight requests {mean_in_flight:.1f} of {slots} "
+                     f"({100 * mean_in_flight / slots:.0f}% slot occupancy)")
+if sampler and sampler.mean_running() is not None:
+    print_with_timestamp(f"Summary: mean backend running requests {sampler.mean_running():.1f} "
+                         f"over {len(sampler.samples)} samples")
+for backend in pool.backends.values():
+    print_with_timestamp(f"Summary: backend {backend.address} completed={backend.completed} "
+                         f"errors={backend.errors} ejections={backend.times_ejected}"
+                         f"{'' if backend.active else ' (removed)'}")
+
+if cache:
+    lookups = cache.hits + cache.misses
+    cache.stop()
+    entries, size = cache.summary()
+    print_with_timestamp(f"Summary: response cache hits={cache.hits} misses={cache.misses} "
+                         f"({100 * cache.hits / lookups if lookups else 0:.0f}% hit rate), "
+                         f"{entries} entries, {size / 2**20:.1f} of {args.cache_size:g} MB")
+    cache.close()
+if journal and journal.skipped:
+    print_with_timestamp(f"Summary: resumed, skipped {journal.skipped} genes that already succeeded")
+if journal:
+    journal.close()
 if output_handle:
     output_handle.close()
     print_with_timestamp(f"Output written to {output_file}")
-
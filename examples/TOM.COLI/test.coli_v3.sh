@@ -2,6 +2,19 @@
 
 # Shell script to run test.coli_v3.py across multiple nodes in parallel
 # This version works with the split chunk files that have genome_id as first column
+#
+# Every test.coli_v3.py process sends its requests to all hosts in the hostfile
+# (least outstanding requests first), so a slow node no longer holds back the
+# chunks assigned to it. Set REGISTRY=redis_host[:port] to discover healthy
+# vLLM backends from the Redis service registry instead of the hostfile.
+# MAX_PROCS limits how many chunk processes run at once (default: number of hosts).
+#
+# Chunks run with --resume, so resubmitting the job after it hits walltime only
+# sends the genes that have not succeeded yet (see each chunk's .journal file).
+#
+# Chunk processes share one response cache, so a gene that occurs in several
+# genomes is generated once. Keep it on a local disk (SQLite locking is not
+# reliable on network filesystems); set RESPONSE_CACHE= to turn it off.
 
 # Enable debug output
 set -x
@@ -14,14 +27,16 @@ echo "Script directory: $SCRIPT_DIR"
 echo "Hostfile path: $HOSTFILE"
 
 # Check if hostfile exists and has content
-if [ ! -f "$HOSTFILE" ]; then
-    echo "Error: hostfile not found at $HOSTFILE"
-    exit 1
-fi
+if [ -z "$REGISTRY" ]; then
+    if [ ! -f "$HOSTFILE" ]; then
+        echo "Error: hostfile not found at $HOSTFILE"
+        exit 1
+    fi
 
-if [ ! -s "$HOSTFILE" ]; then
-    echo "Error: hostfile is empty at $HOSTFILE"
-    exit 1
+    if [ ! -s "$HOSTFILE" ]; then
+        echo "Error: hostfile is empty at $HOSTFILE"
+        exit 1
+    fi
 fi
 
 # Check if test.coli_v3.py exists
@@ -61,50 +76,59 @@ OUTPUT_FORMAT="${OUTPUT_FORMAT:-tsv}"
 
 echo "Using output format: $OUTPUT_FORMAT"
 
-# Read all hosts into an array
-mapfile -t HOSTS < "$HOSTFILE"
-NUM_HOSTS=${#HOSTS[@]}
+if [ -n "$REGISTRY" ]; then
+    BACKEND_ARGS=(--registry "$REGISTRY")
+    NUM_HOSTS=${MAX_PROCS:-1}
+    echo "Discovering backends from the service registry at $REGISTRY"
+else
+    BACKEND_ARGS=(--hostfile "$HOSTFILE")
 
-if [ $NUM_HOSTS -eq 0 ]; then
-    echo "Error: No hosts found in hostfile"
-    exit 1
+    # Read all hosts into an array
+    mapfile -t HOSTS < "$HOSTFILE"
+    NUM_HOSTS=${#HOSTS[@]}
+
+    if [ $NUM_HOSTS -eq 0 ]; then
+        echo "Error: No hosts found in hostfile"
+        exit 1
+    fi
+
+    echo "Found $NUM_HOSTS hosts"
 fi
+MAX_PROCS=${MAX_PROCS:-$NUM_HOSTS}
 
-echo "Found $NUM_HOSTS hosts"
+RESPONSE_CACHE=${RESPONSE_CACHE-${TMPDIR:-/tmp}/test.coli_v3.cache.sqlite}
+CACHE_ARGS=()
+if [ -n "$RESPONSE_CACHE" ]; then
+    CACHE_ARGS=(--cache "$RESPONSE_CACHE")
+    echo "Using response cache $RESPONSE_CACHE"
+fi
 
-# Process chunks in batches of NUM_HOSTS
-chunk_idx=0
+# Keep MAX_PROCS chunk processes running, starting the next chunk as soon as one finishes
 for chunk_file in "${CHUNK_FILES[@]}"; do
-    # Determine which host to use (round-robin)
-    host_idx=$((chunk_idx % NUM_HOSTS))
-    host=${HOSTS[$host_idx]}
-    
+    while [ "$(jobs -rp | wc -l)" -ge "$MAX_PROCS" ]; do
+        wait -n
+    done
+
     # Extract chunk name for output file
     chunk_name=$(basename "$chunk_file" .txt)
     output_file="$OUTPUT_DIR/${chunk_name}_output.${OUTPUT_FORMAT}"
     log_file="$OUTPUT_DIR/${chunk_name}.log"
     
-    echo "Processing $chunk_name on host $host"
+    echo "Processing $chunk_name"
     
     # Run test.coli_v3.py with the chunk file
     python "$SCRIPT_DIR/test.coli_v3.py" \
         "$chunk_file" \
-        "$host" \
+        "${BACKEND_ARGS[@]}" \
         --output "$output_file" \
         --output-format "$OUTPUT_FORMAT" \
-        2>&1 > "$log_file" &
-    
-    chunk_idx=$((chunk_idx + 1))
-    
-    # If we've launched NUM_HOSTS processes, wait for them to complete
-    if [ $((chunk_idx % NUM_HOSTS)) -eq 0 ]; then
-        echo "Waiting for batch to complete..."
-        wait
-    fi
+        --resume \
+        "${CACHE_ARGS[@]}" \
+        > "$log_file" 2>&1 &
 done
 
 # Wait for any remaining processes
-echo "Waiting for final batch to complete..."
+echo "Waiting for remaining chunks to complete..."
 wait
 
 echo "All chunks have been processed"
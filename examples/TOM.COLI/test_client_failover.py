@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Failover test for test.coli_v3.py
+
+Runs the client against two local stand-in vLLM servers: one answers at
+once, the other never answers within --timeout. A timed-out request must
+count as a backend failure, eject the hung backend and be retried on the
+healthy one, so every prompt succeeds long before the hung server replies.
+
+Run with: python3 test_client_failover.py
+"""
+
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.coli_v3.py')
+HUNG_SECONDS = 30
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    """Minimal /v1/chat/completions endpoint; delay is set per server"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.server.release.wait(self.server.delay):
+            return
+        data = json.dumps({
+            'id': 'test', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': 'answer'}}],
+            'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_server(delay):
+    """Start a stand-in server on a free port; returns (server, 'host:port')"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CompletionHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"127.0.0.1:{server.server_address[1]}"
+
+
+@unittest.skipUnless(importlib.util.find_spec('openai') and importlib.util.find_spec('psutil'),
+                     'test.coli_v3.py needs the openai and psutil packages')
+class TestClientFailover(unittest.TestCase):
+    """Test cases for timeouts, ejection and retries in test.coli_v3.py"""
+
+    def setUp(self):
+        self.healthy, self.healthy_address = start_server(0)
+        self.hung, self.hung_address = start_server(HUNG_SECONDS)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.tmpdir.name, 'genes.txt')
+        with open(self.input_file, 'w') as f:
+            for i in range(6):
+                f.write(f"1\tEscherichia coli\tb{i:04d}\tgene {i}\n")
+
+    def tearDown(self):
+        for server in (self.healthy, self.hung):
+            server.release.set()
+            server.shutdown()
+            server.server_close()
+        self.tmpdir.cleanup()
+
+    def run_client(self, *extra):
+        output_file = os.path.join(self.tmpdir.name, 'out.json')
+        start = time.time()
+        result = subprocess.run(
+            [sys.executable, SCRIPT, self.input_file,
+             f"{self.hung_address},{self.healthy_address}",
+             '--timeout', '1', '--eject-after', '1', '--eject-seconds', '600',
+             '--concurrency', '2', '--output', output_file, *extra],
+            capture_output=True, text=True, timeout=HUNG_SECONDS
+        )
+        elapsed = time.time() - start
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        with open(output_file) as f:
+            records = [json.loads(line) for line in f]
+        return result.stdout, records, elapsed
+
+    def assert_failed_over(self, stdout, records, elapsed):
+        self.assertEqual([r['status'] for r in records], ['SUCCESS'] * 6)
+        self.assertLess(elapsed, HUNG_SECONDS / 2)
+
+        summary = re.search(rf"backend {re.escape(self.hung_address)} completed=(\d+) "
+                            rf"errors=(\d+) ejections=(\d+)", stdout)
+        self.assertIsNotNone(summary, stdout)
+        self.assertEqual(summary.groups(), ('0', '1', '1'))
+        self.assertIn(f"backend {self.healthy_address} completed=6", stdout)
+
+    def test_timeout_ejects_backend_threads(self):
+        """Test that a timed-out request ejects its backend and is retried elsewhere"""
+        self.assert_failed_over(*self.run_client())
+
+    def test_timeout_ejects_backend_asyncio(self):
+        """Test timeouts, ejection and retry with the asyncio engine"""
+        self.assert_failed_over(*self.run_client('--engine', 'asyncio'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -216,46 +216,17 @@ python3 "${REDIS_DIR}/cli.py" --redis-host "$REDIS_HOST" --redis-port "$REDIS_PO
     update-health "$SERVICE_ID" --status healthy || \
     echo "$(date) ${HOSTNAME} Redis: WARNING - Failed to update health status"
 
-# Redis Service Registry: Start heartbeat and health monitoring loop
+# Redis Service Registry: Start heartbeat and health monitoring daemon
+# One long-lived process probes /health and sends heartbeats over a pooled
+# connection; it exits on its own when llama-server stops.
 echo "$(date) ${HOSTNAME} Redis: Starting heartbeat monitor (interval: ${HEARTBEAT_INTERVAL}s)"
-(
-    HEALTH_CHECK_FAILURES=0
-    
-    while true; do
-        # Check if llama-server process is still running
-        if ! kill -0 "$llama_pid" 2>/dev/null; then
-            echo "$(date) ${HOSTNAME} Redis: llama-server process no longer running, stopping heartbeat"
-            break
-        fi
-        
-        # Perform HTTP health check
-        if ! curl -sf "http://${LLAMA_HOST}:${LLAMA_PORT}/health" > /dev/null 2>&1; then
-            HEALTH_CHECK_FAILURES=$((HEALTH_CHECK_FAILURES + 1))
-            echo "$(date) ${HOSTNAME} Redis: Health check failed (failures: $HEALTH_CHECK_FAILURES/$MAX_HEALTH_FAILURES)"
-            
-            # Update status to unhealthy if we've reached max failures
-            if [ $HEALTH_CHECK_FAILURES -ge $MAX_HEALTH_FAILURES ]; then
-                echo "$(date) ${HOSTNAME} Redis: Service unhealthy after $MAX_HEALTH_FAILURES failures"
-                python3 "${REDIS_DIR}/cli.py" --redis-host "$REDIS_HOST" --redis-port "$REDIS_PORT" \
-                    update-health "$SERVICE_ID" --status unhealthy 2>/dev/null || true
-            fi
-        else
-            # Health check passed - send heartbeat to update last_seen timestamp
-            python3 "${REDIS_DIR}/cli.py" --redis-host "$REDIS_HOST" --redis-port "$REDIS_PORT" \
-                heartbeat "$SERVICE_ID" --quiet 2>/dev/null || true
-            
-            # If we recovered from failures, update status back to healthy
-            if [ $HEALTH_CHECK_FAILURES -gt 0 ]; then
-                echo "$(date) ${HOSTNAME} Redis: Service recovered, updating to healthy"
-                python3 "${REDIS_DIR}/cli.py" --redis-host "$REDIS_HOST" --redis-port "$REDIS_PORT" \
-                    update-health "$SERVICE_ID" --status healthy 2>/dev/null || true
-                HEALTH_CHECK_FAILURES=0
-            fi
-        fi
-        
-        sleep "$HEARTBEAT_INTERVAL"
-    done
-) &
+python3 "${REDIS_DIR}/cli.py" --redis-host "$REDIS_HOST" --redis-port "$REDIS_PORT" \
+    heartbeat-daemon \
+    --service "${SERVICE_ID}=http://${LLAMA_HOST}:${LLAMA_PORT}/health" \
+    --interval "$HEARTBEAT_INTERVAL" \
+    --max-failures "$MAX_HEALTH_FAILURES" \
+    --watch-pid "$llama_pid" \
+    --quiet &
 HEARTBEAT_PID=$!
 echo "$(date) ${HOSTNAME} Redis: Heartbeat monitor started (PID: $HEARTBEAT_PID)"
 
@@ -12,11 +12,19 @@ from .service_registry import (
     ServiceInfo,
     ServiceStatus
 )
+from .async_service_registry import AsyncServiceRegistry
+from .discovery_cache import DiscoveryCache
+from .hash_ring import HashRing
+from .sharded_registry import ShardedServiceRegistry
 
 __version__ = '0.1.0'
 __all__ = [
     'ServiceRegistry',
     'ServiceInfo',
-    'ServiceStatus'
+    'ServiceStatus',
+    'AsyncServiceRegistry',
+    'DiscoveryCache',
+    'HashRing',
+    'ShardedServiceRegistry'
 ]
 
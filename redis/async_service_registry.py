@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+asyncio Service Registry using redis.asyncio
+
+Non-blocking counterpart of ServiceRegistry for use inside event loops
+(Ray Serve deployments, asyncio load generators). It shares the Redis data
+structure and server-side scripts with service_registry.py, so both classes
+can operate on the same registry concurrently.
+
+Concurrent heartbeat() calls issued in the same event loop iteration are
+coalesced into a single pipeline, so one process can sustain thousands of
+heartbeats per second over a small connection pool.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Any, Tuple
+
+import redis.asyncio
+
+try:
+    from .service_registry import (
+        ServiceInfo, ServiceStatus, PIPELINE_CHUNK_SIZE, METADATA_ENCODINGS, HISTORY_MAXLEN,
+        _RegistryKeys, _DEREGISTER_SCRIPT, _HEARTBEAT_SCRIPT, _UPDATE_HEALTH_SCRIPT,
+        _REPORT_LOAD_SCRIPT, _PICK_LEAST_LOADED_SCRIPT
+    )
+except ImportError:
+    from service_registry import (
+        ServiceInfo, ServiceStatus, PIPELINE_CHUNK_SIZE, METADATA_ENCODINGS, HISTORY_MAXLEN,
+        _RegistryKeys, _DEREGISTER_SCRIPT, _HEARTBEAT_SCRIPT, _UPDATE_HEALTH_SCRIPT,
+        _REPORT_LOAD_SCRIPT, _PICK_LEAST_LOADED_SCRIPT
+    )
+
+
+class AsyncServiceRegistry(_RegistryKeys):
+    """
+    asyncio Service Registry with the same API as ServiceRegistry.
+    All methods are coroutines.
+    """
+
+    def __init__(self, redis_host: str = 'localhost', redis_port: int = 6379,
+                 redis_db: int = 0, redis_password: Optional[str] = None,
+                 key_prefix: str = '', max_connections: int = 16,
+                 connection_pool: Optional[redis.asyncio.ConnectionPool] = None,
+                 liveness_ttl: Optional[float] = None, metadata_encoding: str = 'json',
+                 history_maxlen: int = HISTORY_MAXLEN,
+                 history_load_interval: Optional[float] = None):
+        """
+        Initialize AsyncServiceRegistry
+
+        Args:
+            redis_host: Redis server host
+            redis_port: Redis server port
+            redis_db: Redis database number
+            redis_password: Redis password (if required)
+            key_prefix: Prefix for all Redis keys
+            max_connections: Size of the connection pool created when
+                connection_pool is not given
+            connection_pool: Existing redis.asyncio.ConnectionPool to share
+                (must use decode_responses=True)
+            liveness_ttl: Enable liveness mode (see ServiceRegistry)
+            metadata_encoding: 'json' or 'fields' (see ServiceRegistry)
+            history_maxlen: History stream length, 0 = off (see ServiceRegistry)
+            history_load_interval: Load sample interval (see ServiceRegistry)
+        """
+        if metadata_encoding not in METADATA_ENCODINGS:
+            raise ValueError(f"metadata_encoding must be one of {METADATA_ENCODINGS}")
+
+        self._owns_pool = connection_pool is None
+        if connection_pool is None:
+            connection_pool = redis.asyncio.ConnectionPool(
+                host=redis_host,
+                port=redis_port,
+                db=redis_db,
+                password=redis_password,
+                decode_responses=True,
+                max_connections=max_connections
+            )
+        self.connection_pool = connection_pool
+        self.redis_client = redis.asyncio.Redis(connection_pool=connection_pool)
+        self.key_prefix = key_prefix
+        self.liveness_ttl = liveness_ttl
+        self.metadata_encoding = metadata_encoding
+        self.history_maxlen = history_maxlen
+        self.history_load_interval = history_load_interval
+        self._deregister_script = self.redis_client.register_script(_DEREGISTER_SCRIPT)
+        self._heartbeat_script = self.redis_client.register_script(_HEARTBEAT_SCRIPT)
+        self._update_health_script = self.redis_client.register_script(_UPDATE_HEALTH_SCRIPT)
+        self._report_load_script = self.redis_client.register_script(_REPORT_LOAD_SCRIPT)
+        self._pick_least_loaded_script = self.redis_client.register_script(
+            _PICK_LEAST_LOADED_SCRIPT)
+
+        # Heartbeats waiting for the next coalesced pipeline flush
+        self._pending_heartbeats: List[Tuple[str, asyncio.Future]] = []
+        self._heartbeat_flush: Optional[asyncio.Task] = None
+
+    async def close(self):
+        """Close the client, disconnecting the pool if this registry created it"""
+        await self.redis_client.aclose()
+        if self._owns_pool:
+            await self.connection_pool.disconnect()
+
+    async def __aenter__(self) -> 'AsyncServiceRegistry':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def register_service(self, service_info: ServiceInfo) -> bool:
+        """
+        Register a new service or update existing one
+
+        Args:
+            service_info: ServiceInfo object with service details
+
+        Returns:
+            bool: True if successful
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=True)
+            self._queue_register(pipe, service_info)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Error registering service: {e}")
+            return False
+
+    async def deregister_service(self, service_id: str) -> bool:
+        """
+        Deregister a service
+
+        Args:
+            service_id: Service identifier
+
+        Returns:
+            bool: True if successful
+        """
+        try:
+            removed = await self._deregister_script(**self._deregister_call(service_id))
+            return bool(removed)
+        except Exception as e:
+            print(f"Error deregistering service: {e}")
+            return False
+
+    async def update_health(self, service_id: str, status: ServiceStatus,
+                            metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Update service health status
+
+        Args:
+            service_id: Service identifier
+            status: New health status
+            metadata: Optional additional metadata
+
+        Returns:
+            bool: True if successful
+        """
+        results = await self.update_health_many([service_id], status, metadata)
+        return results.get(service_id, False)
+
+    async def update_health_many(self, service_ids: List[str], status: ServiceStatus,
+                                 metadata: Optional[Dict[str, Any]] = None,
+                                 expected_status: Optional[ServiceStatus] = None
+                                 ) -> Dict[str, bool]:
+        """
+        Update health status for many services in one server-side script call
+
+        Args:
+            service_ids: Service identifiers
+            status: New health status
+            metadata: Optional additional metadata merged into each service
+            expected_status: Only update services currently in this status
+
+        Returns:
+            Dictionary mapping service_id to True if updated, False if not found
+            (or not in expected_status)
+        """
+        try:
+            service_ids = list(service_ids)
+            metadata_json = self._encode_metadata(metadata)
+            now = str(time.time())
+            results = {}
+
+            for start in range(0, len(service_ids), PIPELINE_CHUNK_SIZE):
+                chunk = service_ids[start:start + PIPELINE_CHUNK_SIZE]
+                updated = await self._update_health_script(
+                    **self._update_health_call(chunk, status, metadata_json, now,
+                                               expected_status)
+                )
+                results.update(zip(chunk, (bool(u) for u in updated)))
+
+            return results
+        except Exception as e:
+            print(f"Error updating health: {e}")
+            return {}
+
+    async def heartbeat(self, service_id: str) -> bool:
+        """
+        Record a heartbeat for a service (updates last_seen timestamp)
+
+        Calls made concurrently are sent together in one pipeline.
+
+        Args:
+            service_id: Service identifier
+
+        Returns:
+            bool: True if successful
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending_heartbeats.append((service_id, future))
+        if self._heartbeat_flush is None or self._heartbeat_flush.done():
+            self._heartbeat_flush = asyncio.create_task(self._flush_heartbeats())
+        return await future
+
+    async def _flush_heartbeats(self):
+        """Send all pending heartbeats, one pipeline per chunk"""
+        # Yield once so heartbeats issued in the same loop iteration join the batch
+        await asyncio.sleep(0)
+        while self._pending_heartbeats:
+            batch = self._pending_heartbeats[:PIPELINE_CHUNK_SIZE]
+            del self._pending_heartbeats[:PIPELINE_CHUNK_SIZE]
+
+            results = await self.heartbeat_many([service_id for service_id, _ in batch])
+            for service_id, future in batch:
+                if not future.done():
+                    future.set_result(results.get(service_id, False))
+
+    async def heartbeat_many(self, service_ids: List[str]) -> Dict[str, bool]:
+        """
+        Record heartbeats for many services using pipelined script calls
+
+        Args:
+            service_ids: Service identifiers
+
+        Returns:
+            Dictionary mapping service_id to True if recorded, False if not found
+        """
+        try:
+            service_ids = list(service_ids)
+            now = str(time.time())
+            results = {}
+
+            for start in range(0, len(service_ids), PIPELINE_CHUNK_SIZE):
+                chunk = service_ids[start:start + PIPELINE_CHUNK_SIZE]
+                pipe = self.redis_client.pipeline(transaction=False)
+                for service_id in chunk:
+                    await self._heartbeat_script(**self._heartbeat_call(service_id, now),
+                                                 client=pipe)
+                replies = await pipe.execute()
+                results.update(zip(chunk, (bool(r) for r in replies)))
+
+            return results
+        except Exception as e:
+            print(f"Error recording heartbeats: {e}")
+            return {}
+
+    async def get_service(self, service_id: str) -> Optional[ServiceInfo]:
+        """
+        Get service information
+
+        Args:
+            service_id: Service identifier
+
+        Returns:
+            ServiceInfo object or None if not found
+        """
+        try:
+            data = await self.redis_client.hgetall(self._key(f"service:{service_id}"))
+            if not data:
+                return None
+            return ServiceInfo.from_dict(data)
+        except Exception as e:
+            print(f"Error getting service: {e}")
+            return None
+
+    async def get_services(self, service_ids: List[str]) -> List[ServiceInfo]:
+        """
+        Get information for many services using pipelined HGETALL calls
+
+        Chunks are fetched concurrently over the connection pool.
+
+        Args:
+            service_ids: Service identifiers
+
+        Returns:
+            List of ServiceInfo objects for the services that exist
+        """
+        async def fetch(chunk: List[str]) -> List[Dict[str, str]]:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for service_id in chunk:
+                pipe.hgetall(self._key(f"service:{service_id}"))
+            return await pipe.execute()
+
+        try:
+            service_ids = list(service_ids)
+            chunks = [service_ids[start:start + PIPELINE_CHUNK_SIZE]
+                      for start in range(0, len(service_ids), PIPELINE_CHUNK_SIZE)]
+            replies = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+            return [ServiceInfo.from_dict(data)
+                    for reply in replies for data in reply if data]
+        except Exception as e:
+            print(f"Error getting services: {e}")
+            return []
+
+    async def list_services(self, service_type: Optional[str] = None,
+                            status_filter: Optional[ServiceStatus] = None) -> List[ServiceInfo]:
+        """
+        List all registered services
+
+        Args:
+            service_type: Filter by service type (optional)
+            status_filter: Filter by status (optional)
+
+        Returns:
+            List of ServiceInfo objects
+        """
+        try:
+            if service_type:
+                service_ids = await self.redis_client.smembers(
+                    self._key(f"services:type:{service_type}"))
+            else:
+                service_ids = await self.redis_client.smembers(self._key("services:active"))
+
+            services = await self.get_services(service_ids)
+
+            if status_filter is not None:
+                services = [s for s in services if s.status == status_filter.value]
+
+            return services
+        except Exception as e:
+            print(f"Error listing services: {e}")
+            return []
+
+    async def get_healthy_services(self, service_type: Optional[str] = None,
+                                   timeout_seconds: int = 30) -> List[ServiceInfo]:
+        """
+        Get all healthy services (with recent heartbeat)
+
+        Args:
+            service_type: Filter by service type (optional)
+            timeout_seconds: Consider service unhealthy if no heartbeat in this many seconds
+
+        Returns:
+            List of healthy ServiceInfo objects
+        """
+        try:
+            cutoff = time.time() - timeout_seconds
+            heartbeat_index = self._key("services:heartbeat")
+
+            if service_type:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.zrangebyscore(heartbeat_index, f"({cutoff}", "+inf")
+                pipe.smembers(self._key(f"services:type:{service_type}"))
+                fresh_ids, type_ids = await pipe.execute()
+                fresh_ids = [sid for sid in fresh_ids if sid in type_ids]
+            else:
+                fresh_ids = await self.redis_client.zrangebyscore(
+                    heartbeat_index, f"({cutoff}", "+inf")
+
+            return [s for s in await self.get_services(fresh_ids)
+                    if s.status == ServiceStatus.HEALTHY.value and s.last_seen > cutoff]
+        except Exception as e:
+            print(f"Error getting healthy services: {e}")
+            return []
+
+    async def report_load(self, service_id: str, running: int, waiting: int = 0) -> bool:
+        """
+        Publish a service's current load to its type's load index
+
+        Args:
+            service_id: Service identifier
+            running: Requests currently being processed
+            waiting: Requests queued behind them
+
+        Returns:
+            bool: True if recorded, False if the service is not registered
+        """
+        try:
+            recorded = await self._report_load_script(
+                **self._report_load_call(service_id, running, waiting))
+            return bool(recorded)
+        except Exception as e:
+            print(f"Error reporting load: {e}")
+            return False
+
+    async def pick_least_loaded(self, service_type: str, k: int = 1,
+                                timeout_seconds: int = 30) -> List[ServiceInfo]:
+        """
+        Get the k least-loaded healthy services of a type
+
+        Args:
+            service_type: Service type
+            k: Number of services to return
+            timeout_seconds: Skip services with no heartbeat in this many seconds
+
+        Returns:
+            Up to k healthy ServiceInfo objects, least loaded first
+        """
+        try:
+            cutoff = time.time() - timeout_seconds
+            picked = await self._pick_least_loaded_script(
+                **self._pick_least_loaded_call(service_type, k, cutoff))
+            return await self.get_services(picked[0::2])
+        except Exception as e:
+            print(f"Error picking least loaded services: {e}")
+            return []
+
+    async def get_stale_services(self, timeout_seconds: int = 30) -> List[ServiceInfo]:
+        """
+        Get services that have not sent a heartbeat in a while
+
+        Args:
+            timeout_seconds: Consider service stale if no heartbeat in this many seconds
+
+        Returns:
+            List of stale ServiceInfo objects (any status)
+        """
+        try:
+            cutoff = time.time() - timeout_seconds
+            stale_ids = await self.redis_client.zrangebyscore(
+                self._key("services:heartbeat"), "-inf", f"({cutoff}")
+            return [s for s in await self.get_services(stale_ids) if s.last_seen < cutoff]
+        except Exception as e:
+            print(f"Error getting stale services: {e}")
+            return []
+
+    async def mark_unhealthy_services(self, timeout_seconds: int = 30) -> int:
+        """
+        Mark services as unhealthy if they haven't sent a heartbeat in a while
+
+        Args:
+            timeout_seconds: Mark unhealthy if no heartbeat in this many seconds (default: 30)
+
+        Returns:
+            Number of services marked as unhealthy
+        """
+        stale_ids = [s.service_id for s in await self.get_stale_services(timeout_seconds)
+                     if s.status == ServiceStatus.HEALTHY.value]
+        if not stale_ids:
+            return 0
+
+        results = await self.update_health_many(stale_ids, ServiceStatus.UNHEALTHY,
+                                                expected_status=ServiceStatus.HEALTHY)
+        return sum(1 for updated in results.values() if updated)
+
+    async def get_service_count(self, service_type: Optional[str] = None) -> int:
+        """
+        Get count of registered services
+
+        Args:
+            service_type: Filter by service type (optional)
+
+        Returns:
+            Number of services
+        """
+        try:
+            if service_type:
+                return await self.redis_client.scard(self._key(f"services:type:{service_type}"))
+            return await self.redis_client.scard(self._key("services:active"))
+        except Exception as e:
+            print(f"Error getting service count: {e}")
+            return 0
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for Service Registry
+
+Measures write throughput (registrations/s, heartbeats/s), read latency
+(list_services, get_healthy_services, pick_least_loaded and the per-service
+N+1 read path they replaced) and mark_unhealthy_services sweep time for
+growing registry sizes.
+
+The target is either a running Redis server (--redis-host), a throwaway
+redis-server started on a free local port (--start-server), or an
+in-process fakeredis server (--fakeredis; useful for relative comparisons
+only, since it has no network round trips).
+
+Run with: python3 benchmark_registry.py --start-server [--sizes 10 100 1000 10000]
+Save results with --output FILE and compare a later run with --baseline FILE.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import redis
+from service_registry import ServiceRegistry, ServiceInfo
+
+
+# (result key, label, higher is better)
+METRICS = [
+    ('register_per_s', 'register_service (ops/s)', True),
+    ('register_many_per_s', 'register_many (ops/s)', True),
+    ('heartbeat_per_s', 'heartbeat (ops/s)', True),
+    ('heartbeat_many_per_s', 'heartbeat_many (ops/s)', True),
+    ('unbatched_ms', 'N+1 list (ms)', False),
+    ('list_services_ms', 'list_services (ms)', False),
+    ('get_healthy_services_ms', 'get_healthy_services (ms)', False),
+    ('pick_least_loaded_ms', 'pick_least_loaded (ms)', False),
+    ('sweep_noop_ms', 'mark_unhealthy, none stale (ms)', False),
+    ('sweep_ms', 'mark_unhealthy, all stale (ms)', False),
+]
+
+
+def make_services(count: int, last_seen: Optional[float] = None) -> List[ServiceInfo]:
+    """Build count services of a single type"""
+    return [ServiceInfo(
+        service_id=f"bench-{i:06d}",
+        host=f"10.0.{i // 256 % 256}.{i % 256}",
+        port=8000 + i % 12,
+        service_type="bench",
+        last_seen=last_seen,
+        metadata={"model": "llama-3", "index": i}
+    ) for i in range(count)]
+
+
+def populate(registry: ServiceRegistry, count: int, last_seen: Optional[float] = None):
+    """Register count services of a single type"""
+    registry.register_many(make_services(count, last_seen))
+
+
+def time_call(func, repeat: int) -> float:
+    """Return the median wall time of func() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def rate(count: int, func) -> float:
+    """Run func() once and return count / elapsed seconds"""
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def list_services_unbatched(registry: ServiceRegistry) -> List[ServiceInfo]:
+    """Reference N+1 implementation: SMEMBERS then one HGETALL per service"""
+    service_ids = registry.redis_client.smembers(registry._key("services:active"))
+    return [s for s in (registry.get_service(sid) for sid in service_ids) if s]
+
+
+def bench_size(registry: ServiceRegistry, size: int, repeat: int) -> Dict[str, float]:
+    """Measure every metric for one registry size"""
+    services = make_services(size)
+    service_ids = [s.service_id for s in services]
+    row: Dict[str, float] = {'services': size}
+
+    # Writes: one round trip per call vs pipelined bulk calls
+    registry.clear_all()
+    row['register_per_s'] = rate(size, lambda: [registry.register_service(s) for s in services])
+    registry.clear_all()
+    row['register_many_per_s'] = rate(size, lambda: registry.register_many(services))
+    row['heartbeat_per_s'] = rate(size, lambda: [registry.heartbeat(sid) for sid in service_ids])
+    row['heartbeat_many_per_s'] = rate(size, lambda: registry.heartbeat_many(service_ids))
+
+    # Reads against a fully healthy registry with reported loads
+    registry.report_loads({sid: (i % 17, i % 5) for i, sid in enumerate(service_ids)})
+    row['unbatched_ms'] = time_call(lambda: list_services_unbatched(registry), repeat)
+    row['list_services_ms'] = time_call(registry.list_services, repeat)
+    row['get_healthy_services_ms'] = time_call(registry.get_healthy_services, repeat)
+    row['pick_least_loaded_ms'] = time_call(
+        lambda: registry.pick_least_loaded("bench", k=2), repeat)
+
+    # Sweeps: the common case (nothing stale) and a full sweep of stale services
+    row['sweep_noop_ms'] = time_call(registry.mark_unhealthy_services, repeat)
+    samples = []
+    for _ in range(repeat):
+        registry.clear_all()
+        populate(registry, size, last_seen=time.time() - 120)
+        start = time.perf_counter()
+        marked = registry.mark_unhealthy_services(timeout_seconds=30)
+        samples.append((time.perf_counter() - start) * 1000)
+        if marked != size:
+            print(f"Warning: sweep marked {marked} of {size} services", file=sys.stderr)
+    samples.sort()
+    row['sweep_ms'] = samples[len(samples) // 2]
+
+    registry.clear_all()
+    return {key: round(value, 3) for key, value in row.items()}
+
+
+def run_benchmarks(registry: ServiceRegistry, sizes: List[int], repeat: int,
+                   verbose: bool = True) -> List[Dict[str, float]]:
+    """Run bench_size for each registry size"""
+    results = []
+    for size in sizes:
+        if verbose:
+            print(f"Benchmarking {size} services...", file=sys.stderr)
+        results.append(bench_size(registry, size, repeat))
+    return results
+
+
+def default_redis_server() -> str:
+    """redis-server built by README.build.txt if REDIS_STABLE is set, else from PATH"""
+    if os.environ.get('REDIS_STABLE'):
+        return os.path.join(os.environ['REDIS_STABLE'], 'src', 'redis-server')
+    return 'redis-server'
+
+
+def start_local_server(binary: str, timeout: float = 10.0):
+    """Start a throwaway, non-persistent redis-server on a free local port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    process = subprocess.Popen(
+        [binary, '--bind', '127.0.0.1', '--port', str(port),
+         '--save', '', '--appendonly', 'no'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+    )
+    client = redis.Redis(host='127.0.0.1', port=port)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            client.ping()
+            return process, port
+        except redis.ConnectionError:
+            if process.poll() is not None or time.time() > deadline:
+                process.kill()
+                raise RuntimeError(f"{binary} did not start on port {port}")
+            time.sleep(0.05)
+        finally:
+            client.close()
+
+
+def describe_server(registry: ServiceRegistry) -> Optional[str]:
+    """Redis server version, if the server reports one"""
+    try:
+        return registry.redis_client.info('server').get('redis_version')
+    except Exception:
+        return None
+
+
+def print_results(results: List[Dict[str, float]]):
+    """Print a metric x size table"""
+    sizes = [row['services'] for row in results]
+    print(f"{'Metric':<34}" + "".join(f"{size:>14}" for size in sizes))
+    print("-" * (34 + 14 * len(sizes)))
+    for key, label, _ in METRICS:
+        print(f"{label:<34}" + "".join(f"{row[key]:>14.1f}" for row in results))
+
+
+def print_comparison(results: List[Dict[str, float]], baseline: Dict[str, Any]):
+    """Print each metric as a speedup over a previous run (>1.0 is better)"""
+    previous = {row['services']: row for row in baseline.get('results', [])}
+    rows = [row for row in results if row['services'] in previous]
+    if not rows:
+        print("\nBaseline has no matching registry sizes")
+        return
+
+    print(f"\nSpeedup vs baseline ({baseline.get('timestamp', 'unknown date')}, "
+          f"{baseline.get('backend', 'unknown backend')})")
+    print(f"{'Metric':<34}" + "".join(f"{row['services']:>14}" for row in rows))
+    print("-" * (34 + 14 * len(rows)))
+    for key, label, higher_is_better in METRICS:
+        cells = []
+        for row in rows:
+            old, new = previous[row['services']].get(key), row[key]
+            if not old or not new:
+                cells.append(f"{'-':>14}")
+            else:
+                cells.append(f"{(new / old if higher_is_better else old / new):>13.2f}x")
+        print(f"{label:<34}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark Service Registry throughput, latency and sweeps',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 benchmark_registry.py --start-server --output before.json
+  python3 benchmark_registry.py --start-server --baseline before.json
+  python3 benchmark_registry.py --redis-host 10.0.0.1 --sizes 10 100 1000 --format json
+  python3 benchmark_registry.py --fakeredis --sizes 10 100
+        """
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--redis-host',
+                        help='Benchmark an existing Redis server (its bench:* keys are cleared)')
+    target.add_argument('--start-server', nargs='?', const=default_redis_server(),
+                        metavar='REDIS_SERVER',
+                        help='Start a throwaway redis-server on a free local port '
+                             '(default binary: $REDIS_STABLE/src/redis-server or redis-server)')
+    target.add_argument('--fakeredis', action='store_true',
+                        help='Use an in-process fakeredis server (requires the fakeredis package)')
+    parser.add_argument('--redis-port', type=int, default=6379,
+                       help='Redis port for --redis-host (default: 6379)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                       help='Registry sizes to benchmark (default: 10 100 1000 10000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                       help='Timed repetitions per latency measurement (default: 5)')
+    parser.add_argument('--format', choices=['text', 'json'], default='text',
+                       help='Output format (default: text)')
+    parser.add_argument('--output', help='Also write JSON results to this file')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare against')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read baseline: {e}", file=sys.stderr)
+            return 1
+
+    server = None
+    if args.fakeredis:
+        try:
+            import fakeredis
+        except ImportError:
+            print("--fakeredis requires the fakeredis package", file=sys.stderr)
+            return 1
+        backend = 'fakeredis'
+        registry = ServiceRegistry(key_prefix='bench:', connection_pool=redis.ConnectionPool(
+            connection_class=fakeredis.FakeConnection, server=fakeredis.FakeServer(),
+            decode_responses=True))
+    elif args.start_server:
+        try:
+            server, port = start_local_server(args.start_server)
+        except (OSError, RuntimeError) as e:
+            print(f"Cannot start redis-server: {e}", file=sys.stderr)
+            return 1
+        backend = 'redis-server (local)'
+        registry = ServiceRegistry(redis_host='127.0.0.1', redis_port=port, key_prefix='bench:')
+    else:
+        backend = f'redis-server ({args.redis_host}:{args.redis_port})'
+        registry = ServiceRegistry(redis_host=args.redis_host, redis_port=args.redis_port,
+                                   key_prefix='bench:')
+
+    try:
+        try:
+            registry.redis_client.ping()
+        except Exception as e:
+            print(f"Cannot connect to Redis: {e}", file=sys.stderr)
+            return 1
+
+        results = run_benchmarks(registry, args.sizes, args.repeat)
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'backend': backend,
+            'redis_version': describe_server(registry),
+            'python': platform.python_version(),
+            'host': platform.node(),
+            'repeat': args.repeat,
+            'results': results,
+        }
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.format == 'json':
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Backend: {backend}  Redis: {report['redis_version'] or 'unknown'}  "
+              f"Repeat: {args.repeat}")
+        print_results(results)
+        if baseline is not None:
+            print_comparison(results, baseline)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,21 +8,49 @@ from shell scripts and terminal.
 
 import argparse
 import json
+import os
+import shlex
+import signal
+import threading
 import sys
 import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
-from service_registry import ServiceRegistry, ServiceInfo, ServiceStatus
-
-
-def register_command(args):
-    """Register a new service"""
-    registry = ServiceRegistry(
+from service_registry import (
+    ServiceRegistry, ServiceInfo, ServiceStatus, HISTORY_MAXLEN, default_lease_holder
+)
+from sharded_registry import ShardedServiceRegistry
+
+
+def registry_from_args(args) -> ServiceRegistry:
+    """Create a ServiceRegistry (sharded with --shard) from the global command line options"""
+    if args.shard:
+        return ShardedServiceRegistry(
+            args.shard,
+            key_prefix=args.key_prefix,
+            liveness_ttl=args.liveness_ttl,
+            metadata_encoding=args.metadata_encoding,
+            history_maxlen=args.history_maxlen,
+            history_load_interval=args.history_load_interval
+        )
+    return ServiceRegistry(
         redis_host=args.redis_host,
         redis_port=args.redis_port,
         redis_db=args.redis_db,
-        key_prefix=args.key_prefix
+        key_prefix=args.key_prefix,
+        liveness_ttl=args.liveness_ttl,
+        metadata_encoding=args.metadata_encoding,
+        history_maxlen=args.history_maxlen,
+        history_load_interval=args.history_load_interval
     )
 
+
+def register_command(args):
+    """Register a new service"""
+    registry = registry_from_args(args)
+
     # Parse metadata if provided
     metadata = {}
     if args.metadata:
@@ -51,12 +79,7 @@ def register_command(args):
 
 def deregister_command(args):
     """Deregister a service or all services"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     # Handle "all" special case
     if args.service_id.lower() == "all":
@@ -64,19 +87,9 @@ def deregister_command(args):
         if not services:
             print("No services to deregister")
             return 0
-        
-        success_count = 0
-        failed_count = 0
-        for service in services:
-            if registry.deregister_service(service.service_id):
-                print(f"Deregistered: {service.service_id}")
-                success_count += 1
-            else:
-                print(f"Failed to deregister: {service.service_id}", file=sys.stderr)
-                failed_count += 1
-        
-        print(f"\nSummary: {success_count} deregistered, {failed_count} failed")
-        return 0 if failed_count == 0 else 1
+
+        results = registry.deregister_many([service.service_id for service in services])
+        return report_bulk_results(results, "Deregistered", "deregister", "deregistered")
     
     # Handle single service
     if registry.deregister_service(args.service_id):
@@ -87,14 +100,81 @@ def deregister_command(args):
         return 1
 
 
+def report_bulk_results(results, done_label, action, summary_label):
+    """Print per-service results of a bulk operation and return the exit code"""
+    failed_count = 0
+    for service_id, success in results.items():
+        if success:
+            print(f"{done_label}: {service_id}")
+        else:
+            print(f"Failed to {action}: {service_id}", file=sys.stderr)
+            failed_count += 1
+
+    print(f"\nSummary: {len(results) - failed_count} {summary_label}, {failed_count} failed")
+    return 0 if failed_count == 0 else 1
+
+
+def load_services_file(path):
+    """Load ServiceInfo objects from a JSON array or JSON lines file ('-' for stdin)"""
+    stream = sys.stdin if path == '-' else open(path)
+    with stream:
+        text = stream.read()
+
+    if text.lstrip().startswith('['):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines()
+                   if line.strip() and not line.lstrip().startswith('#')]
+
+    return [ServiceInfo(
+        service_id=record['service_id'],
+        host=record['host'],
+        port=int(record['port']),
+        service_type=record['service_type'],
+        status=record.get('status', ServiceStatus.HEALTHY.value),
+        metadata=record.get('metadata') or {}
+    ) for record in records]
+
+
+def register_many_command(args):
+    """Register many services from a JSON file in chunked pipelines"""
+    registry = registry_from_args(args)
+
+    try:
+        services = load_services_file(args.file)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: cannot load services: {e}", file=sys.stderr)
+        return 1
+
+    results = registry.register_many(services)
+    return report_bulk_results(results, "Registered", "register", "registered")
+
+
+def deregister_many_command(args):
+    """Deregister many services in chunked pipelines"""
+    registry = registry_from_args(args)
+
+    results = registry.deregister_many(args.service_ids)
+    return report_bulk_results(results, "Deregistered", "deregister", "deregistered")
+
+
+def heartbeat_many_command(args):
+    """Send heartbeats for many services in chunked pipelines"""
+    registry = registry_from_args(args)
+
+    recorded = registry.heartbeat_many(args.service_ids)
+    results = {service_id: recorded.get(service_id, False) for service_id in args.service_ids}
+    if args.quiet:
+        failed = [service_id for service_id, success in results.items() if not success]
+        for service_id in failed:
+            print(f"Failed to record heartbeat for service: {service_id}", file=sys.stderr)
+        return 0 if not failed else 1
+    return report_bulk_results(results, "Heartbeat recorded", "record heartbeat", "recorded")
+
+
 def update_health_command(args):
     """Update service health status"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     status = ServiceStatus[args.status.upper()]
 
@@ -117,12 +197,7 @@ def update_health_command(args):
 
 def heartbeat_command(args):
     """Send heartbeat for a service"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     if registry.heartbeat(args.service_id):
         if not args.quiet:
@@ -133,14 +208,298 @@ def heartbeat_command(args):
         return 1
 
 
+# Health probes target node-local services, so never route them via a proxy
+_probe_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+def probe_health(url, timeout):
+    """Return True if an HTTP GET of url answers with a 2xx status"""
+    try:
+        with _probe_opener.open(url, timeout=timeout) as response:
+            return 200 <= response.status < 300
+    except Exception:
+        return False
+
+
+def metrics_url(health_url):
+    """Prometheus metrics URL served next to a vLLM health URL"""
+    return urllib.parse.urlunsplit(urllib.parse.urlsplit(health_url)._replace(
+        path='/metrics', query='', fragment=''))
+
+
+def probe_load(url, timeout):
+    """Return (running, waiting) request counts from vLLM's /metrics, or None"""
+    counts = {'vllm:num_requests_running': 0.0, 'vllm:num_requests_waiting': 0.0}
+    try:
+        with _probe_opener.open(url, timeout=timeout) as response:
+            for line in response.read().decode('utf-8', errors='replace').splitlines():
+                name = line.split('{', 1)[0].split(' ', 1)[0]
+                if name in counts:
+                    # Summed over engines when one server runs several
+                    counts[name] += float(line.rsplit(' ', 1)[1])
+    except Exception:
+        return None
+    return (int(counts['vllm:num_requests_running']),
+            int(counts['vllm:num_requests_waiting']))
+
+
+def parse_service_specs(args):
+    """Collect SERVICE_ID=URL pairs from --service and --services-file"""
+    specs = list(args.service or [])
+    if args.services_file:
+        with open(args.services_file) as f:
+            for line in f:
+                fields = line.split()
+                if fields and not fields[0].startswith('#'):
+                    specs.append('='.join(fields[:2]))
+
+    services = {}
+    for spec in specs:
+        service_id, sep, url = spec.partition('=')
+        if not sep or not service_id or not url.strip():
+            raise ValueError(f"invalid service spec '{spec}' (expected SERVICE_ID=URL)")
+        services[service_id] = url.strip()
+    return services
+
+
+def heartbeat_daemon_command(args):
+    """Probe local health URLs and send heartbeats for all of them each tick"""
+    registry = registry_from_args(args)
+
+    try:
+        services = parse_service_specs(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not services:
+        print("Error: no services given (use --service or --services-file)", file=sys.stderr)
+        return 1
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    failures = {service_id: 0 for service_id in services}
+    marked_unhealthy = set()
+    sweeper_holder = default_lease_holder()
+
+    print(f"Heartbeat daemon started for {len(services)} service(s) "
+          f"(interval: {args.interval}s, max failures: {args.max_failures})")
+
+    with ThreadPoolExecutor(max_workers=len(services)) as executor:
+        while not stopping:
+            tick_start = time.time()
+
+            if args.watch_pid:
+                try:
+                    os.kill(args.watch_pid, 0)
+                except ProcessLookupError:
+                    print(f"Process {args.watch_pid} no longer running, stopping heartbeat daemon")
+                    break
+                except PermissionError:
+                    pass
+
+            probes = executor.map(lambda url: probe_health(url, args.probe_timeout),
+                                  services.values())
+
+            alive = []
+            status_changes = {}
+            for service_id, healthy in zip(services, probes):
+                if healthy:
+                    alive.append(service_id)
+                    if service_id in marked_unhealthy:
+                        print(f"Service {service_id} recovered, updating to healthy")
+                        status_changes[service_id] = ServiceStatus.HEALTHY
+                        marked_unhealthy.discard(service_id)
+                    failures[service_id] = 0
+                else:
+                    failures[service_id] += 1
+                    if not args.quiet:
+                        print(f"Health check failed for {service_id} "
+                              f"(failures: {failures[service_id]}/{args.max_failures})")
+                    if (failures[service_id] >= args.max_failures and
+                            service_id not in marked_unhealthy):
+                        print(f"Service {service_id} unhealthy after {args.max_failures} failures")
+                        status_changes[service_id] = ServiceStatus.UNHEALTHY
+                        marked_unhealthy.add(service_id)
+
+            results = registry.heartbeat_many(alive, status_changes=status_changes)
+            missing = [service_id for service_id in alive + list(status_changes)
+                       if not results.get(service_id)]
+            if missing:
+                print(f"Failed to record heartbeat for: {', '.join(missing)}", file=sys.stderr)
+
+            if args.report_load and alive:
+                loads = executor.map(
+                    lambda service_id: probe_load(metrics_url(services[service_id]),
+                                                  args.probe_timeout),
+                    alive)
+                registry.report_loads({service_id: load for service_id, load in zip(alive, loads)
+                                       if load is not None})
+
+            if args.sweep:
+                # Only the node holding the sweeper lease sweeps; the lease
+                # outlives a few missed ticks so a slow tick keeps it
+                swept = registry.sweep_with_lease(sweeper_holder, 3 * args.interval,
+                                                  timeout_seconds=args.sweep_timeout)
+                if swept is not None and swept[0]:
+                    print(f"Sweep marked {swept[0]} stale service(s) as unhealthy")
+
+            # Sleep out the rest of the tick, waking early on SIGTERM
+            remaining = args.interval - (time.time() - tick_start)
+            while remaining > 0 and not stopping:
+                time.sleep(min(remaining, 1.0))
+                remaining = args.interval - (time.time() - tick_start)
+
+    if args.sweep:
+        registry.release_lease('sweeper', sweeper_holder)
+    print("Heartbeat daemon stopped")
+    return 0
+
+
+class BatchLineError(Exception):
+    """Raised when a batch input line cannot be parsed"""
+
+
+class BatchLineParser(argparse.ArgumentParser):
+    """ArgumentParser that raises instead of exiting on bad batch lines"""
+
+    def error(self, message):
+        raise BatchLineError(message)
+
+
+def build_batch_parser():
+    """Parser for the lifecycle commands accepted by batch mode"""
+    parser = BatchLineParser(prog='batch', add_help=False)
+    subparsers = parser.add_subparsers(dest='command', parser_class=BatchLineParser)
+    add_register_arguments(subparsers.add_parser('register', add_help=False))
+    subparsers.add_parser('deregister', add_help=False).add_argument('service_id')
+    add_update_health_arguments(subparsers.add_parser('update-health', add_help=False))
+    subparsers.add_parser('heartbeat', add_help=False).add_argument('service_id')
+    return parser
+
+
+def parse_batch_line(parser, line):
+    """
+    Parse one batch line, either CLI syntax or a JSON object
+
+    Returns:
+        (command, service_id, params) tuple
+    """
+    if line.startswith('{'):
+        try:
+            params = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BatchLineError(f"invalid JSON: {e}")
+        if not isinstance(params, dict):
+            raise BatchLineError("JSON line must be an object")
+        command = params.pop('command', None)
+        if command not in ('register', 'deregister', 'update-health', 'heartbeat'):
+            raise BatchLineError(f"unsupported command: {command}")
+        if not params.get('service_id'):
+            raise BatchLineError("missing service_id")
+        if isinstance(params.get('metadata'), str):
+            params['metadata'] = json.loads(params['metadata'])
+        return command, params['service_id'], params
+
+    try:
+        argv = shlex.split(line)
+    except ValueError as e:
+        raise BatchLineError(str(e))
+    args = parser.parse_args(argv)
+    if args.command is None:
+        raise BatchLineError("missing command")
+    params = dict(vars(args))
+    command = params.pop('command')
+    if params.get('metadata'):
+        try:
+            params['metadata'] = json.loads(params['metadata'])
+        except json.JSONDecodeError:
+            raise BatchLineError("metadata must be valid JSON")
+    return command, params['service_id'], params
+
+
+def queue_batch_command(batch, command, params):
+    """Add a parsed batch line to a RegistryBatch"""
+    if command == 'register':
+        for field in ('host', 'port', 'service_type'):
+            if params.get(field) is None:
+                raise BatchLineError(f"register requires {field}")
+        batch.register_service(ServiceInfo(
+            service_id=params['service_id'],
+            host=params['host'],
+            port=int(params['port']),
+            service_type=params['service_type'],
+            status=params.get('status') or ServiceStatus.HEALTHY.value,
+            metadata=params.get('metadata') or {}
+        ))
+    elif command == 'deregister':
+        batch.deregister_service(params['service_id'])
+    elif command == 'update-health':
+        try:
+            status = ServiceStatus[str(params.get('status')).upper()]
+        except KeyError:
+            raise BatchLineError(f"invalid status: {params.get('status')}")
+        batch.update_health(params['service_id'], status, params.get('metadata'))
+    else:
+        batch.heartbeat(params['service_id'])
+
+
+def batch_command(args):
+    """Run many register/deregister/update-health/heartbeat commands in one pipeline"""
+    registry = registry_from_args(args)
+
+    try:
+        stream = open(args.file) if args.file and args.file != '-' else sys.stdin
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    parser = build_batch_parser()
+    batch = registry.batch()
+    entries = []  # (line_number, command, service_id, error)
+
+    with stream:
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            command = service_id = None
+            try:
+                command, service_id, params = parse_batch_line(parser, line)
+                queue_batch_command(batch, command, params)
+                entries.append((line_number, command, service_id, None))
+            except (BatchLineError, ValueError) as e:
+                entries.append((line_number, command, service_id, str(e)))
+
+    results = iter(batch.execute())
+    failed_count = 0
+
+    for line_number, command, service_id, error in entries:
+        success = error is None and next(results)
+        if not success:
+            failed_count += 1
+            error = error or "operation failed (service not found or Redis error)"
+
+        if args.format == 'json':
+            output = {'line': line_number, 'command': command,
+                      'service_id': service_id, 'success': success}
+            if error:
+                output['error'] = error
+            print(json.dumps(output))
+        elif success:
+            print(f"OK     {command} {service_id}")
+        else:
+            label = ' '.join(part for part in (command, service_id) if part)
+            print(f"FAILED line {line_number}: {label} ({error})", file=sys.stderr)
+
+    if args.format == 'text':
+        print(f"\nSummary: {len(entries) - failed_count} succeeded, {failed_count} failed")
+    return 0 if failed_count == 0 else 1
+
+
 def check_health_command(args):
     """Check health of a service based on heartbeat timeout"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     result = registry.check_health(args.service_id, timeout_seconds=args.timeout)
 
@@ -166,12 +525,7 @@ def check_health_command(args):
 
 def get_command(args):
     """Get service information"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     service = registry.get_service(args.service_id)
     if service:
@@ -203,12 +557,7 @@ def get_command(args):
 
 def list_command(args):
     """List services"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     # Apply filters
     status_filter = None
@@ -248,12 +597,7 @@ def list_command(args):
 
 def list_healthy_command(args):
     """List healthy services"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     services = registry.get_healthy_services(
         service_type=args.service_type,
@@ -286,14 +630,127 @@ def list_healthy_command(args):
     return 0
 
 
+def report_load_command(args):
+    """Publish a service's current load"""
+    registry = registry_from_args(args)
+
+    if registry.report_load(args.service_id, args.running, args.waiting):
+        print(f"Load recorded for service: {args.service_id}")
+        return 0
+    else:
+        print(f"Failed to record load for service: {args.service_id}", file=sys.stderr)
+        return 1
+
+
+def least_loaded_command(args):
+    """List the least-loaded healthy services of a type"""
+    registry = registry_from_args(args)
+
+    services = registry.pick_least_loaded(args.service_type, k=args.count,
+                                          timeout_seconds=args.timeout)
+    loads = registry.get_service_loads(args.service_type) if services else {}
+
+    if args.format == 'json':
+        output = []
+        for service in services:
+            output.append({
+                'service_id': service.service_id,
+                'host': service.host,
+                'port': service.port,
+                'load': loads.get(service.service_id)
+            })
+        print(json.dumps(output, indent=2))
+    else:
+        if not services:
+            print("No healthy services found")
+        else:
+            print(f"{'Service ID':<20} {'Host':<15} {'Port':<6} {'Load':<8}")
+            print("-" * 52)
+            for service in services:
+                load = loads.get(service.service_id)
+                print(f"{service.service_id:<20} {service.host:<15} {service.port:<6} "
+                      f"{'-' if load is None else int(load):<8}")
+
+    return 0
+
+
+def status_durations(history, until: float) -> dict:
+    """Seconds spent in each status according to a service's history entries"""
+    durations = {}
+    status, since = None, None
+    for entry in history:
+        if entry['event'] not in ('register', 'status', 'deregister'):
+            continue
+        if status is not None:
+            durations[status] = durations.get(status, 0.0) + entry['timestamp'] - since
+        status = entry.get('status')
+        since = entry['timestamp']
+    if status is not None:
+        durations[status] = durations.get(status, 0.0) + until - since
+    return durations
+
+
+def history_command(args):
+    """Show a service's recent status transitions and load samples"""
+    registry = registry_from_args(args)
+
+    now = time.time()
+    since = now - args.since if args.since is not None else None
+    history = registry.get_health_history(args.service_id, since=since, count=args.count)
+
+    if args.format == 'json':
+        print(json.dumps(history, indent=2))
+        return 0
+
+    if not history:
+        print(f"No history for service: {args.service_id}")
+        return 0
+
+    for entry in history:
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['timestamp']))
+        if entry['event'] == 'load':
+            detail = f"running={entry['running']} waiting={entry['waiting']}"
+        elif entry['event'] == 'status':
+            detail = f"{entry['previous']} -> {entry['status']}"
+        else:
+            detail = entry.get('status') or entry.get('previous', '')
+        print(f"{stamp} {entry['event']:<11} {detail}")
+
+    durations = status_durations(history, until=now)
+    total = sum(durations.values())
+    if total > 0:
+        print(f"\nTime in status since {time.strftime('%H:%M:%S', time.localtime(history[0]['timestamp']))}:")
+        for status, seconds in sorted(durations.items(), key=lambda item: -item[1]):
+            print(f"  {status:<10} {seconds:>10.1f}s  {100 * seconds / total:5.1f}%")
+    return 0
+
+
+def flapping_command(args):
+    """List services whose status changed repeatedly in a recent window"""
+    registry = registry_from_args(args)
+
+    flapping = registry.get_flapping_services(window_seconds=args.window,
+                                              min_transitions=args.min_transitions,
+                                              service_type=args.service_type)
+
+    if args.format == 'json':
+        print(json.dumps(flapping, indent=2))
+    else:
+        if not flapping:
+            print(f"No services changed status {args.min_transitions}+ times "
+                  f"in the last {args.window}s")
+        else:
+            print(f"{'Service ID':<20} {'Transitions':<12}")
+            print("-" * 32)
+            for service_id, transitions in flapping.items():
+                print(f"{service_id:<20} {transitions:<12}")
+
+    return 0
+
+
 def cleanup_command(args):
     """Cleanup unhealthy services"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     removed = registry.cleanup_unhealthy_services()
     print(f"Removed {removed} unhealthy service(s)")
@@ -302,27 +759,20 @@ def cleanup_command(args):
 
 def mark_unhealthy_command(args):
     """Mark services as unhealthy if no recent heartbeat"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     if args.dry_run:
         # Show what would be marked without actually doing it
-        services = registry.list_services()
+        services = registry.get_stale_services(timeout_seconds=args.timeout)
         current_time = time.time()
         unhealthy_services = []
         
         for service in services:
             if service.status == 'healthy':
-                time_since_seen = current_time - service.last_seen
-                if time_since_seen > args.timeout:
-                    unhealthy_services.append({
-                        'service_id': service.service_id,
-                        'seconds_since_heartbeat': round(time_since_seen, 2)
-                    })
+                unhealthy_services.append({
+                    'service_id': service.service_id,
+                    'seconds_since_heartbeat': round(current_time - service.last_seen, 2)
+                })
         
         if unhealthy_services:
             print(f"Would mark {len(unhealthy_services)} service(s) as unhealthy:")
@@ -337,14 +787,98 @@ def mark_unhealthy_command(args):
     return 0
 
 
+def sweeper_command(args):
+    """Sweep stale services while holding the sweeper lease"""
+    registry = registry_from_args(args)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+
+    holder = default_lease_holder()
+
+    def report(marked, removed):
+        if marked or removed or not args.quiet:
+            print(f"{time.strftime('%H:%M:%S')} marked {marked} unhealthy, removed {removed}",
+                  flush=True)
+
+    print(f"Sweeper {holder} started (interval: {args.interval}s, "
+          f"current lease holder: {registry.get_lease_holder('sweeper') or 'none'})")
+    try:
+        registry.run_sweeper(interval=args.interval, timeout_seconds=args.timeout,
+                             cleanup=args.cleanup, lease_ttl=args.lease_ttl, holder=holder,
+                             stop_event=stop_event, on_sweep=report)
+    except KeyboardInterrupt:
+        pass
+
+    print("Sweeper stopped")
+    return 0
+
+
+def liveness_listener_command(args):
+    """Mark services unhealthy as their liveness keys expire"""
+    registry = registry_from_args(args)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+
+    def report(service_ids):
+        print(f"Marked {len(service_ids)} service(s) as unhealthy: {', '.join(service_ids)}")
+
+    print(f"Liveness listener started on db {args.redis_db} "
+          f"(key prefix: {args.key_prefix or 'none'})")
+    try:
+        registry.run_liveness_listener(stop_event=stop_event, on_expired=report)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print("Liveness listener stopped")
+    return 0
+
+
+def watch_command(args):
+    """Print registry change events as they happen"""
+    registry = registry_from_args(args)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+
+    healthy = set()
+    include_existing = args.existing or args.until_healthy is not None
+    try:
+        for event in registry.watch(service_type=args.service_type,
+                                    include_existing=include_existing,
+                                    timeout=args.timeout, stop_event=stop_event):
+            if args.format == 'json':
+                print(json.dumps(event), flush=True)
+            elif args.existing or event['event'] != 'existing':
+                print(f"{time.strftime('%H:%M:%S')} {event['event']:<13} {event['service_id']:<20} "
+                      f"{event.get('service_type') or '-':<12} {event.get('status', '-')}",
+                      flush=True)
+
+            if args.until_healthy is not None:
+                if event.get('status') == ServiceStatus.HEALTHY.value:
+                    healthy.add(event['service_id'])
+                else:
+                    healthy.discard(event['service_id'])
+                if len(healthy) >= args.until_healthy:
+                    print(f"{len(healthy)} healthy service(s) registered", file=sys.stderr)
+                    return 0
+    except KeyboardInterrupt:
+        pass
+
+    if args.until_healthy is not None:
+        print(f"Timed out with {len(healthy)} of {args.until_healthy} healthy service(s)",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
 def count_command(args):
     """Get service count"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     count = registry.get_service_count(service_type=args.service_type)
     print(count)
@@ -353,12 +887,7 @@ def count_command(args):
 
 def types_command(args):
     """List service types"""
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     types = registry.get_service_types()
     if args.format == 'json':
@@ -378,12 +907,7 @@ def clear_command(args):
             print("Aborted")
             return 0
 
-    registry = ServiceRegistry(
-        redis_host=args.redis_host,
-        redis_port=args.redis_port,
-        redis_db=args.redis_db,
-        key_prefix=args.key_prefix
-    )
+    registry = registry_from_args(args)
 
     if registry.clear_all():
         print("Successfully cleared all service registry data")
@@ -393,6 +917,27 @@ def clear_command(args):
         return 1
 
 
+def add_register_arguments(register_parser):
+    """Arguments shared by the register command and batch mode"""
+    register_parser.add_argument('service_id', help='Service identifier')
+    register_parser.add_argument('--host', required=True, help='Service host')
+    register_parser.add_argument('--port', type=int, required=True, help='Service port')
+    register_parser.add_argument('--service-type', required=True, help='Service type')
+    register_parser.add_argument('--status', default='healthy',
+                                choices=['healthy', 'unhealthy', 'starting', 'stopping', 'unknown'],
+                                help='Initial status (default: healthy)')
+    register_parser.add_argument('--metadata', help='Metadata as JSON string')
+
+
+def add_update_health_arguments(health_parser):
+    """Arguments shared by the update-health command and batch mode"""
+    health_parser.add_argument('service_id', help='Service identifier')
+    health_parser.add_argument('--status', required=True,
+                              choices=['healthy', 'unhealthy', 'starting', 'stopping', 'unknown'],
+                              help='New health status')
+    health_parser.add_argument('--metadata', help='Additional metadata as JSON string')
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Service Registry CLI',
@@ -408,19 +953,27 @@ def main():
                        help='Redis database number (default: 0)')
     parser.add_argument('--key-prefix', default='',
                        help='Prefix for all Redis keys (default: none)')
+    parser.add_argument('--shard', action='append', metavar='HOST:PORT[/DB]',
+                       help='Spread the registry over several Redis shards (repeat for each '
+                            'shard, same order on every client); overrides --redis-host')
+    parser.add_argument('--liveness-ttl', type=float,
+                       help='Refresh a liveness key expiring after this many seconds on '
+                            'heartbeats and registrations (default: off)')
+    parser.add_argument('--metadata-encoding', choices=['json', 'fields'], default='json',
+                       help='Store metadata as one JSON string or one hash field per entry '
+                            '(default: json)')
+    parser.add_argument('--history-maxlen', type=int, default=HISTORY_MAXLEN,
+                       help='Approximate entries kept in each service history stream, 0 to '
+                            f'disable history (default: {HISTORY_MAXLEN})')
+    parser.add_argument('--history-load-interval', type=float,
+                       help='Append a report-load sample to the history at most once per '
+                            'this many seconds (default: no load samples)')
 
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
 
     # Register command
     register_parser = subparsers.add_parser('register', help='Register a service')
-    register_parser.add_argument('service_id', help='Service identifier')
-    register_parser.add_argument('--host', required=True, help='Service host')
-    register_parser.add_argument('--port', type=int, required=True, help='Service port')
-    register_parser.add_argument('--service-type', required=True, help='Service type')
-    register_parser.add_argument('--status', default='healthy',
-                                choices=['healthy', 'unhealthy', 'starting', 'stopping', 'unknown'],
-                                help='Initial status (default: healthy)')
-    register_parser.add_argument('--metadata', help='Metadata as JSON string')
+    add_register_arguments(register_parser)
     register_parser.set_defaults(func=register_command)
 
     # Deregister command
@@ -428,13 +981,29 @@ def main():
     deregister_parser.add_argument('service_id', help='Service identifier (use "all" to deregister all services)')
     deregister_parser.set_defaults(func=deregister_command)
 
+    # Bulk commands
+    register_many_parser = subparsers.add_parser(
+        'register-many', help='Register many services from a JSON file')
+    register_many_parser.add_argument(
+        'file', help='JSON array or JSON lines of service objects '
+                     '(service_id, host, port, service_type, [status], [metadata]); "-" for stdin')
+    register_many_parser.set_defaults(func=register_many_command)
+
+    deregister_many_parser = subparsers.add_parser(
+        'deregister-many', help='Deregister many services')
+    deregister_many_parser.add_argument('service_ids', nargs='+', help='Service identifiers')
+    deregister_many_parser.set_defaults(func=deregister_many_command)
+
+    heartbeat_many_parser = subparsers.add_parser(
+        'heartbeat-many', help='Send heartbeats for many services')
+    heartbeat_many_parser.add_argument('service_ids', nargs='+', help='Service identifiers')
+    heartbeat_many_parser.add_argument('--quiet', '-q', action='store_true',
+                                      help='Only report failures')
+    heartbeat_many_parser.set_defaults(func=heartbeat_many_command)
+
     # Update health command
     health_parser = subparsers.add_parser('update-health', help='Update service health')
-    health_parser.add_argument('service_id', help='Service identifier')
-    health_parser.add_argument('--status', required=True,
-                              choices=['healthy', 'unhealthy', 'starting', 'stopping', 'unknown'],
-                              help='New health status')
-    health_parser.add_argument('--metadata', help='Additional metadata as JSON string')
+    add_update_health_arguments(health_parser)
     health_parser.set_defaults(func=update_health_command)
 
     # Heartbeat command
@@ -444,6 +1013,46 @@ def main():
                                  help='Suppress output')
     heartbeat_parser.set_defaults(func=heartbeat_command)
 
+    # Heartbeat daemon command
+    daemon_parser = subparsers.add_parser('heartbeat-daemon',
+                                          help='Probe health URLs and send heartbeats in a loop')
+    daemon_parser.add_argument('--service', action='append', metavar='SERVICE_ID=URL',
+                              help='Service to monitor and its health URL (repeatable)')
+    daemon_parser.add_argument('--services-file',
+                              help='File with one "SERVICE_ID URL" pair per line')
+    daemon_parser.add_argument('--interval', type=float, default=10,
+                              help='Seconds between ticks (default: 10)')
+    daemon_parser.add_argument('--max-failures', type=int, default=3,
+                              help='Consecutive failed probes before marking unhealthy (default: 3)')
+    daemon_parser.add_argument('--probe-timeout', type=float, default=5,
+                              help='HTTP health probe timeout in seconds (default: 5)')
+    daemon_parser.add_argument('--watch-pid', type=int,
+                              help='Stop when this process exits')
+    daemon_parser.add_argument('--quiet', '-q', action='store_true',
+                              help='Only report status transitions')
+    daemon_parser.add_argument('--report-load', action='store_true',
+                              help="Also publish running/waiting request counts from each "
+                                   "service's vLLM /metrics endpoint")
+    daemon_parser.add_argument('--sweep', action='store_true',
+                              help='Also mark stale services unhealthy each tick while this '
+                                   'daemon holds the sweeper lease (one sweeper at a time '
+                                   'across all daemons)')
+    daemon_parser.add_argument('--sweep-timeout', type=int, default=30,
+                              help='Heartbeat timeout used by --sweep (default: 30)')
+    daemon_parser.set_defaults(func=heartbeat_daemon_command)
+
+    # Batch command
+    batch_parser = subparsers.add_parser(
+        'batch',
+        help='Run register/deregister/update-health/heartbeat lines from stdin or a file'
+    )
+    batch_parser.add_argument('file', nargs='?', default='-',
+                             help='Input file with one command per line, CLI syntax or '
+                                  'JSON objects (default: stdin)')
+    batch_parser.add_argument('--format', choices=['text', 'json'], default='text',
+                             help='Output format for per-command results (default: text)')
+    batch_parser.set_defaults(func=batch_command)
+
     # Check health command
     check_health_parser = subparsers.add_parser('check-health', help='Check service health based on heartbeat timeout')
     check_health_parser.add_argument('service_id', help='Service identifier')
@@ -479,6 +1088,50 @@ def main():
                                 help='Output format (default: text)')
     healthy_parser.set_defaults(func=list_healthy_command)
 
+    # Load commands
+    report_load_parser = subparsers.add_parser('report-load',
+                                               help="Publish a service's outstanding requests")
+    report_load_parser.add_argument('service_id', help='Service identifier')
+    report_load_parser.add_argument('--running', type=int, required=True,
+                                    help='Requests currently being processed')
+    report_load_parser.add_argument('--waiting', type=int, default=0,
+                                    help='Requests waiting in the queue (default: 0)')
+    report_load_parser.set_defaults(func=report_load_command)
+
+    least_loaded_parser = subparsers.add_parser('least-loaded',
+                                                help='List the least-loaded healthy services')
+    least_loaded_parser.add_argument('--service-type', required=True, help='Service type')
+    least_loaded_parser.add_argument('-k', '--count', type=int, default=1,
+                                     help='Number of services to return (default: 1)')
+    least_loaded_parser.add_argument('--timeout', type=int, default=30,
+                                     help='Heartbeat timeout in seconds (default: 30)')
+    least_loaded_parser.add_argument('--format', choices=['text', 'json'], default='text',
+                                     help='Output format (default: text)')
+    least_loaded_parser.set_defaults(func=least_loaded_command)
+
+    # History commands
+    history_parser = subparsers.add_parser('history',
+                                           help="Show a service's status transitions and "
+                                                'load samples')
+    history_parser.add_argument('service_id', help='Service identifier')
+    history_parser.add_argument('--since', type=float, metavar='SECONDS',
+                                help='Only entries from the last SECONDS seconds')
+    history_parser.add_argument('--count', type=int, help='Only the most recent COUNT entries')
+    history_parser.add_argument('--format', choices=['text', 'json'], default='text',
+                                help='Output format (default: text)')
+    history_parser.set_defaults(func=history_command)
+
+    flapping_parser = subparsers.add_parser('flapping',
+                                            help='List services that changed status repeatedly')
+    flapping_parser.add_argument('--window', type=int, default=600,
+                                 help='Look back this many seconds (default: 600)')
+    flapping_parser.add_argument('--min-transitions', type=int, default=3,
+                                 help='Minimum status changes in the window (default: 3)')
+    flapping_parser.add_argument('--service-type', help='Filter by service type')
+    flapping_parser.add_argument('--format', choices=['text', 'json'], default='text',
+                                 help='Output format (default: text)')
+    flapping_parser.set_defaults(func=flapping_command)
+
     # Cleanup command
     cleanup_parser = subparsers.add_parser('cleanup', help='Remove unhealthy services')
     cleanup_parser.set_defaults(func=cleanup_command)
@@ -491,6 +1144,47 @@ def main():
                                       help='Show what would be marked without actually doing it')
     mark_unhealthy_parser.set_defaults(func=mark_unhealthy_command)
 
+    # Sweeper command
+    sweeper_parser = subparsers.add_parser(
+        'sweeper',
+        help='Mark stale services unhealthy in a loop; safe to run on every node, only '
+             'the holder of the sweeper lease sweeps')
+    sweeper_parser.add_argument('--interval', type=float, default=10,
+                                help='Seconds between sweeps (default: 10)')
+    sweeper_parser.add_argument('--timeout', type=int, default=30,
+                                help='Heartbeat timeout in seconds (default: 30)')
+    sweeper_parser.add_argument('--cleanup', action='store_true',
+                                help='Also remove unhealthy services on each sweep')
+    sweeper_parser.add_argument('--lease-ttl', type=float,
+                                help='Seconds before a dead sweeper is replaced '
+                                     '(default: 3 x interval)')
+    sweeper_parser.add_argument('--quiet', '-q', action='store_true',
+                                help='Only report sweeps that changed something')
+    sweeper_parser.set_defaults(func=sweeper_command)
+
+    # Liveness listener command
+    liveness_parser = subparsers.add_parser(
+        'liveness-listener',
+        help='Mark services unhealthy as soon as their liveness keys expire '
+             '(writers must use --liveness-ttl)')
+    liveness_parser.set_defaults(func=liveness_listener_command)
+
+    # Watch command
+    watch_parser = subparsers.add_parser('watch', help='Stream registration, health and '
+                                                       'deregistration events')
+    watch_parser.add_argument('--service-type', help='Filter by service type')
+    watch_parser.add_argument('--existing', action='store_true',
+                              help='Start with one "existing" event per registered service')
+    watch_parser.add_argument('--until-healthy', type=int, metavar='N',
+                              help='Exit 0 once N services (of --service-type) are healthy, '
+                                   '1 if --timeout passes first')
+    watch_parser.add_argument('--timeout', type=float,
+                              help='Stop after this many seconds (default: never)')
+    watch_parser.add_argument('--format', choices=['text', 'json'], default='text',
+                              help='Output format: text or one JSON event per line '
+                                   '(default: text)')
+    watch_parser.set_defaults(func=watch_command)
+
     # Count command
     count_parser = subparsers.add_parser('count', help='Get service count')
     count_parser.add_argument('--service-type', help='Filter by service type')
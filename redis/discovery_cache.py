@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Client-side Discovery Cache for the Service Registry
+
+Keeps the set of healthy services in process memory so clients can pick a
+backend per request without a Redis round trip. A background thread
+subscribes to the registry's services:events channel (published by
+register_service, deregister_service and update_health) and applies changes
+incrementally. Pub/Sub delivery is best effort, so the cache also performs a
+full resync through get_healthy_services() every resync_interval seconds and
+whenever the subscription is re-established.
+
+Heartbeats are not published; services that stop heartbeating drop out of
+the cache once a sweeper marks them unhealthy or at the next resync.
+
+pick_by_key() routes a key to a backend through a consistent hash ring per
+service type, built on first use and updated as services join or leave.
+"""
+
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .service_registry import ServiceRegistry, ServiceInfo, ServiceStatus
+    from .hash_ring import HashRing
+except ImportError:
+    from service_registry import ServiceRegistry, ServiceInfo, ServiceStatus
+    from hash_ring import HashRing
+
+
+class DiscoveryCache:
+    """
+    In-memory view of healthy services kept current through Redis Pub/Sub.
+    Lookups never touch the network.
+    """
+
+    def __init__(self, registry: ServiceRegistry, service_type: Optional[str] = None,
+                 timeout_seconds: int = 30, resync_interval: float = 30.0):
+        """
+        Initialize DiscoveryCache
+
+        Args:
+            registry: ServiceRegistry used for the subscription and resyncs
+            service_type: Only cache services of this type (optional)
+            timeout_seconds: Heartbeat timeout used for full resyncs
+            resync_interval: Seconds between full resyncs
+        """
+        self.registry = registry
+        self.service_type = service_type
+        self.timeout_seconds = timeout_seconds
+        self.resync_interval = resync_interval
+
+        # Snapshots are replaced wholesale, never mutated, so readers need no lock
+        self._services: Dict[str, ServiceInfo] = {}
+        self._by_type: Dict[Optional[str], Tuple[ServiceInfo, ...]] = {None: ()}
+        self._last_resync = 0.0
+
+        # Hash rings are built on the first pick_by_key() for a type; the
+        # lock only serializes ring updates, lookups never take it
+        self._rings: Dict[Optional[str], HashRing] = {}
+        self._rings_lock = threading.Lock()
+
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, wait: bool = True, timeout: Optional[float] = 10.0) -> 'DiscoveryCache':
+        """
+        Start the background listener thread
+
+        Args:
+            wait: Block until the initial resync has completed
+            timeout: Maximum seconds to wait for the initial resync
+
+        Returns:
+            self, for chaining
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="discovery-cache",
+                                            daemon=True)
+            self._thread.start()
+        if wait:
+            self._ready.wait(timeout)
+        return self
+
+    def stop(self):
+        """Stop the background listener thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'DiscoveryCache':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def get_healthy_services(self, service_type: Optional[str] = None) -> List[ServiceInfo]:
+        """
+        Get cached healthy services
+
+        Args:
+            service_type: Filter by service type (optional)
+
+        Returns:
+            List of healthy ServiceInfo objects
+        """
+        return list(self._by_type.get(service_type, ()))
+
+    def get_service(self, service_id: str) -> Optional[ServiceInfo]:
+        """
+        Get a cached healthy service
+
+        Args:
+            service_id: Service identifier
+
+        Returns:
+            ServiceInfo object or None if not cached
+        """
+        return self._services.get(service_id)
+
+    def pick(self, service_type: Optional[str] = None) -> Optional[ServiceInfo]:
+        """
+        Pick a random cached healthy service
+
+        Args:
+            service_type: Filter by service type (optional)
+
+        Returns:
+            ServiceInfo object or None if no healthy service is cached
+        """
+        services = self._by_type.get(service_type)
+        return random.choice(services) if services else None
+
+    def pick_by_key(self, key: str, service_type: Optional[str] = None) -> Optional[ServiceInfo]:
+        """
+        Pick the cached healthy service a key consistently maps to
+
+        The same key maps to the same service for as long as it stays
+        healthy; when services join or leave, only about 1/N of keys move.
+
+        Args:
+            key: Routing key (e.g. a genome_id whose prompts share a prefix)
+            service_type: Filter by service type (optional)
+
+        Returns:
+            ServiceInfo object or None if no healthy service is cached
+        """
+        ring = self._rings.get(service_type)
+        if ring is None:
+            with self._rings_lock:
+                ring = self._rings.get(service_type)
+                if ring is None:
+                    ring = HashRing(s.service_id for s in self._by_type.get(service_type, ()))
+                    self._rings[service_type] = ring
+
+        # The ring is synced just after a new snapshot is swapped in, so fall
+        # back along the ring if the owner is not (or no longer) cached
+        services = self._services
+        for service_id in ring.get_n(key, 3):
+            if service_id in services:
+                return services[service_id]
+        return None
+
+    def resync(self):
+        """Replace the cache with a full get_healthy_services() read"""
+        services = self.registry.get_healthy_services(
+            service_type=self.service_type,
+            timeout_seconds=self.timeout_seconds
+        )
+        self._publish({s.service_id: s for s in services})
+        self._last_resync = time.time()
+        self._ready.set()
+
+    def _publish(self, services: Dict[str, ServiceInfo]):
+        """Swap in a new snapshot and rebuild the per-type index"""
+        by_type: Dict[Optional[str], List[ServiceInfo]] = {None: []}
+        for service in services.values():
+            by_type[None].append(service)
+            by_type.setdefault(service.service_type, []).append(service)
+
+        self._by_type = {key: tuple(value) for key, value in by_type.items()}
+        self._services = services
+
+        with self._rings_lock:
+            for service_type, ring in self._rings.items():
+                ring.sync(s.service_id for s in by_type.get(service_type, ()))
+
+    def _apply(self, events: Dict[str, str]):
+        """Apply the latest event per service to the cache"""
+        refreshed = self.registry.get_services(
+            [sid for sid, event in events.items() if event != 'deregister']
+        )
+        fetched = {s.service_id: s for s in refreshed}
+
+        services = dict(self._services)
+        for service_id in events:
+            service = fetched.get(service_id)
+            if (service is not None and
+                    service.status == ServiceStatus.HEALTHY.value and
+                    (self.service_type is None or service.service_type == self.service_type)):
+                services[service_id] = service
+            else:
+                services.pop(service_id, None)
+        self._publish(services)
+
+    def _drain(self, pubsub, max_messages: int = 1000):
+        """Collect queued events, then apply them in one batched fetch"""
+        events = {}
+        message = pubsub.get_message(timeout=1.0)
+        while message is not None:
+            if message['type'] == 'message':
+                event = json.loads(message['data'])
+                events[event['service_id']] = event['event']
+            if len(events) >= max_messages:
+                break
+            message = pubsub.get_message(timeout=0)
+
+        if events:
+            self._apply(events)
+
+    def _run(self):
+        """Listener loop: subscribe, resync, then apply events until stopped"""
+        channel = self.registry._key("services:events")
+        pubsub = None
+
+        while not self._stop_event.is_set():
+            try:
+                if pubsub is None:
+                    pubsub = self.registry.redis_client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(channel)
+                    # Resync after subscribing so no change falls in between
+                    self.resync()
+
+                self._drain(pubsub)
+
+                if time.time() - self._last_resync >= self.resync_interval:
+                    self.resync()
+            except Exception as e:
+                print(f"Discovery cache error: {e}")
+                if pubsub is not None:
+                    pubsub.close()
+                    pubsub = None
+                self._stop_event.wait(1.0)
+
+        if pubsub is not None:
+            pubsub.close()
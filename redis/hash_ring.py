@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Consistent Hash Ring for affinity routing
+
+Maps keys (e.g. a genome_id whose prompts share a long prefix) to service
+ids so the same key keeps landing on the same backend and benefits from its
+prefix cache. Each service owns `replicas` points on a 64-bit ring; a key
+belongs to the first point at or after its hash. When a service leaves only
+the keys it owned move (about 1/N of them), and a joining service takes over
+about 1/N of the keys from the others.
+
+Hashes use BLAKE2b, so every process (and every client node) builds the
+same ring from the same service ids. Lookups read one immutable snapshot, so
+the ring can be updated from another thread without locking readers.
+"""
+
+import hashlib
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Tuple
+
+
+def _hash(value: str) -> int:
+    """Stable 64-bit hash of a string"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring over service ids with virtual nodes.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 160):
+        """
+        Initialize HashRing
+
+        Args:
+            nodes: Initial service ids
+            replicas: Points per service on the ring; more points spread keys
+                more evenly at the cost of a larger ring
+        """
+        self.replicas = replicas
+        # (sorted points, owner of each point), replaced wholesale on change
+        self._ring: Tuple[Tuple[int, ...], Tuple[str, ...]] = ((), ())
+        self._nodes = frozenset()
+        self.sync(nodes)
+
+    def _points(self, node: str) -> List[Tuple[int, str]]:
+        return [(_hash(f"{node}#{i}"), node) for i in range(self.replicas)]
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    @property
+    def nodes(self) -> frozenset:
+        """Service ids currently on the ring"""
+        return self._nodes
+
+    def add(self, node: str):
+        """Add a service id to the ring (no-op if present)"""
+        self.sync(self._nodes | {node})
+
+    def remove(self, node: str):
+        """Remove a service id from the ring (no-op if absent)"""
+        self.sync(self._nodes - {node})
+
+    def sync(self, nodes: Iterable[str]):
+        """
+        Make the ring contain exactly these service ids
+
+        Only points of added or removed services are hashed; the rest of
+        the ring is reused.
+
+        Args:
+            nodes: Service ids that should be on the ring
+        """
+        nodes = frozenset(nodes)
+        added = nodes - self._nodes
+        removed = self._nodes - nodes
+        if not added and not removed:
+            return
+
+        points, owners = self._ring
+        entries = [(point, owner) for point, owner in zip(points, owners)
+                   if owner not in removed]
+        entries.extend(entry for node in added for entry in self._points(node))
+        # Mostly sorted already, so this is close to a linear merge
+        entries.sort()
+
+        self._ring = (tuple(point for point, _ in entries),
+                      tuple(owner for _, owner in entries))
+        self._nodes = nodes
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get the service id owning a key
+
+        Args:
+            key: Routing key
+
+        Returns:
+            Service id, or None if the ring is empty
+        """
+        points, owners = self._ring
+        if not points:
+            return None
+        index = bisect_left(points, _hash(key))
+        return owners[index % len(owners)]
+
+    def get_n(self, key: str, n: int) -> List[str]:
+        """
+        Get up to n distinct service ids for a key, in ring order
+
+        The first entry is get(key); the rest are where the key would move
+        if the preceding services left, which makes them natural fallbacks.
+
+        Args:
+            key: Routing key
+            n: Number of service ids
+
+        Returns:
+            List of up to n distinct service ids
+        """
+        points, owners = self._ring
+        if not points:
+            return []
+        start = bisect_left(points, _hash(key))
+        result = []
+        for offset in range(len(owners)):
+            owner = owners[(start + offset) % len(owners)]
+            if owner not in result:
+                result.append(owner)
+                if len(result) >= n:
+                    break
+        return result
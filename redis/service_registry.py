@@ -7,19 +7,46 @@ to track service metadata, health status, and enable service discovery.
 
 Data Structure:
 - Hash: service:{service_id} -> {host, port, status, last_seen, metadata}
+  (with metadata_encoding='fields': one m:{name} field per metadata entry)
 - Set: services:active -> set of active service_ids
 - Set: services:type:{type} -> set of service_ids of a specific type
+- Set: services:types -> set of service types with at least one service
+- Sorted Set: services:heartbeat -> service_ids scored by last_seen
+- Sorted Set: services:load:{type} -> service_ids scored by outstanding requests
+- String: services:alive:{service_id} -> liveness key with TTL (liveness mode only)
+- Stream: services:history:{service_id} -> capped log of registrations, status
+  transitions, deregistration and (optionally) load samples
+- String: services:lease:{name} -> holder of a lease (e.g. the sweeper), with TTL
+- Pub/Sub channel: services:events -> JSON register/deregister/update_health events
 """
 
 import redis
 import json
+import os
+import socket
+import threading
 import time
-from typing import Dict, List, Optional, Any
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
 
 
+# Maximum number of commands sent in a single pipeline round trip
+PIPELINE_CHUNK_SIZE = 500
+
+# Hash field prefix for metadata stored with metadata_encoding='fields'
+METADATA_FIELD_PREFIX = 'm:'
+METADATA_ENCODINGS = ('json', 'fields')
+
+# Approximate number of entries kept per service history stream
+HISTORY_MAXLEN = 1000
+
+# Seconds a deregistered service's history stream is kept before it expires
+HISTORY_RETENTION_SECONDS = 24 * 3600
+
+
 class ServiceStatus(Enum):
     """Service health status"""
     HEALTHY = "healthy"
@@ -46,26 +73,456 @@ class ServiceInfo:
         if self.metadata is None:
             self.metadata = {}
 
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary"""
+    def to_dict(self, metadata_encoding: str = 'json') -> Dict[str, Any]:
+        """
+        Convert to dictionary
+
+        Args:
+            metadata_encoding: 'json' stores metadata as one JSON string field,
+                'fields' stores each entry as its own m:{name} field (JSON value)
+        """
         data = asdict(self)
-        # Convert metadata dict to JSON string for Redis storage
-        data['metadata'] = json.dumps(data['metadata'])
+        metadata = data.pop('metadata')
+        if metadata_encoding == 'fields':
+            for name, value in metadata.items():
+                data[METADATA_FIELD_PREFIX + name] = json.dumps(value)
+        else:
+            # Convert metadata dict to JSON string for Redis storage
+            data['metadata'] = json.dumps(metadata)
         data['last_seen'] = str(data['last_seen'])
         data['port'] = str(data['port'])
         return data
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ServiceInfo':
-        """Create from dictionary"""
-        if isinstance(data.get('metadata'), str):
-            data['metadata'] = json.loads(data['metadata'])
+        """Create from dictionary (either metadata encoding)"""
+        data = dict(data)
+        metadata = data.pop('metadata', None) or {}
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        for field in [f for f in data if f.startswith(METADATA_FIELD_PREFIX)]:
+            metadata[field[len(METADATA_FIELD_PREFIX):]] = json.loads(data.pop(field))
+        data['metadata'] = metadata
         data['last_seen'] = float(data['last_seen'])
         data['port'] = int(data['port'])
         return cls(**data)
 
 
-class ServiceRegistry:
+def _history_entry(entry_id: str, fields: Dict[str, str]) -> Dict[str, Any]:
+    """Decode a history stream entry; the entry id carries its server timestamp"""
+    entry: Dict[str, Any] = {'timestamp': int(entry_id.split('-')[0]) / 1000}
+    for name, value in fields.items():
+        entry[name] = int(value) if name in ('running', 'waiting') else value
+    return entry
+
+
+def _register_event(service_info: 'ServiceInfo') -> str:
+    """Build the services:events payload published on registration"""
+    return json.dumps({
+        'event': 'register',
+        'service_id': service_info.service_id,
+        'service_type': service_info.service_type,
+        'status': service_info.status
+    })
+
+
+# Deregistration needs the service type to find the type index, so the
+# lookup and removals run server-side in one atomic round trip.
+# KEYS[1] = service hash, KEYS[2] = active set, KEYS[3] = heartbeat index,
+# KEYS[4] = service types index, KEYS[5] = liveness key, KEYS[6] = history stream
+# ARGV[1] = service_id, ARGV[2] = type set key prefix, ARGV[3] = events channel,
+# ARGV[4] = load index key prefix, ARGV[5] = history MAXLEN (0 = off),
+# ARGV[6] = history retention in seconds
+_DEREGISTER_SCRIPT = """
+local current = redis.call('HMGET', KEYS[1], 'service_type', 'status')
+local service_type = current[1]
+if not service_type then
+    return 0
+end
+redis.call('SREM', KEYS[2], ARGV[1])
+redis.call('SREM', ARGV[2] .. service_type, ARGV[1])
+if redis.call('SCARD', ARGV[2] .. service_type) == 0 then
+    redis.call('SREM', KEYS[4], service_type)
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('ZREM', ARGV[4] .. service_type, ARGV[1])
+redis.call('DEL', KEYS[1], KEYS[5])
+if tonumber(ARGV[5]) > 0 then
+    redis.call('XADD', KEYS[6], 'MAXLEN', '~', ARGV[5], '*',
+               'event', 'deregister', 'previous', current[2])
+    redis.call('EXPIRE', KEYS[6], ARGV[6])
+end
+redis.call('PUBLISH', ARGV[3], cjson.encode({
+    event = 'deregister', service_id = ARGV[1], service_type = service_type
+}))
+return 1
+"""
+
+# Heartbeats only touch services that still exist, so a late heartbeat can
+# never resurrect a deregistered service as a partial hash.
+# KEYS[1] = service hash, KEYS[2] = heartbeat index, KEYS[3] = liveness key
+# ARGV[1] = service_id, ARGV[2] = timestamp, ARGV[3] = liveness TTL in ms (0 = off)
+_HEARTBEAT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'last_seen', ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+if tonumber(ARGV[3]) > 0 then
+    redis.call('SET', KEYS[3], '1', 'PX', ARGV[3])
+end
+return 1
+"""
+
+# The load index is per type, so the type lookup runs server-side. Loads for
+# unknown (deregistered) services are dropped rather than resurrected.
+# A load sample is appended to the history stream when sampling is on and
+# the newest history entry is at least the sample interval old (by the
+# server clock, which also stamps the stream entry ids).
+# KEYS[1] = service hash, KEYS[2] = history stream
+# ARGV[1] = service_id, ARGV[2] = running requests, ARGV[3] = waiting requests,
+# ARGV[4] = load index key prefix, ARGV[5] = history MAXLEN (0 = off),
+# ARGV[6] = load sample interval in ms (0 = off)
+_REPORT_LOAD_SCRIPT = """
+local service_type = redis.call('HGET', KEYS[1], 'service_type')
+if not service_type then
+    return 0
+end
+redis.call('ZADD', ARGV[4] .. service_type, tonumber(ARGV[2]) + tonumber(ARGV[3]), ARGV[1])
+local interval = tonumber(ARGV[6])
+if tonumber(ARGV[5]) > 0 and interval > 0 then
+    local newest = redis.call('XREVRANGE', KEYS[2], '+', '-', 'COUNT', 1)
+    local time = redis.call('TIME')
+    local now_ms = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+    if #newest == 0 or now_ms - tonumber(string.match(newest[1][1], '^%d+')) >= interval then
+        redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[5], '*',
+                   'event', 'load', 'running', ARGV[2], 'waiting', ARGV[3])
+    end
+end
+return 1
+"""
+
+# Walks the load index from least loaded upwards, skipping services that
+# are not healthy or whose heartbeat is older than the cutoff, until k are
+# found. Returns a flat list of service_id, load pairs.
+# KEYS[1] = load index for the service type
+# ARGV[1] = k, ARGV[2] = heartbeat cutoff timestamp, ARGV[3] = service hash key prefix
+_PICK_LEAST_LOADED_SCRIPT = """
+local k = tonumber(ARGV[1])
+local cutoff = tonumber(ARGV[2])
+local window = math.max(k * 2, 16)
+local picked = {}
+local offset = 0
+while #picked < k * 2 do
+    local entries = redis.call('ZRANGE', KEYS[1], offset, offset + window - 1, 'WITHSCORES')
+    if #entries == 0 then
+        break
+    end
+    for j = 1, #entries, 2 do
+        local fields = redis.call('HMGET', ARGV[3] .. entries[j], 'status', 'last_seen')
+        if fields[1] == 'healthy' and tonumber(fields[2]) > cutoff then
+            picked[#picked + 1] = entries[j]
+            picked[#picked + 1] = entries[j + 1]
+            if #picked >= k * 2 then
+                break
+            end
+        end
+    end
+    offset = offset + window
+end
+return picked
+"""
+
+# Status, last_seen and the metadata merge are applied server-side so
+# concurrent writers (health monitor, backend heartbeat loop) cannot lose
+# each other's metadata. Accepts many services per call.
+# With 'fields' encoding only the changed m:{name} fields are written; with
+# 'json' the updated top-level members are spliced into the stored metadata
+# text, so untouched values are never decoded and keep their exact encoding
+# (cjson would turn [] into {} and round numbers to 14 digits), and any
+# m:{name} fields for the updated names are dropped so they cannot shadow it.
+# Status changes are appended to each service's history stream.
+# KEYS[1] = heartbeat index, KEYS[2..n] = service hashes
+# ARGV[1] = status, ARGV[2] = timestamp, ARGV[3] = metadata JSON or '',
+# ARGV[4] = events channel, ARGV[5] = liveness TTL in ms (0 = off),
+# ARGV[6] = liveness key prefix, ARGV[7] = required current status or '',
+# ARGV[8] = metadata encoding ('json' or 'fields'; ARGV[3] maps names to
+# already JSON-encoded values in both),
+# ARGV[9] = history MAXLEN (0 = off), ARGV[10] = history key prefix,
+# ARGV[11..] = service_ids matching KEYS[2..n]
+# Returns a list of 1/0 per service (updated / not found or status mismatch)
+_UPDATE_HEALTH_SCRIPT = """
+-- Returns the JSON object text with the given members replaced or added.
+-- Only the top level is scanned; member values are copied as stored.
+local function merge_json_object(text, updates)
+    local function skip_ws(pos)
+        return string.find(text, '[^ \\t\\r\\n]', pos) or #text + 1
+    end
+    local function string_end(pos)
+        local i = pos + 1
+        while true do
+            local j = string.find(text, '[\\\\"]', i)
+            if not j then
+                error('unterminated string in metadata')
+            end
+            if string.sub(text, j, j) == '"' then
+                return j
+            end
+            i = j + 2
+        end
+    end
+    local function value_end(pos)
+        local depth = 0
+        local i = pos
+        while true do
+            local j = string.find(text, '[%[%]{}",]', i)
+            if not j then
+                error('unterminated metadata object')
+            end
+            local c = string.sub(text, j, j)
+            if c == '"' then
+                j = string_end(j)
+            elseif c == '[' or c == '{' then
+                depth = depth + 1
+            elseif depth == 0 then
+                return j
+            elseif c == ']' or c == '}' then
+                depth = depth - 1
+            end
+            i = j + 1
+        end
+    end
+
+    local parts = {}
+    local seen = {}
+    local pos = skip_ws(1)
+    if string.sub(text, pos, pos) == '{' then
+        pos = skip_ws(pos + 1)
+        while string.sub(text, pos, pos) == '"' do
+            local key_end = string_end(pos)
+            local raw_key = string.sub(text, pos, key_end)
+            local value_start = skip_ws(skip_ws(key_end + 1) + 1)
+            local delimiter = value_end(value_start)
+            local name = cjson.decode(raw_key)
+            local value = updates[name]
+            if value ~= nil then
+                seen[name] = true
+            else
+                value = string.match(string.sub(text, value_start, delimiter - 1), '^(.-)%s*$')
+            end
+            parts[#parts + 1] = raw_key .. ': ' .. value
+            pos = delimiter
+            if string.sub(text, pos, pos) ~= ',' then
+                break
+            end
+            pos = skip_ws(pos + 1)
+        end
+    end
+    for name, value in pairs(updates) do
+        if not seen[name] then
+            parts[#parts + 1] = cjson.encode(name) .. ': ' .. value
+        end
+    end
+    return '{' .. table.concat(parts, ', ') .. '}'
+end
+
+local updates = nil
+local field_args = {}
+local field_names = {}
+if ARGV[3] ~= '' then
+    updates = cjson.decode(ARGV[3])
+    for field, value in pairs(updates) do
+        field_args[#field_args + 1] = 'm:' .. field
+        field_args[#field_args + 1] = value
+        field_names[#field_names + 1] = 'm:' .. field
+    end
+    if #field_names == 0 then
+        updates = nil
+    end
+end
+local refresh_liveness = ARGV[1] == 'healthy' and tonumber(ARGV[5]) > 0
+local record_history = tonumber(ARGV[9]) > 0
+local results = {}
+for i = 2, #KEYS do
+    local service_id = ARGV[i + 9]
+    local current = redis.call('HMGET', KEYS[i], 'status', 'service_type')
+    local current_status = current[1]
+    if current_status and (ARGV[7] == '' or current_status == ARGV[7]) then
+        redis.call('HSET', KEYS[i], 'status', ARGV[1], 'last_seen', ARGV[2])
+        if updates and ARGV[8] == 'fields' then
+            redis.call('HSET', KEYS[i], unpack(field_args))
+        elseif updates then
+            local current = redis.call('HGET', KEYS[i], 'metadata') or ''
+            redis.call('HSET', KEYS[i], 'metadata', merge_json_object(current, updates))
+            redis.call('HDEL', KEYS[i], unpack(field_names))
+        end
+        redis.call('ZADD', KEYS[1], ARGV[2], service_id)
+        if refresh_liveness then
+            redis.call('SET', ARGV[6] .. service_id, '1', 'PX', ARGV[5])
+        end
+        if record_history and current_status ~= ARGV[1] then
+            redis.call('XADD', ARGV[10] .. service_id, 'MAXLEN', '~', ARGV[9], '*',
+                       'event', 'status', 'status', ARGV[1], 'previous', current_status)
+        end
+        redis.call('PUBLISH', ARGV[4], cjson.encode({
+            event = 'update_health', service_id = service_id,
+            service_type = current[2], status = ARGV[1]
+        }))
+        results[#results + 1] = 1
+    else
+        results[#results + 1] = 0
+    end
+end
+return results
+"""
+
+
+# Takes the lease if it is free, or extends it if this holder already has it.
+# KEYS[1] = lease key
+# ARGV[1] = holder, ARGV[2] = lease TTL in ms
+# Returns 1 if the holder has the lease, 0 if someone else does
+_ACQUIRE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# Deletes the lease only if it is still held by this holder.
+# KEYS[1] = lease key
+# ARGV[1] = holder
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def default_lease_holder() -> str:
+    """Lease holder id unique to this process: host:pid:random"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class _RegistryKeys:
+    """
+    Key naming and Lua script arguments shared by ServiceRegistry and
+    AsyncServiceRegistry. Subclasses set key_prefix, liveness_ttl,
+    metadata_encoding and the history settings.
+    """
+
+    key_prefix: str = ''
+    liveness_ttl: Optional[float] = None
+    metadata_encoding: str = 'json'
+    history_maxlen: int = HISTORY_MAXLEN
+    history_load_interval: Optional[float] = None
+
+    def _key(self, key: str) -> str:
+        """Generate prefixed key"""
+        return f"{self.key_prefix}{key}" if self.key_prefix else key
+
+    def _liveness_ttl_ms(self) -> int:
+        """Liveness key TTL in milliseconds, 0 when liveness mode is off"""
+        return int(self.liveness_ttl * 1000) if self.liveness_ttl else 0
+
+    def _encode_metadata(self, metadata: Optional[Dict[str, Any]]) -> str:
+        """Metadata update argument for _UPDATE_HEALTH_SCRIPT"""
+        if not metadata:
+            return ''
+        return json.dumps({name: json.dumps(value) for name, value in metadata.items()})
+
+    def _queue_register(self, pipe, service_info: ServiceInfo) -> int:
+        """Queue the commands that register a service; returns the reply count"""
+        replies = 7
+        service_key = self._key(f"service:{service_info.service_id}")
+        if self.metadata_encoding == 'fields':
+            # Field-level metadata from a previous registration would linger
+            pipe.delete(service_key)
+            replies += 1
+        pipe.hset(service_key, mapping=service_info.to_dict(self.metadata_encoding))
+        pipe.sadd(self._key("services:active"), service_info.service_id)
+        pipe.sadd(self._key(f"services:type:{service_info.service_type}"),
+                  service_info.service_id)
+        pipe.sadd(self._key("services:types"), service_info.service_type)
+        pipe.zadd(self._key("services:heartbeat"),
+                  {service_info.service_id: service_info.last_seen})
+        # New services join the load index idle; re-registration keeps the last report
+        pipe.zadd(self._key(f"services:load:{service_info.service_type}"),
+                  {service_info.service_id: 0}, nx=True)
+        pipe.publish(self._key("services:events"), _register_event(service_info))
+        if self.history_maxlen:
+            history_key = self._key(f"services:history:{service_info.service_id}")
+            pipe.xadd(history_key, {'event': 'register', 'status': service_info.status},
+                      maxlen=self.history_maxlen, approximate=True)
+            # Undo the expiry set when the service was last deregistered
+            pipe.persist(history_key)
+            replies += 2
+        if self.liveness_ttl and service_info.status == ServiceStatus.HEALTHY.value:
+            pipe.set(self._key(f"services:alive:{service_info.service_id}"), 1,
+                     px=self._liveness_ttl_ms())
+            replies += 1
+        return replies
+
+    def _deregister_call(self, service_id: str) -> Dict[str, List[str]]:
+        """Keys and args for _DEREGISTER_SCRIPT"""
+        return {
+            'keys': [self._key(f"service:{service_id}"), self._key("services:active"),
+                     self._key("services:heartbeat"), self._key("services:types"),
+                     self._key(f"services:alive:{service_id}"),
+                     self._key(f"services:history:{service_id}")],
+            'args': [service_id, self._key("services:type:"), self._key("services:events"),
+                     self._key("services:load:"), self.history_maxlen,
+                     HISTORY_RETENTION_SECONDS]
+        }
+
+    def _report_load_call(self, service_id: str, running: int,
+                          waiting: int) -> Dict[str, List[str]]:
+        """Keys and args for _REPORT_LOAD_SCRIPT"""
+        interval_ms = int(self.history_load_interval * 1000) if self.history_load_interval else 0
+        return {
+            'keys': [self._key(f"service:{service_id}"),
+                     self._key(f"services:history:{service_id}")],
+            'args': [service_id, running, waiting, self._key("services:load:"),
+                     self.history_maxlen, interval_ms]
+        }
+
+    def _pick_least_loaded_call(self, service_type: str, k: int,
+                                cutoff: float) -> Dict[str, List[str]]:
+        """Keys and args for _PICK_LEAST_LOADED_SCRIPT"""
+        return {
+            'keys': [self._key(f"services:load:{service_type}")],
+            'args': [k, cutoff, self._key("service:")]
+        }
+
+    def _heartbeat_call(self, service_id: str, now: str) -> Dict[str, List[str]]:
+        """Keys and args for _HEARTBEAT_SCRIPT"""
+        return {
+            'keys': [self._key(f"service:{service_id}"), self._key("services:heartbeat"),
+                     self._key(f"services:alive:{service_id}")],
+            'args': [service_id, now, self._liveness_ttl_ms()]
+        }
+
+    def _update_health_call(self, service_ids: List[str], status: ServiceStatus,
+                            metadata_json: str, now: str,
+                            expected_status: Optional[ServiceStatus] = None) -> Dict[str, List[str]]:
+        """Keys and args for _UPDATE_HEALTH_SCRIPT"""
+        return {
+            'keys': [self._key("services:heartbeat")] +
+                    [self._key(f"service:{sid}") for sid in service_ids],
+            'args': [status.value, now, metadata_json, self._key("services:events"),
+                     self._liveness_ttl_ms(), self._key("services:alive:"),
+                     expected_status.value if expected_status else '',
+                     self.metadata_encoding, self.history_maxlen,
+                     self._key("services:history:")] +
+                    list(service_ids)
+        }
+
+
+class ServiceRegistry(_RegistryKeys):
     """
     Service Registry for managing service registration, health tracking,
     and service discovery using Redis.
@@ -73,7 +530,11 @@ class ServiceRegistry:
 
     def __init__(self, redis_host: str = 'localhost', redis_port: int = 6379,
                  redis_db: int = 0, redis_password: Optional[str] = None,
-                 key_prefix: str = ''):
+                 key_prefix: str = '', liveness_ttl: Optional[float] = None,
+                 metadata_encoding: str = 'json',
+                 connection_pool: Optional[redis.ConnectionPool] = None,
+                 history_maxlen: int = HISTORY_MAXLEN,
+                 history_load_interval: Optional[float] = None):
         """
         Initialize ServiceRegistry
 
@@ -83,19 +544,57 @@ class ServiceRegistry:
             redis_db: Redis database number
             redis_password: Redis password (if required)
             key_prefix: Prefix for all Redis keys
+            liveness_ttl: Enable liveness mode: heartbeats (and healthy status
+                writes) refresh a per-service key that expires after this many
+                seconds; see run_liveness_listener()
+            metadata_encoding: 'json' (one metadata string per service) or
+                'fields' (one hash field per metadata entry, so updates and
+                get_metadata() touch only the named fields)
+            connection_pool: Existing redis.ConnectionPool to use instead of
+                connecting to redis_host (must use decode_responses=True)
+            history_maxlen: Approximate number of entries kept in each
+                service's history stream (0 disables history)
+            history_load_interval: Also append a report_load() sample to the
+                history stream when the newest entry is at least this many
+                seconds old (default: no load samples)
         """
-        self.redis_client = redis.Redis(
-            host=redis_host,
-            port=redis_port,
-            db=redis_db,
-            password=redis_password,
-            decode_responses=True
-        )
+        if metadata_encoding not in METADATA_ENCODINGS:
+            raise ValueError(f"metadata_encoding must be one of {METADATA_ENCODINGS}")
+
+        if connection_pool is not None:
+            self.redis_client = redis.Redis(connection_pool=connection_pool)
+        else:
+            self.redis_client = redis.Redis(
+                host=redis_host,
+                port=redis_port,
+                db=redis_db,
+                password=redis_password,
+                decode_responses=True
+            )
+        self.redis_db = (redis_db if connection_pool is None
+                         else connection_pool.connection_kwargs.get('db', 0))
         self.key_prefix = key_prefix
+        self.liveness_ttl = liveness_ttl
+        self.metadata_encoding = metadata_encoding
+        self.history_maxlen = history_maxlen
+        self.history_load_interval = history_load_interval
+        self._deregister_script = self.redis_client.register_script(_DEREGISTER_SCRIPT)
+        self._heartbeat_script = self.redis_client.register_script(_HEARTBEAT_SCRIPT)
+        self._update_health_script = self.redis_client.register_script(_UPDATE_HEALTH_SCRIPT)
+        self._report_load_script = self.redis_client.register_script(_REPORT_LOAD_SCRIPT)
+        self._pick_least_loaded_script = self.redis_client.register_script(
+            _PICK_LEAST_LOADED_SCRIPT)
+        self._acquire_lease_script = self.redis_client.register_script(_ACQUIRE_LEASE_SCRIPT)
+        self._release_lease_script = self.redis_client.register_script(_RELEASE_LEASE_SCRIPT)
+
+    def batch(self) -> 'RegistryBatch':
+        """
+        Start a batch of registry writes sent together in pipelined transactions
 
-    def _key(self, key: str) -> str:
-        """Generate prefixed key"""
-        return f"{self.key_prefix}{key}" if self.key_prefix else key
+        Returns:
+            RegistryBatch to queue operations on; call execute() to send them
+        """
+        return RegistryBatch(self)
 
     def register_service(self, service_info: ServiceInfo) -> bool:
         """
@@ -108,24 +607,35 @@ class ServiceRegistry:
             bool: True if successful
         """
         try:
-            service_key = self._key(f"service:{service_info.service_id}")
-            active_set = self._key("services:active")
-            type_set = self._key(f"services:type:{service_info.service_type}")
-
-            # Store service info in hash
-            self.redis_client.hset(service_key, mapping=service_info.to_dict())
-
-            # Add to active services set
-            self.redis_client.sadd(active_set, service_info.service_id)
-
-            # Add to type-specific set
-            self.redis_client.sadd(type_set, service_info.service_id)
+            # Hash and index entries are written in one MULTI/EXEC so a
+            # registration is a single round trip and never partial
+            pipe = self.redis_client.pipeline(transaction=True)
+            self._queue_register(pipe, service_info)
+            pipe.execute()
 
             return True
         except Exception as e:
             print(f"Error registering service: {e}")
             return False
 
+    def register_many(self, services: List[ServiceInfo]) -> Dict[str, bool]:
+        """
+        Register many services in chunked MULTI/EXEC pipelines
+
+        Each chunk of PIPELINE_CHUNK_SIZE registrations is one round trip, so a
+        launcher can register a whole fleet in a handful of calls.
+
+        Args:
+            services: ServiceInfo objects to register
+
+        Returns:
+            Dictionary mapping service_id to True if registered
+        """
+        batch = self.batch()
+        for service_info in services:
+            batch.register_service(service_info)
+        return dict(zip((s.service_id for s in services), batch.execute()))
+
     def deregister_service(self, service_id: str) -> bool:
         """
         Deregister a service
@@ -137,27 +647,29 @@ class ServiceRegistry:
             bool: True if successful
         """
         try:
-            # Get service info first to know its type
-            service_info = self.get_service(service_id)
-            if not service_info:
-                return False
-
-            service_key = self._key(f"service:{service_id}")
-            active_set = self._key("services:active")
-            type_set = self._key(f"services:type:{service_info.service_type}")
-
-            # Remove from all sets
-            self.redis_client.srem(active_set, service_id)
-            self.redis_client.srem(type_set, service_id)
-
-            # Delete service hash
-            self.redis_client.delete(service_key)
-
-            return True
+            # Type lookup, set removals and hash delete run atomically in Redis
+            removed = self._deregister_script(**self._deregister_call(service_id))
+            return bool(removed)
         except Exception as e:
             print(f"Error deregistering service: {e}")
             return False
 
+    def deregister_many(self, service_ids: List[str]) -> Dict[str, bool]:
+        """
+        Deregister many services in chunked pipelines
+
+        Args:
+            service_ids: Service identifiers
+
+        Returns:
+            Dictionary mapping service_id to True if removed, False if not found
+        """
+        service_ids = list(service_ids)
+        batch = self.batch()
+        for service_id in service_ids:
+            batch.deregister_service(service_id)
+        return dict(zip(service_ids, batch.execute()))
+
     def update_health(self, service_id: str, status: ServiceStatus,
                      metadata: Optional[Dict[str, Any]] = None) -> bool:
         """
@@ -171,35 +683,53 @@ class ServiceRegistry:
         Returns:
             bool: True if successful
         """
-        try:
-            service_key = self._key(f"service:{service_id}")
+        results = self.update_health_many([service_id], status, metadata)
+        if service_id not in results:
+            return False
 
-            # Check if service exists
-            if not self.redis_client.exists(service_key):
-                print(f"Service {service_id} not found")
-                return False
+        if not results[service_id]:
+            print(f"Service {service_id} not found")
+        return results[service_id]
 
-            # Update status and last_seen
-            updates = {
-                'status': status.value,
-                'last_seen': str(time.time())
-            }
+    def update_health_many(self, service_ids: List[str], status: ServiceStatus,
+                           metadata: Optional[Dict[str, Any]] = None,
+                           expected_status: Optional[ServiceStatus] = None) -> Dict[str, bool]:
+        """
+        Update health status for many services in one server-side script call
 
-            # Update metadata if provided
-            if metadata:
-                current_metadata = self.redis_client.hget(service_key, 'metadata')
-                if current_metadata:
-                    current_metadata = json.loads(current_metadata)
-                    current_metadata.update(metadata)
-                else:
-                    current_metadata = metadata
-                updates['metadata'] = json.dumps(current_metadata)
+        The existence check, status update, last_seen stamp and metadata merge
+        run atomically in Redis, one EVALSHA per PIPELINE_CHUNK_SIZE services.
+        Only the updated metadata entries are rewritten; the others keep their
+        stored JSON text exactly.
 
-            self.redis_client.hset(service_key, mapping=updates)
-            return True
+        Args:
+            service_ids: Service identifiers
+            status: New health status
+            metadata: Optional additional metadata merged into each service
+            expected_status: Only update services currently in this status
+
+        Returns:
+            Dictionary mapping service_id to True if updated, False if not found
+            (or not in expected_status)
+        """
+        try:
+            service_ids = list(service_ids)
+            metadata_json = self._encode_metadata(metadata)
+            now = str(time.time())
+            results = {}
+
+            for start in range(0, len(service_ids), PIPELINE_CHUNK_SIZE):
+                chunk = service_ids[start:start + PIPELINE_CHUNK_SIZE]
+                updated = self._update_health_script(
+                    **self._update_health_call(chunk, status, metadata_json, now,
+                                               expected_status)
+                )
+                results.update(zip(chunk, (bool(u) for u in updated)))
+
+            return results
         except Exception as e:
             print(f"Error updating health: {e}")
-            return False
+            return {}
 
     def heartbeat(self, service_id: str) -> bool:
         """
@@ -212,17 +742,67 @@ class ServiceRegistry:
             bool: True if successful
         """
         try:
-            service_key = self._key(f"service:{service_id}")
-
-            if not self.redis_client.exists(service_key):
-                return False
-
-            self.redis_client.hset(service_key, 'last_seen', str(time.time()))
-            return True
+            return bool(self._heartbeat_script(
+                **self._heartbeat_call(service_id, str(time.time()))
+            ))
         except Exception as e:
             print(f"Error recording heartbeat: {e}")
             return False
 
+    def heartbeat_many(self, service_ids: List[str],
+                       status_changes: Optional[Dict[str, ServiceStatus]] = None) -> Dict[str, bool]:
+        """
+        Record heartbeats for many services using pipelined script calls
+
+        Status transitions (e.g. from a health monitor) can be included and are
+        applied with the update_health script in the first pipeline, so a whole
+        monitoring tick costs one round trip per PIPELINE_CHUNK_SIZE services.
+
+        Args:
+            service_ids: Service identifiers to heartbeat
+            status_changes: Optional mapping of service_id to new status
+
+        Returns:
+            Dictionary mapping service_id to True if recorded, False if not found
+        """
+        try:
+            service_ids = list(service_ids)
+            now = str(time.time())
+            results = {}
+
+            # Group transitions so each status is one multi-service script call
+            by_status: Dict[ServiceStatus, List[str]] = {}
+            for service_id, status in (status_changes or {}).items():
+                by_status.setdefault(status, []).append(service_id)
+            status_calls = [(status, ids[start:start + PIPELINE_CHUNK_SIZE])
+                            for status, ids in by_status.items()
+                            for start in range(0, len(ids), PIPELINE_CHUNK_SIZE)]
+
+            chunks = [service_ids[start:start + PIPELINE_CHUNK_SIZE]
+                      for start in range(0, len(service_ids), PIPELINE_CHUNK_SIZE)]
+            if not chunks and status_calls:
+                chunks = [[]]
+
+            for index, chunk in enumerate(chunks):
+                pipe = self.redis_client.pipeline(transaction=False)
+                for service_id in chunk:
+                    self._heartbeat_script(**self._heartbeat_call(service_id, now), client=pipe)
+                calls = status_calls if index == 0 else []
+                for status, ids in calls:
+                    self._update_health_script(
+                        **self._update_health_call(ids, status, '', now), client=pipe
+                    )
+
+                replies = pipe.execute()
+                results.update(zip(chunk, (bool(r) for r in replies[:len(chunk)])))
+                for (status, ids), updated in zip(calls, replies[len(chunk):]):
+                    results.update(zip(ids, (bool(u) for u in updated)))
+
+            return results
+        except Exception as e:
+            print(f"Error recording heartbeats: {e}")
+            return {}
+
     def get_service(self, service_id: str) -> Optional[ServiceInfo]:
         """
         Get service information
@@ -245,6 +825,79 @@ class ServiceRegistry:
             print(f"Error getting service: {e}")
             return None
 
+    def get_services(self, service_ids: List[str]) -> List[ServiceInfo]:
+        """
+        Get information for many services using pipelined HGETALL calls
+
+        Hashes are fetched in chunks of PIPELINE_CHUNK_SIZE, so the cost is a
+        handful of round trips regardless of how many services are requested.
+
+        Args:
+            service_ids: Service identifiers
+
+        Returns:
+            List of ServiceInfo objects for the services that exist
+        """
+        try:
+            service_ids = list(service_ids)
+            services = []
+
+            for start in range(0, len(service_ids), PIPELINE_CHUNK_SIZE):
+                pipe = self.redis_client.pipeline(transaction=False)
+                for service_id in service_ids[start:start + PIPELINE_CHUNK_SIZE]:
+                    pipe.hgetall(self._key(f"service:{service_id}"))
+
+                for data in pipe.execute():
+                    if data:
+                        services.append(ServiceInfo.from_dict(data))
+
+            return services
+        except Exception as e:
+            print(f"Error getting services: {e}")
+            return []
+
+    def get_metadata(self, service_id: str,
+                     fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a service's metadata, or only some of its entries
+
+        With metadata_encoding='fields' only the requested entries are read
+        and decoded, which keeps per-request reads of load metrics cheap.
+
+        Args:
+            service_id: Service identifier
+            fields: Metadata names to fetch (optional, default all)
+
+        Returns:
+            Dictionary of metadata (requested names that are not set are
+            omitted) or None if the service is not found
+        """
+        try:
+            service_key = self._key(f"service:{service_id}")
+            if not fields:
+                data = self.redis_client.hgetall(service_key)
+                return ServiceInfo.from_dict(data).metadata if data else None
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.exists(service_key)
+            pipe.hmget(service_key, [METADATA_FIELD_PREFIX + name for name in fields])
+            pipe.hget(service_key, 'metadata')
+            exists, values, blob = pipe.execute()
+            if not exists:
+                return None
+
+            metadata = {}
+            if blob and any(value is None for value in values):
+                fallback = json.loads(blob)
+                metadata = {name: fallback[name] for name in fields if name in fallback}
+            for name, value in zip(fields, values):
+                if value is not None:
+                    metadata[name] = json.loads(value)
+            return metadata
+        except Exception as e:
+            print(f"Error getting metadata: {e}")
+            return None
+
     def check_health(self, service_id: str, timeout_seconds: int = 30) -> Dict[str, Any]:
         """
         Check health of a registered service by comparing last heartbeat with current time
@@ -312,13 +965,11 @@ class ServiceRegistry:
                 active_set = self._key("services:active")
                 service_ids = self.redis_client.smembers(active_set)
 
-            services = []
-            for service_id in service_ids:
-                service_info = self.get_service(service_id)
-                if service_info:
-                    # Apply status filter if specified
-                    if status_filter is None or service_info.status == status_filter.value:
-                        services.append(service_info)
+            services = self.get_services(service_ids)
+
+            # Apply status filter if specified
+            if status_filter is not None:
+                services = [s for s in services if s.status == status_filter.value]
 
             return services
         except Exception as e:
@@ -337,17 +988,211 @@ class ServiceRegistry:
         Returns:
             List of healthy ServiceInfo objects
         """
-        services = self.list_services(service_type=service_type)
-        current_time = time.time()
-        healthy_services = []
+        try:
+            # Only services with a heartbeat inside the window are fetched
+            cutoff = time.time() - timeout_seconds
+            heartbeat_index = self._key("services:heartbeat")
 
-        for service in services:
-            time_since_seen = current_time - service.last_seen
-            if (service.status == ServiceStatus.HEALTHY.value and
-                time_since_seen < timeout_seconds):
-                healthy_services.append(service)
+            if service_type:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.zrangebyscore(heartbeat_index, f"({cutoff}", "+inf")
+                pipe.smembers(self._key(f"services:type:{service_type}"))
+                fresh_ids, type_ids = pipe.execute()
+                fresh_ids = [sid for sid in fresh_ids if sid in type_ids]
+            else:
+                fresh_ids = self.redis_client.zrangebyscore(heartbeat_index, f"({cutoff}", "+inf")
 
-        return healthy_services
+            return [s for s in self.get_services(fresh_ids)
+                    if s.status == ServiceStatus.HEALTHY.value and s.last_seen > cutoff]
+        except Exception as e:
+            print(f"Error getting healthy services: {e}")
+            return []
+
+    def report_load(self, service_id: str, running: int, waiting: int = 0) -> bool:
+        """
+        Publish a service's current load to its type's load index
+
+        Args:
+            service_id: Service identifier
+            running: Requests currently being processed
+            waiting: Requests queued behind them
+
+        Returns:
+            bool: True if recorded, False if the service is not registered
+        """
+        results = self.report_loads({service_id: (running, waiting)})
+        return results.get(service_id, False)
+
+    def report_loads(self, loads: Dict[str, Tuple[int, int]]) -> Dict[str, bool]:
+        """
+        Publish loads for many services using pipelined script calls
+
+        Args:
+            loads: Dictionary mapping service_id to (running, waiting) request counts
+
+        Returns:
+            Dictionary mapping service_id to True if recorded, False if not found
+        """
+        try:
+            items = list(loads.items())
+            results = {}
+
+            for start in range(0, len(items), PIPELINE_CHUNK_SIZE):
+                chunk = items[start:start + PIPELINE_CHUNK_SIZE]
+                pipe = self.redis_client.pipeline(transaction=False)
+                for service_id, (running, waiting) in chunk:
+                    self._report_load_script(
+                        **self._report_load_call(service_id, running, waiting), client=pipe)
+                replies = pipe.execute()
+                results.update(zip((service_id for service_id, _ in chunk),
+                                   (bool(r) for r in replies)))
+
+            return results
+        except Exception as e:
+            print(f"Error reporting load: {e}")
+            return {}
+
+    def get_service_loads(self, service_type: str) -> Dict[str, float]:
+        """
+        Get the last reported load of every service of a type
+
+        Args:
+            service_type: Service type
+
+        Returns:
+            Dictionary mapping service_id to outstanding requests, least loaded first
+        """
+        try:
+            return dict(self.redis_client.zrange(
+                self._key(f"services:load:{service_type}"), 0, -1, withscores=True))
+        except Exception as e:
+            print(f"Error getting service loads: {e}")
+            return {}
+
+    def pick_least_loaded(self, service_type: str, k: int = 1,
+                          timeout_seconds: int = 30) -> List[ServiceInfo]:
+        """
+        Get the k least-loaded healthy services of a type
+
+        Selection runs server-side over the per-type load index, so the cost
+        is one script call plus one pipelined fetch of the k winners. Loads
+        are only as fresh as the last report_load(); callers routing many
+        requests between reports should pick k > 1 and spread across the
+        result to avoid all converging on the same backend.
+
+        Args:
+            service_type: Service type
+            k: Number of services to return
+            timeout_seconds: Skip services with no heartbeat in this many seconds
+
+        Returns:
+            Up to k healthy ServiceInfo objects, least loaded first
+        """
+        try:
+            picked = self._pick_least_loaded_ids(service_type, k, timeout_seconds)
+            return self.get_services([service_id for service_id, _ in picked])
+        except Exception as e:
+            print(f"Error picking least loaded services: {e}")
+            return []
+
+    def _pick_least_loaded_ids(self, service_type: str, k: int,
+                               timeout_seconds: int) -> List[Tuple[str, float]]:
+        """(service_id, load) pairs of the k least-loaded healthy services"""
+        cutoff = time.time() - timeout_seconds
+        picked = self._pick_least_loaded_script(
+            **self._pick_least_loaded_call(service_type, k, cutoff))
+        return list(zip(picked[0::2], (float(load) for load in picked[1::2])))
+
+    def get_health_history(self, service_id: str, since: Optional[float] = None,
+                           count: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get a service's recent history, oldest first
+
+        Entries are dictionaries with a 'timestamp' (server time, seconds) and
+        an 'event': 'register' (with 'status'), 'status' (a transition, with
+        'status' and 'previous'), 'load' (with 'running' and 'waiting') or
+        'deregister' (with 'previous'). A deregistered service's history is
+        kept for HISTORY_RETENTION_SECONDS.
+
+        Args:
+            service_id: Service identifier
+            since: Only entries at or after this Unix timestamp (optional)
+            count: Only the most recent count entries (optional)
+
+        Returns:
+            List of history entries (empty if there is no history)
+        """
+        try:
+            history_key = self._key(f"services:history:{service_id}")
+            start = int(since * 1000) if since is not None else '-'
+            entries = self.redis_client.xrevrange(history_key, '+', start, count=count)
+            return [_history_entry(entry_id, fields) for entry_id, fields in reversed(entries)]
+        except Exception as e:
+            print(f"Error getting health history: {e}")
+            return []
+
+    def get_flapping_services(self, window_seconds: int = 600, min_transitions: int = 3,
+                              service_type: Optional[str] = None) -> Dict[str, int]:
+        """
+        Find services whose status changed repeatedly in a recent window
+
+        Reads each registered service's history stream for the window, one
+        pipelined XRANGE per service and PIPELINE_CHUNK_SIZE per round trip.
+
+        Args:
+            window_seconds: Look back this many seconds
+            min_transitions: Report services with at least this many status changes
+            service_type: Filter by service type (optional)
+
+        Returns:
+            Dictionary mapping service_id to its number of status changes in the
+            window, most changes first
+        """
+        try:
+            if service_type:
+                service_ids = list(self.redis_client.smembers(
+                    self._key(f"services:type:{service_type}")))
+            else:
+                service_ids = list(self.redis_client.smembers(self._key("services:active")))
+
+            start = int((time.time() - window_seconds) * 1000)
+            flapping = {}
+            for offset in range(0, len(service_ids), PIPELINE_CHUNK_SIZE):
+                chunk = service_ids[offset:offset + PIPELINE_CHUNK_SIZE]
+                pipe = self.redis_client.pipeline(transaction=False)
+                for service_id in chunk:
+                    pipe.xrange(self._key(f"services:history:{service_id}"), start, '+')
+                for service_id, entries in zip(chunk, pipe.execute()):
+                    transitions = sum(1 for _, fields in entries if fields.get('event') == 'status')
+                    if transitions >= min_transitions:
+                        flapping[service_id] = transitions
+
+            return dict(sorted(flapping.items(), key=lambda item: (-item[1], item[0])))
+        except Exception as e:
+            print(f"Error finding flapping services: {e}")
+            return {}
+
+    def get_stale_services(self, timeout_seconds: int = 30) -> List[ServiceInfo]:
+        """
+        Get services that have not sent a heartbeat in a while
+
+        Uses the heartbeat index, so only the stale services are fetched.
+
+        Args:
+            timeout_seconds: Consider service stale if no heartbeat in this many seconds
+
+        Returns:
+            List of stale ServiceInfo objects (any status)
+        """
+        try:
+            cutoff = time.time() - timeout_seconds
+            stale_ids = self.redis_client.zrangebyscore(
+                self._key("services:heartbeat"), "-inf", f"({cutoff}"
+            )
+            return [s for s in self.get_services(stale_ids) if s.last_seen < cutoff]
+        except Exception as e:
+            print(f"Error getting stale services: {e}")
+            return []
 
     def cleanup_unhealthy_services(self) -> int:
         """
@@ -363,9 +1208,12 @@ class ServiceRegistry:
             services = self.list_services(status_filter=ServiceStatus.UNHEALTHY)
             removed_count = 0
 
-            for service in services:
-                if self.deregister_service(service.service_id):
-                    removed_count += 1
+            for start in range(0, len(services), PIPELINE_CHUNK_SIZE):
+                pipe = self.redis_client.pipeline(transaction=False)
+                for service in services[start:start + PIPELINE_CHUNK_SIZE]:
+                    self._deregister_script(**self._deregister_call(service.service_id),
+                                            client=pipe)
+                removed_count += sum(1 for removed in pipe.execute() if removed)
 
             return removed_count
         except Exception as e:
@@ -386,25 +1234,266 @@ class ServiceRegistry:
             Number of services marked as unhealthy
         """
         try:
-            services = self.list_services()
-            current_time = time.time()
-            marked_count = 0
-            
-            for service in services:
-                # Only mark currently healthy services
-                if service.status != ServiceStatus.HEALTHY.value:
-                    continue
-                
-                time_since_seen = current_time - service.last_seen
-                if time_since_seen > timeout_seconds:
-                    if self.update_health(service.service_id, ServiceStatus.UNHEALTHY):
-                        marked_count += 1
-            
-            return marked_count
+            # Only mark currently healthy services
+            stale_ids = [s.service_id for s in self.get_stale_services(timeout_seconds)
+                         if s.status == ServiceStatus.HEALTHY.value]
+            if not stale_ids:
+                return 0
+
+            results = self.update_health_many(stale_ids, ServiceStatus.UNHEALTHY,
+                                              expected_status=ServiceStatus.HEALTHY)
+            return sum(1 for updated in results.values() if updated)
         except Exception as e:
             print(f"Error marking unhealthy services: {e}")
             return 0
 
+    def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        """
+        Take a named lease, or renew it if holder already has it
+
+        A lease is a key set with SET NX PX, so at most one holder has it at
+        a time. The holder must renew it well within ttl_seconds; if the
+        holder dies the lease expires and another process can take it.
+
+        Args:
+            name: Lease name (e.g. 'sweeper')
+            holder: Unique id of the caller (see default_lease_holder())
+            ttl_seconds: Lease duration from now
+
+        Returns:
+            bool: True if holder has the lease
+        """
+        try:
+            return bool(self._acquire_lease_script(
+                keys=[self._key(f"services:lease:{name}")],
+                args=[holder, int(ttl_seconds * 1000)]
+            ))
+        except Exception as e:
+            print(f"Error acquiring lease: {e}")
+            return False
+
+    def release_lease(self, name: str, holder: str) -> bool:
+        """
+        Give up a named lease so another process can take it immediately
+
+        Args:
+            name: Lease name
+            holder: Id the lease was acquired with
+
+        Returns:
+            bool: True if the lease was held by holder and released
+        """
+        try:
+            return bool(self._release_lease_script(
+                keys=[self._key(f"services:lease:{name}")], args=[holder]))
+        except Exception as e:
+            print(f"Error releasing lease: {e}")
+            return False
+
+    def get_lease_holder(self, name: str) -> Optional[str]:
+        """
+        Get the current holder of a named lease
+
+        Args:
+            name: Lease name
+
+        Returns:
+            Holder id, or None if the lease is free
+        """
+        try:
+            return self.redis_client.get(self._key(f"services:lease:{name}"))
+        except Exception as e:
+            print(f"Error getting lease holder: {e}")
+            return None
+
+    def sweep_with_lease(self, holder: str, lease_ttl: float, timeout_seconds: int = 30,
+                         cleanup: bool = False) -> Optional[Tuple[int, int]]:
+        """
+        Run one sweep if holder has (or can take) the 'sweeper' lease
+
+        Every node can call this on its own schedule; only the lease holder
+        sweeps, so the sweep load stays constant as nodes are added. If the
+        holder stops calling (or dies), another caller takes over once the
+        lease expires.
+
+        Args:
+            holder: Unique id of the caller (see default_lease_holder())
+            lease_ttl: Lease duration in seconds; call again well within it
+                (e.g. a third of it) to keep the lease
+            timeout_seconds: Heartbeat timeout for mark_unhealthy_services()
+            cleanup: Also remove unhealthy services with cleanup_unhealthy_services()
+
+        Returns:
+            (marked unhealthy, removed) counts, or None if another holder has the lease
+        """
+        if not self.acquire_lease('sweeper', holder, lease_ttl):
+            return None
+        marked = self.mark_unhealthy_services(timeout_seconds)
+        removed = self.cleanup_unhealthy_services() if cleanup else 0
+        return marked, removed
+
+    def run_sweeper(self, interval: float = 10.0, timeout_seconds: int = 30,
+                    cleanup: bool = False, lease_ttl: Optional[float] = None,
+                    holder: Optional[str] = None,
+                    stop_event: Optional[threading.Event] = None,
+                    on_sweep: Optional[Callable[[int, int], None]] = None):
+        """
+        Sweep every interval seconds while holding the 'sweeper' lease
+
+        Run this on every node: exactly one of them sweeps at a time and the
+        others stand by, taking over within lease_ttl if the sweeper dies.
+        The lease is released when stop_event is set. Blocks until then.
+
+        Args:
+            interval: Seconds between sweeps (and lease renewals)
+            timeout_seconds: Heartbeat timeout for mark_unhealthy_services()
+            cleanup: Also remove unhealthy services on each sweep
+            lease_ttl: Lease duration in seconds (default: 3 * interval)
+            holder: Lease holder id (default: default_lease_holder())
+            stop_event: Event that stops the sweeper when set (optional)
+            on_sweep: Called with (marked, removed) after each sweep this
+                process runs (optional)
+        """
+        stop_event = stop_event or threading.Event()
+        holder = holder or default_lease_holder()
+        lease_ttl = lease_ttl or 3 * interval
+
+        try:
+            while not stop_event.is_set():
+                result = self.sweep_with_lease(holder, lease_ttl, timeout_seconds, cleanup)
+                if result is not None and on_sweep:
+                    on_sweep(*result)
+                stop_event.wait(interval)
+        finally:
+            self.release_lease('sweeper', holder)
+
+    def enable_expiry_notifications(self) -> bool:
+        """
+        Make sure Redis publishes expired-key events (notify-keyspace-events Ex)
+
+        Returns:
+            bool: True if expiry notifications are enabled
+        """
+        try:
+            flags = self.redis_client.config_get('notify-keyspace-events').get(
+                'notify-keyspace-events', '')
+            has_expired = 'x' in flags or 'A' in flags
+            if 'E' in flags and has_expired:
+                return True
+
+            missing = ('' if 'E' in flags else 'E') + ('' if has_expired else 'x')
+            self.redis_client.config_set('notify-keyspace-events', flags + missing)
+            return True
+        except Exception as e:
+            print(f"Error enabling expiry notifications: {e}")
+            return False
+
+    def run_liveness_listener(self, stop_event: Optional[threading.Event] = None,
+                              on_expired: Optional[Callable[[List[str]], None]] = None):
+        """
+        Mark services unhealthy as soon as their liveness keys expire
+
+        Subscribes to __keyevent@<db>__:expired and flips each expired service
+        from healthy to unhealthy, so detection latency is one liveness TTL
+        with no polling. Requires liveness mode on the writers (liveness_ttl)
+        and expiry notifications on the server (see
+        enable_expiry_notifications()). Blocks until stop_event is set.
+
+        Args:
+            stop_event: Event that stops the listener when set (optional)
+            on_expired: Called with the service_ids marked unhealthy (optional)
+        """
+        self.enable_expiry_notifications()
+
+        alive_prefix = self._key("services:alive:")
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(f"__keyevent@{self.redis_db}__:expired")
+
+        try:
+            while stop_event is None or not stop_event.is_set():
+                expired = []
+                message = pubsub.get_message(timeout=1.0)
+                while message is not None:
+                    key = message['data']
+                    if message['type'] == 'message' and key.startswith(alive_prefix):
+                        expired.append(key[len(alive_prefix):])
+                    if len(expired) >= PIPELINE_CHUNK_SIZE:
+                        break
+                    message = pubsub.get_message(timeout=0)
+
+                if expired:
+                    results = self.update_health_many(expired, ServiceStatus.UNHEALTHY,
+                                                      expected_status=ServiceStatus.HEALTHY)
+                    marked = [sid for sid, updated in results.items() if updated]
+                    if marked and on_expired:
+                        on_expired(marked)
+        finally:
+            pubsub.close()
+
+    def watch(self, service_type: Optional[str] = None, include_existing: bool = False,
+              timeout: Optional[float] = None,
+              stop_event: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream registry change events as they happen
+
+        Yields the services:events payloads: dictionaries with 'event'
+        ('register', 'deregister' or 'update_health'), 'service_id',
+        'service_type' and, except for deregistrations, 'status'. With
+        include_existing, an 'existing' event per registered service is
+        yielded first; the snapshot is read after subscribing, so no change
+        can fall between the snapshot and the live events. Heartbeats are not
+        published and do not appear.
+
+        If the subscription drops, it is re-established, and the snapshot
+        is sent again when include_existing is set.
+
+        Args:
+            service_type: Only yield events for this service type (optional)
+            include_existing: Start with the services already registered
+            timeout: Stop after this many seconds (optional, default never)
+            stop_event: Event that stops the stream when set (optional)
+
+        Yields:
+            Event dictionaries
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        channel = self._key("services:events")
+        pubsub = None
+
+        def remaining() -> float:
+            return 1.0 if deadline is None else min(1.0, deadline - time.time())
+
+        try:
+            while (stop_event is None or not stop_event.is_set()) and remaining() > 0:
+                try:
+                    if pubsub is None:
+                        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                        pubsub.subscribe(channel)
+                        if include_existing:
+                            for service in self.list_services(service_type=service_type):
+                                yield {
+                                    'event': 'existing',
+                                    'service_id': service.service_id,
+                                    'service_type': service.service_type,
+                                    'status': service.status
+                                }
+
+                    message = pubsub.get_message(timeout=max(remaining(), 0))
+                    if message is None or message['type'] != 'message':
+                        continue
+                    event = json.loads(message['data'])
+                    if service_type is None or event.get('service_type') == service_type:
+                        yield event
+                except redis.ConnectionError as e:
+                    print(f"Error watching services: {e}")
+                    if pubsub is not None:
+                        pubsub.close()
+                        pubsub = None
+                    time.sleep(max(min(remaining(), 1.0), 0))
+        finally:
+            if pubsub is not None:
+                pubsub.close()
+
     def get_service_count(self, service_type: Optional[str] = None) -> int:
         """
         Get count of registered services
@@ -434,18 +1523,38 @@ class ServiceRegistry:
             List of service type strings
         """
         try:
-            pattern = self._key("services:type:*")
-            keys = self.redis_client.keys(pattern)
-            prefix = self._key("services:type:")
-            return [key.replace(prefix, '') for key in keys]
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.smembers(self._key("services:types"))
+            pipe.scard(self._key("services:active"))
+            types, active_count = pipe.execute()
+
+            # Registries written before the types index existed are
+            # backfilled once from the per-type sets
+            if not types and active_count:
+                types = self._rebuild_service_types()
+
+            return list(types)
         except Exception as e:
             print(f"Error getting service types: {e}")
             return []
 
+    def _rebuild_service_types(self) -> List[str]:
+        """Rebuild services:types from the per-type sets using SCAN"""
+        prefix = self._key("services:type:")
+        types = [key[len(prefix):]
+                 for key in self.redis_client.scan_iter(match=f"{prefix}*", count=1000)]
+        if types:
+            self.redis_client.sadd(self._key("services:types"), *types)
+        return types
+
     def clear_all(self) -> bool:
         """
         Clear all service registry data (USE WITH CAUTION)
 
+        Keys are found with incremental SCAN and freed with UNLINK in batches,
+        so the server is never blocked by a full keyspace walk or a large
+        synchronous delete.
+
         Returns:
             bool: True if successful
         """
@@ -457,9 +1566,14 @@ class ServiceRegistry:
             ]
 
             for pattern in patterns:
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    self.redis_client.delete(*keys)
+                batch = []
+                for key in self.redis_client.scan_iter(match=pattern, count=1000):
+                    batch.append(key)
+                    if len(batch) >= PIPELINE_CHUNK_SIZE:
+                        self.redis_client.unlink(*batch)
+                        batch = []
+                if batch:
+                    self.redis_client.unlink(*batch)
 
             return True
         except Exception as e:
@@ -467,6 +1581,97 @@ class ServiceRegistry:
             return False
 
 
+class RegistryBatch:
+    """
+    Queue of registry writes (register, deregister, update_health, heartbeat)
+    sent to Redis as pipelined MULTI/EXEC transactions of up to
+    PIPELINE_CHUNK_SIZE operations each. Create with ServiceRegistry.batch().
+    """
+
+    def __init__(self, registry: ServiceRegistry):
+        self.registry = registry
+        # Each entry queues its commands on a pipeline (returning the reply
+        # count) and turns its replies into a success flag
+        self._ops: List[Tuple[Callable[[Any, str], int], Callable[[List[Any]], bool]]] = []
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def register_service(self, service_info: ServiceInfo) -> 'RegistryBatch':
+        """Queue a service registration"""
+        self._ops.append((
+            lambda pipe, now: self.registry._queue_register(pipe, service_info),
+            lambda replies: True
+        ))
+        return self
+
+    def deregister_service(self, service_id: str) -> 'RegistryBatch':
+        """Queue a service deregistration"""
+        def queue(pipe, now):
+            self.registry._deregister_script(**self.registry._deregister_call(service_id),
+                                             client=pipe)
+            return 1
+        self._ops.append((queue, lambda replies: bool(replies[0])))
+        return self
+
+    def update_health(self, service_id: str, status: ServiceStatus,
+                      metadata: Optional[Dict[str, Any]] = None) -> 'RegistryBatch':
+        """Queue a health status update"""
+        metadata_json = self.registry._encode_metadata(metadata)
+
+        def queue(pipe, now):
+            self.registry._update_health_script(
+                **self.registry._update_health_call([service_id], status, metadata_json, now),
+                client=pipe
+            )
+            return 1
+        self._ops.append((queue, lambda replies: bool(replies[0][0])))
+        return self
+
+    def heartbeat(self, service_id: str) -> 'RegistryBatch':
+        """Queue a heartbeat"""
+        def queue(pipe, now):
+            self.registry._heartbeat_script(**self.registry._heartbeat_call(service_id, now),
+                                            client=pipe)
+            return 1
+        self._ops.append((queue, lambda replies: bool(replies[0])))
+        return self
+
+    def execute(self) -> List[bool]:
+        """
+        Send all queued operations and clear the queue
+
+        Returns:
+            List of success flags, one per queued operation in order
+        """
+        ops, self._ops = self._ops, []
+        results = []
+
+        for start in range(0, len(ops), PIPELINE_CHUNK_SIZE):
+            chunk = ops[start:start + PIPELINE_CHUNK_SIZE]
+            now = str(time.time())
+            pipe = self.registry.redis_client.pipeline(transaction=True)
+            counts = [queue(pipe, now) for queue, _ in chunk]
+
+            try:
+                replies = pipe.execute(raise_on_error=False)
+            except Exception as e:
+                print(f"Error executing batch: {e}")
+                results.extend([False] * len(chunk))
+                continue
+
+            position = 0
+            for (_, interpret), count in zip(chunk, counts):
+                op_replies = replies[position:position + count]
+                position += count
+                if any(isinstance(reply, Exception) for reply in op_replies):
+                    results.append(False)
+                else:
+                    results.append(interpret(op_replies))
+
+        return results
+
+
 if __name__ == "__main__":
     # Example usage
     registry = ServiceRegistry(redis_host='localhost', redis_port=6379)
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Sharded Service Registry across several Redis servers
+
+At full-machine scale a single redis-server becomes the bottleneck for
+heartbeats and sweeps. ShardedServiceRegistry spreads services over several
+independent shards (redis-servers, or databases of one server), each holding
+the complete ServiceRegistry data structure for its share of the services.
+
+A service lives on the shard its service_id maps to on a consistent hash
+ring of shard names, so all of its keys (hash, index entries, liveness key,
+history stream) stay on one server and the server-side scripts run unchanged. Writes and
+per-service reads go to one shard; bulk calls are split per shard; listing,
+sweeps and counts fan out to all shards concurrently and merge the results.
+
+Every client must use the same shard list. Adding a shard moves about 1/N of
+the services to it; they reappear once they register again.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .service_registry import (
+        ServiceRegistry, ServiceInfo, ServiceStatus, RegistryBatch, HISTORY_MAXLEN,
+        default_lease_holder
+    )
+    from .hash_ring import HashRing
+except ImportError:
+    from service_registry import (
+        ServiceRegistry, ServiceInfo, ServiceStatus, RegistryBatch, HISTORY_MAXLEN,
+        default_lease_holder
+    )
+    from hash_ring import HashRing
+
+
+def parse_shard(shard: str) -> Tuple[str, int, int]:
+    """
+    Parse a HOST:PORT[/DB] shard address
+
+    Args:
+        shard: Shard address, e.g. "10.0.0.1:6379" or "10.0.0.1:6379/2"
+
+    Returns:
+        (host, port, db) tuple
+    """
+    address, _, db = shard.partition('/')
+    host, sep, port = address.rpartition(':')
+    if not sep or not host or not port.isdigit() or (db and not db.isdigit()):
+        raise ValueError(f"invalid shard '{shard}' (expected HOST:PORT[/DB])")
+    return host, int(port), int(db or 0)
+
+
+class ShardedServiceRegistry:
+    """
+    Service Registry spread over several Redis shards with the same API as
+    ServiceRegistry.
+    """
+
+    def __init__(self, shards: List[str], redis_password: Optional[str] = None,
+                 key_prefix: str = '', liveness_ttl: Optional[float] = None,
+                 metadata_encoding: str = 'json', history_maxlen: int = HISTORY_MAXLEN,
+                 history_load_interval: Optional[float] = None):
+        """
+        Initialize ShardedServiceRegistry
+
+        Args:
+            shards: Shard addresses as HOST:PORT[/DB], identical on every client
+            redis_password: Redis password (if required)
+            key_prefix: Prefix for all Redis keys
+            liveness_ttl: Enable liveness mode (see ServiceRegistry)
+            metadata_encoding: 'json' or 'fields' (see ServiceRegistry)
+            history_maxlen: History stream length, 0 = off (see ServiceRegistry)
+            history_load_interval: Load sample interval (see ServiceRegistry)
+        """
+        if not shards:
+            raise ValueError("at least one shard is required")
+        if len(set(shards)) != len(shards):
+            raise ValueError("shard addresses must be unique")
+
+        self.shard_names = list(shards)
+        self.shards: Dict[str, ServiceRegistry] = {}
+        for name in self.shard_names:
+            host, port, db = parse_shard(name)
+            self.shards[name] = ServiceRegistry(
+                redis_host=host,
+                redis_port=port,
+                redis_db=db,
+                redis_password=redis_password,
+                key_prefix=key_prefix,
+                liveness_ttl=liveness_ttl,
+                metadata_encoding=metadata_encoding,
+                history_maxlen=history_maxlen,
+                history_load_interval=history_load_interval
+            )
+        self.key_prefix = key_prefix
+        self._ring = HashRing(self.shard_names)
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shard_names),
+                                            thread_name_prefix='registry-shard')
+
+    def close(self):
+        """Stop the fan-out thread pool"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> 'ShardedServiceRegistry':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def shard_for(self, service_id: str) -> ServiceRegistry:
+        """Get the shard registry that owns a service"""
+        return self.shards[self._ring.get(service_id)]
+
+    def _fan_out(self, func: Callable[[ServiceRegistry], Any]) -> List[Any]:
+        """Call func on every shard concurrently; results in shard order"""
+        return list(self._executor.map(func, self.shards.values()))
+
+    def _group(self, service_ids) -> Dict[str, List[str]]:
+        """Split service_ids by owning shard name"""
+        groups: Dict[str, List[str]] = {}
+        for service_id in service_ids:
+            groups.setdefault(self._ring.get(service_id), []).append(service_id)
+        return groups
+
+    def _fan_out_grouped(self, groups: Dict[str, Any],
+                         func: Callable[[ServiceRegistry, Any], Dict[str, bool]]) -> Dict[str, bool]:
+        """Call func(shard, group) for each non-empty group concurrently and merge the dicts"""
+        results: Dict[str, bool] = {}
+        for result in self._executor.map(lambda name: func(self.shards[name], groups[name]),
+                                         list(groups)):
+            results.update(result)
+        return results
+
+    def batch(self) -> 'ShardedRegistryBatch':
+        """
+        Start a batch of writes that is split per shard on execute()
+
+        Returns:
+            ShardedRegistryBatch
+        """
+        return ShardedRegistryBatch(self)
+
+    def register_service(self, service_info: ServiceInfo) -> bool:
+        """Register a new service or update existing one on its shard"""
+        return self.shard_for(service_info.service_id).register_service(service_info)
+
+    def register_many(self, services: List[ServiceInfo]) -> Dict[str, bool]:
+        """Register many services, one pipelined call per shard"""
+        groups: Dict[str, List[ServiceInfo]] = {}
+        for service in services:
+            groups.setdefault(self._ring.get(service.service_id), []).append(service)
+        return self._fan_out_grouped(groups, lambda shard, group: shard.register_many(group))
+
+    def deregister_service(self, service_id: str) -> bool:
+        """Deregister a service"""
+        return self.shard_for(service_id).deregister_service(service_id)
+
+    def deregister_many(self, service_ids: List[str]) -> Dict[str, bool]:
+        """Deregister many services, one pipelined call per shard"""
+        return self._fan_out_grouped(self._group(service_ids),
+                                     lambda shard, group: shard.deregister_many(group))
+
+    def update_health(self, service_id: str, status: ServiceStatus,
+                      metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Update service health status"""
+        return self.shard_for(service_id).update_health(service_id, status, metadata)
+
+    def update_health_many(self, service_ids: List[str], status: ServiceStatus,
+                           metadata: Optional[Dict[str, Any]] = None,
+                           expected_status: Optional[ServiceStatus] = None) -> Dict[str, bool]:
+        """Update health status for many services, one script call per shard"""
+        return self._fan_out_grouped(
+            self._group(service_ids),
+            lambda shard, group: shard.update_health_many(group, status, metadata,
+                                                          expected_status)
+        )
+
+    def heartbeat(self, service_id: str) -> bool:
+        """Record a heartbeat for a service"""
+        return self.shard_for(service_id).heartbeat(service_id)
+
+    def heartbeat_many(self, service_ids: List[str],
+                       status_changes: Optional[Dict[str, ServiceStatus]] = None) -> Dict[str, bool]:
+        """Record heartbeats (and optional status changes), one pipeline per shard"""
+        status_changes = status_changes or {}
+        groups: Dict[str, Tuple[List[str], Dict[str, ServiceStatus]]] = {}
+        for service_id in service_ids:
+            groups.setdefault(self._ring.get(service_id), ([], {}))[0].append(service_id)
+        for service_id, status in status_changes.items():
+            groups.setdefault(self._ring.get(service_id), ([], {}))[1][service_id] = status
+        return self._fan_out_grouped(
+            groups, lambda shard, group: shard.heartbeat_many(group[0], status_changes=group[1]))
+
+    def get_service(self, service_id: str) -> Optional[ServiceInfo]:
+        """Get service information"""
+        return self.shard_for(service_id).get_service(service_id)
+
+    def get_services(self, service_ids: List[str]) -> List[ServiceInfo]:
+        """Get information for many services, in request order, skipping missing ones"""
+        service_ids = list(service_ids)
+        groups = self._group(service_ids)
+        found: Dict[str, ServiceInfo] = {}
+        for services in self._executor.map(lambda name: self.shards[name].get_services(groups[name]),
+                                           list(groups)):
+            found.update((s.service_id, s) for s in services)
+        return [found[service_id] for service_id in service_ids if service_id in found]
+
+    def get_metadata(self, service_id: str,
+                     fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Get a service's metadata, or only some of its entries"""
+        return self.shard_for(service_id).get_metadata(service_id, fields)
+
+    def check_health(self, service_id: str, timeout_seconds: int = 30) -> Dict[str, Any]:
+        """Check if a service is healthy based on heartbeat"""
+        return self.shard_for(service_id).check_health(service_id, timeout_seconds)
+
+    def list_services(self, service_type: Optional[str] = None,
+                      status_filter: Optional[ServiceStatus] = None) -> List[ServiceInfo]:
+        """List all registered services across shards"""
+        return [service for services in self._fan_out(
+                    lambda shard: shard.list_services(service_type, status_filter))
+                for service in services]
+
+    def get_healthy_services(self, service_type: Optional[str] = None,
+                             timeout_seconds: int = 30) -> List[ServiceInfo]:
+        """Get all healthy services (with recent heartbeat) across shards"""
+        return [service for services in self._fan_out(
+                    lambda shard: shard.get_healthy_services(service_type, timeout_seconds))
+                for service in services]
+
+    def get_stale_services(self, timeout_seconds: int = 30) -> List[ServiceInfo]:
+        """Get services that have not sent a heartbeat in a while across shards"""
+        return [service for services in self._fan_out(
+                    lambda shard: shard.get_stale_services(timeout_seconds))
+                for service in services]
+
+    def report_load(self, service_id: str, running: int, waiting: int = 0) -> bool:
+        """Publish a service's current load"""
+        return self.shard_for(service_id).report_load(service_id, running, waiting)
+
+    def report_loads(self, loads: Dict[str, Tuple[int, int]]) -> Dict[str, bool]:
+        """Publish loads for many services, one pipeline per shard"""
+        groups: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        for service_id, load in loads.items():
+            groups.setdefault(self._ring.get(service_id), {})[service_id] = load
+        return self._fan_out_grouped(groups, lambda shard, group: shard.report_loads(group))
+
+    def get_service_loads(self, service_type: str) -> Dict[str, float]:
+        """Get the last reported load of every service of a type, least loaded first"""
+        loads = {}
+        for shard_loads in self._fan_out(lambda shard: shard.get_service_loads(service_type)):
+            loads.update(shard_loads)
+        return dict(sorted(loads.items(), key=lambda item: item[1]))
+
+    def pick_least_loaded(self, service_type: str, k: int = 1,
+                          timeout_seconds: int = 30) -> List[ServiceInfo]:
+        """
+        Get the k least-loaded healthy services of a type across shards
+
+        Each shard selects its own k candidates server-side; the global k
+        least loaded are chosen from those.
+        """
+        def pick(shard: ServiceRegistry) -> List[Tuple[str, float]]:
+            try:
+                return shard._pick_least_loaded_ids(service_type, k, timeout_seconds)
+            except Exception as e:
+                print(f"Error picking least loaded services: {e}")
+                return []
+
+        candidates = sorted((pair for pairs in self._fan_out(pick) for pair in pairs),
+                            key=lambda pair: pair[1])
+        return self.get_services([service_id for service_id, _ in candidates[:k]])
+
+    def get_health_history(self, service_id: str, since: Optional[float] = None,
+                           count: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get a service's recent history, oldest first"""
+        return self.shard_for(service_id).get_health_history(service_id, since, count)
+
+    def get_flapping_services(self, window_seconds: int = 600, min_transitions: int = 3,
+                              service_type: Optional[str] = None) -> Dict[str, int]:
+        """Find services whose status changed repeatedly in a recent window, across shards"""
+        flapping = {}
+        for shard_flapping in self._fan_out(lambda shard: shard.get_flapping_services(
+                window_seconds, min_transitions, service_type)):
+            flapping.update(shard_flapping)
+        return dict(sorted(flapping.items(), key=lambda item: (-item[1], item[0])))
+
+    def cleanup_unhealthy_services(self) -> int:
+        """Remove services marked as unhealthy on every shard"""
+        return sum(self._fan_out(lambda shard: shard.cleanup_unhealthy_services()))
+
+    def mark_unhealthy_services(self, timeout_seconds: int = 30) -> int:
+        """Mark services as unhealthy if no recent heartbeat, on every shard"""
+        return sum(self._fan_out(lambda shard: shard.mark_unhealthy_services(timeout_seconds)))
+
+    def get_service_count(self, service_type: Optional[str] = None) -> int:
+        """Get count of registered services across shards"""
+        return sum(self._fan_out(lambda shard: shard.get_service_count(service_type)))
+
+    def get_service_types(self) -> List[str]:
+        """Get list of all service types across shards"""
+        types = set()
+        for shard_types in self._fan_out(lambda shard: shard.get_service_types()):
+            types.update(shard_types)
+        return list(types)
+
+    def clear_all(self) -> bool:
+        """Clear all registry data on every shard"""
+        return all(self._fan_out(lambda shard: shard.clear_all()))
+
+    def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        """Take or renew a named lease (kept on the shard the name maps to)"""
+        return self.shard_for(name).acquire_lease(name, holder, ttl_seconds)
+
+    def release_lease(self, name: str, holder: str) -> bool:
+        """Give up a named lease"""
+        return self.shard_for(name).release_lease(name, holder)
+
+    def get_lease_holder(self, name: str) -> Optional[str]:
+        """Get the current holder of a named lease"""
+        return self.shard_for(name).get_lease_holder(name)
+
+    def sweep_with_lease(self, holder: str, lease_ttl: float, timeout_seconds: int = 30,
+                         cleanup: bool = False) -> Optional[Tuple[int, int]]:
+        """
+        Sweep every shard whose 'sweeper' lease holder has or can take
+
+        Each shard has its own lease, so the shards' sweeps can be spread
+        over several nodes. Returns the summed (marked, removed) counts, or
+        None if other holders have every shard's lease.
+        """
+        results = [result for result in self._fan_out(
+                       lambda shard: shard.sweep_with_lease(holder, lease_ttl, timeout_seconds,
+                                                            cleanup))
+                   if result is not None]
+        if not results:
+            return None
+        return sum(marked for marked, _ in results), sum(removed for _, removed in results)
+
+    def run_sweeper(self, interval: float = 10.0, timeout_seconds: int = 30,
+                    cleanup: bool = False, lease_ttl: Optional[float] = None,
+                    holder: Optional[str] = None,
+                    stop_event: Optional[threading.Event] = None,
+                    on_sweep: Optional[Callable[[int, int], None]] = None):
+        """
+        Sweep the shards this process holds the lease for until stop_event is set
+        """
+        stop_event = stop_event or threading.Event()
+        holder = holder or default_lease_holder()
+        lease_ttl = lease_ttl or 3 * interval
+
+        try:
+            while not stop_event.is_set():
+                result = self.sweep_with_lease(holder, lease_ttl, timeout_seconds, cleanup)
+                if result is not None and on_sweep:
+                    on_sweep(*result)
+                stop_event.wait(interval)
+        finally:
+            self._fan_out(lambda shard: shard.release_lease('sweeper', holder))
+
+    def watch(self, service_type: Optional[str] = None, include_existing: bool = False,
+              timeout: Optional[float] = None,
+              stop_event: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream registry change events from all shards (see ServiceRegistry.watch)
+
+        Events from different shards are interleaved in arrival order.
+        """
+        events: queue.Queue = queue.Queue(maxsize=10000)
+        done = threading.Event()
+        finished = object()
+
+        def forward(shard: ServiceRegistry):
+            try:
+                for event in shard.watch(service_type, include_existing, timeout, done):
+                    while not done.is_set():
+                        try:
+                            events.put(event, timeout=0.5)
+                            break
+                        except queue.Full:
+                            pass
+            finally:
+                events.put(finished)
+
+        threads = [threading.Thread(target=forward, args=(shard,), daemon=True)
+                   for shard in self.shards.values()]
+        for thread in threads:
+            thread.start()
+
+        try:
+            running = len(threads)
+            while running and (stop_event is None or not stop_event.is_set()):
+                try:
+                    event = events.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if event is finished:
+                    running -= 1
+                else:
+                    yield event
+        finally:
+            done.set()
+            # Unblock forwarders waiting on a full queue so they can exit
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    events.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    def run_liveness_listener(self, stop_event: Optional[threading.Event] = None,
+                              on_expired: Optional[Callable[[List[str]], None]] = None):
+        """
+        Run ServiceRegistry.run_liveness_listener on every shard until stop_event is set
+        """
+        stop_event = stop_event or threading.Event()
+        threads = [threading.Thread(target=shard.run_liveness_listener,
+                                    args=(stop_event, on_expired), daemon=True)
+                   for shard in self.shards.values()]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1.0)
+        finally:
+            stop_event.set()
+
+
+class ShardedRegistryBatch:
+    """
+    Queue of registry writes split into one RegistryBatch per shard.
+    Create with ShardedServiceRegistry.batch().
+    """
+
+    def __init__(self, registry: ShardedServiceRegistry):
+        self.registry = registry
+        self._batches = {name: shard.batch() for name, shard in registry.shards.items()}
+        # Owning shard of each queued operation, in queue order
+        self._order: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def _queue(self, service_id: str) -> RegistryBatch:
+        name = self.registry._ring.get(service_id)
+        self._order.append(name)
+        return self._batches[name]
+
+    def register_service(self, service_info: ServiceInfo) -> 'ShardedRegistryBatch':
+        """Queue a service registration"""
+        self._queue(service_info.service_id).register_service(service_info)
+        return self
+
+    def deregister_service(self, service_id: str) -> 'ShardedRegistryBatch':
+        """Queue a service deregistration"""
+        self._queue(service_id).deregister_service(service_id)
+        return self
+
+    def update_health(self, service_id: str, status: ServiceStatus,
+                      metadata: Optional[Dict[str, Any]] = None) -> 'ShardedRegistryBatch':
+        """Queue a health status update"""
+        self._queue(service_id).update_health(service_id, status, metadata)
+        return self
+
+    def heartbeat(self, service_id: str) -> 'ShardedRegistryBatch':
+        """Queue a heartbeat"""
+        self._queue(service_id).heartbeat(service_id)
+        return self
+
+    def execute(self) -> List[bool]:
+        """
+        Send all queued operations, one shard batch per shard concurrently
+
+        Returns:
+            List of success flags, one per queued operation in order
+        """
+        order, self._order = self._order, []
+        names = [name for name, batch in self._batches.items() if len(batch)]
+        shard_results = dict(zip(names, self.registry._executor.map(
+            lambda name: iter(self._batches[name].execute()), names)))
+        return [next(shard_results[name]) for name in order]
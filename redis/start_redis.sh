@@ -1,6 +1,7 @@
 #!/bin/bash
 # Start Redis server bound to a specific network interface
 # Usage: ./start_redis.sh [bind_address] [port]
+# Run once per port to start several registry shards on one node
 
 SCRIPT_DIR="$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )"
 # This should be set in env.sh
@@ -11,6 +12,13 @@ SCRIPT_DIR="$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
 BIND_ADDRESS=${1:-$(getent hosts $(hostname).hsn.cm.aurora.alcf.anl.gov | awk '{ print $1 }' | head -n 1)}
 REDIS_PORT=${2:-6379}
 
+# Non-default ports get their own pid/log files so shards can share a node
+if [ "$REDIS_PORT" = "6379" ]; then
+    SERVER_NAME="redis-server"
+else
+    SERVER_NAME="redis-server-${REDIS_PORT}"
+fi
+
 # If BIND_ADDRESS is still empty, fall back to primary IP
 if [ -z "$BIND_ADDRESS" ]; then
     BIND_ADDRESS=$(hostname -i | awk '{print $1}')
@@ -26,23 +34,24 @@ ${REDIS_STABLE}/src/redis-server ${REDIS_STABLE}/redis.conf \
     --bind ${BIND_ADDRESS} \
     --port ${REDIS_PORT} \
     --protected-mode no \
+    --notify-keyspace-events Ex \
     --daemonize yes \
-    --logfile ${SCRIPT_DIR}/redis-server.log \
-    --pidfile ${SCRIPT_DIR}/redis-server.pid
+    --logfile ${SCRIPT_DIR}/${SERVER_NAME}.log \
+    --pidfile ${SCRIPT_DIR}/${SERVER_NAME}.pid
 
 # Wait a moment and check if it started
 sleep 2
 
-if [ -f "${SCRIPT_DIR}/redis-server.pid" ]; then
-    PID=$(cat ${SCRIPT_DIR}/redis-server.pid)
+if [ -f "${SCRIPT_DIR}/${SERVER_NAME}.pid" ]; then
+    PID=$(cat ${SCRIPT_DIR}/${SERVER_NAME}.pid)
     if kill -0 $PID 2>/dev/null; then
         echo "$(date) Redis server started successfully (PID: $PID)"
         echo "$(date) Connect with: redis-cli -h ${BIND_ADDRESS} -p ${REDIS_PORT}"
-        echo "$(date) Logs at: ${SCRIPT_DIR}/redis-server.log"
+        echo "$(date) Logs at: ${SCRIPT_DIR}/${SERVER_NAME}.log"
         exit 0
     else
         echo "$(date) ERROR: Redis server failed to start"
-        cat ${SCRIPT_DIR}/redis-server.log
+        cat ${SCRIPT_DIR}/${SERVER_NAME}.log
         exit 1
     fi
 else
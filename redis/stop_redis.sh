@@ -1,10 +1,16 @@
 #!/bin/bash
 # Stop Redis server
+# Usage: ./stop_redis.sh [port]
 
 SCRIPT_DIR="$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )"
 # REDIS_STABLE="${SCRIPT_DIR}/redis-stable"
 # This should be set in env.sh
-PID_FILE="${SCRIPT_DIR}/redis-server.pid"
+REDIS_PORT=${1:-6379}
+if [ "$REDIS_PORT" = "6379" ]; then
+    PID_FILE="${SCRIPT_DIR}/redis-server.pid"
+else
+    PID_FILE="${SCRIPT_DIR}/redis-server-${REDIS_PORT}.pid"
+fi
 
 if [ ! -f "$PID_FILE" ]; then
     echo "Redis PID file not found at: $PID_FILE"
@@ -15,7 +21,7 @@ PID=$(cat "$PID_FILE")
 echo "$(date) Stopping Redis server (PID: $PID)"
 
 # Try graceful shutdown first
-${REDIS_STABLE}/src/redis-cli shutdown 2>/dev/null || kill -TERM $PID
+${REDIS_STABLE}/src/redis-cli -p ${REDIS_PORT} shutdown 2>/dev/null || kill -TERM $PID
 
 # Wait for shutdown
 for i in {1..10}; do
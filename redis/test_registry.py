@@ -9,7 +9,13 @@ import unittest
 import time
 import argparse
 import sys
+import asyncio
+import threading
 from service_registry import ServiceRegistry, ServiceInfo, ServiceStatus
+from async_service_registry import AsyncServiceRegistry
+from discovery_cache import DiscoveryCache
+from hash_ring import HashRing
+from sharded_registry import ShardedServiceRegistry
 
 
 # Global variables to store Redis connection info
@@ -70,6 +76,17 @@ class TestServiceRegistry(unittest.TestCase):
         retrieved = self.registry.get_service("test-002")
         self.assertIsNone(retrieved)
 
+    def test_deregister_removes_indexes(self):
+        """Test deregistration clears the active and type sets"""
+        self.registry.register_service(ServiceInfo("test-018", "10.0.0.18", 8000, "typeX"))
+        self.registry.register_service(ServiceInfo("test-019", "10.0.0.19", 8000, "typeX"))
+
+        self.assertTrue(self.registry.deregister_service("test-018"))
+        self.assertFalse(self.registry.deregister_service("test-018"))
+
+        self.assertEqual(self.registry.get_service_count(), 1)
+        self.assertEqual(self.registry.get_service_count(service_type="typeX"), 1)
+
     def test_update_health(self):
         """Test health status update"""
         service = ServiceInfo(
@@ -94,6 +111,25 @@ class TestServiceRegistry(unittest.TestCase):
         self.assertEqual(retrieved.status, ServiceStatus.UNHEALTHY.value)
         self.assertIn("error", retrieved.metadata)
 
+    def test_update_health_many(self):
+        """Test batched health update merges metadata per service"""
+        self.registry.register_service(ServiceInfo("test-022", "10.0.0.22", 8000, "test",
+                                                   metadata={"model": "llama-3"}))
+        self.registry.register_service(ServiceInfo("test-023", "10.0.0.23", 8000, "test"))
+
+        results = self.registry.update_health_many(
+            ["test-022", "test-023", "missing"],
+            ServiceStatus.STOPPING,
+            metadata={"reason": "drain"}
+        )
+        self.assertEqual(results, {"test-022": True, "test-023": True, "missing": False})
+
+        first = self.registry.get_service("test-022")
+        self.assertEqual(first.status, ServiceStatus.STOPPING.value)
+        self.assertEqual(first.metadata, {"model": "llama-3", "reason": "drain"})
+        self.assertEqual(self.registry.get_service("test-023").metadata, {"reason": "drain"})
+        self.assertIsNone(self.registry.get_service("missing"))
+
     def test_heartbeat(self):
         """Test heartbeat functionality"""
         service = ServiceInfo(
@@ -115,6 +151,54 @@ class TestServiceRegistry(unittest.TestCase):
         # Verify last_seen was updated
         self.assertGreater(updated.last_seen, initial.last_seen)
 
+    def test_heartbeat_many_with_status_changes(self):
+        """Test batched heartbeats and status transitions in one call"""
+        for i in range(3):
+            self.registry.register_service(ServiceInfo(f"hb-{i}", "10.0.4.1", 8000, "test",
+                                                       last_seen=time.time() - 60))
+
+        results = self.registry.heartbeat_many(
+            ["hb-0", "hb-1", "missing"],
+            status_changes={"hb-2": ServiceStatus.UNHEALTHY}
+        )
+        self.assertEqual(results, {"hb-0": True, "hb-1": True, "missing": False, "hb-2": True})
+        self.assertEqual(self.registry.get_service("hb-2").status, ServiceStatus.UNHEALTHY.value)
+        self.assertEqual(self.registry.get_stale_services(timeout_seconds=30), [])
+
+    def test_registry_batch(self):
+        """Test mixed operations in one pipelined batch"""
+        batch = self.registry.batch()
+        batch.register_service(ServiceInfo("batch-a", "10.0.5.1", 8000, "test"))
+        batch.update_health("batch-a", ServiceStatus.STARTING, metadata={"gpu": 0})
+        batch.heartbeat("batch-a")
+        batch.heartbeat("missing")
+        batch.deregister_service("missing")
+        self.assertEqual(len(batch), 5)
+
+        self.assertEqual(batch.execute(), [True, True, True, False, False])
+        self.assertEqual(len(batch), 0)
+
+        service = self.registry.get_service("batch-a")
+        self.assertEqual(service.status, ServiceStatus.STARTING.value)
+        self.assertEqual(service.metadata, {"gpu": 0})
+
+    def test_register_and_deregister_many(self):
+        """Test bulk registration and deregistration report per-item results"""
+        services = [ServiceInfo(f"many-{i}", "10.0.8.1", 8000 + i, "many") for i in range(700)]
+
+        results = self.registry.register_many(services)
+        self.assertEqual(len(results), 700)
+        self.assertTrue(all(results.values()))
+        self.assertEqual(self.registry.get_service_count(service_type="many"), 700)
+
+        heartbeats = self.registry.heartbeat_many(["many-0", "many-699", "missing"])
+        self.assertEqual(heartbeats, {"many-0": True, "many-699": True, "missing": False})
+
+        removed = self.registry.deregister_many([f"many-{i}" for i in range(600)] + ["missing"])
+        self.assertEqual(sum(removed.values()), 600)
+        self.assertFalse(removed["missing"])
+        self.assertEqual(self.registry.get_service_count(), 100)
+
     def test_list_services(self):
         """Test listing services"""
         services = [
@@ -134,6 +218,15 @@ class TestServiceRegistry(unittest.TestCase):
         type1_services = self.registry.list_services(service_type="type1")
         self.assertEqual(len(type1_services), 2)
 
+    def test_get_services_batch(self):
+        """Test bulk fetch skips missing services"""
+        for i in range(5):
+            self.registry.register_service(ServiceInfo(f"batch-{i}", "10.0.1.1", 8000 + i, "batch"))
+
+        services = self.registry.get_services([f"batch-{i}" for i in range(5)] + ["missing"])
+        self.assertEqual(len(services), 5)
+        self.assertEqual({s.port for s in services}, {8000, 8001, 8002, 8003, 8004})
+
     def test_get_healthy_services(self):
         """Test getting healthy services"""
         # Register healthy service
@@ -150,6 +243,28 @@ class TestServiceRegistry(unittest.TestCase):
         self.assertEqual(len(healthy), 1)
         self.assertEqual(healthy[0].service_id, "test-008")
 
+    def test_mark_unhealthy_uses_heartbeat_index(self):
+        """Test stale detection through the heartbeat sorted set"""
+        self.registry.register_service(ServiceInfo("test-020", "10.0.0.20", 8000, "test"))
+        self.registry.register_service(ServiceInfo("test-021", "10.0.0.21", 8000, "test",
+                                                   last_seen=time.time() - 120))
+
+        stale = self.registry.get_stale_services(timeout_seconds=60)
+        self.assertEqual([s.service_id for s in stale], ["test-021"])
+
+        self.assertEqual(self.registry.mark_unhealthy_services(timeout_seconds=60), 1)
+        self.assertEqual(self.registry.get_service("test-021").status,
+                         ServiceStatus.UNHEALTHY.value)
+
+        healthy = self.registry.get_healthy_services(service_type="test", timeout_seconds=60)
+        self.assertEqual([s.service_id for s in healthy], ["test-020"])
+
+        # Deregistration removes the index entry
+        self.registry.deregister_service("test-020")
+        score = self.registry.redis_client.zscore(
+            self.registry._key("services:heartbeat"), "test-020")
+        self.assertIsNone(score)
+
     def test_cleanup_stale_services(self):
         """Test cleanup of stale services"""
         # Register a service
@@ -204,6 +319,287 @@ class TestServiceRegistry(unittest.TestCase):
         self.assertIn("typeB", types)
         self.assertIn("typeC", types)
 
+    def test_service_types_index(self):
+        """Test the types index drops a type when its last service leaves"""
+        self.registry.register_service(ServiceInfo("types-1", "10.0.6.1", 8000, "typeA"))
+        self.registry.register_service(ServiceInfo("types-2", "10.0.6.2", 8000, "typeA"))
+        self.registry.register_service(ServiceInfo("types-3", "10.0.6.3", 8000, "typeB"))
+
+        self.registry.deregister_service("types-3")
+        self.assertEqual(self.registry.get_service_types(), ["typeA"])
+
+        self.registry.deregister_service("types-1")
+        self.assertEqual(self.registry.get_service_types(), ["typeA"])
+
+        # A registry without the index is backfilled from the per-type sets
+        self.registry.redis_client.delete(self.registry._key("services:types"))
+        self.assertEqual(self.registry.get_service_types(), ["typeA"])
+
+    def test_clear_all_many_keys(self):
+        """Test clear_all removes registries larger than one UNLINK batch"""
+        batch = self.registry.batch()
+        for i in range(1200):
+            batch.register_service(ServiceInfo(f"clear-{i}", "10.0.7.1", 8000, f"type{i % 3}"))
+        batch.execute()
+
+        self.assertTrue(self.registry.clear_all())
+        self.assertEqual(self.registry.get_service_count(), 0)
+        self.assertEqual(list(self.registry.redis_client.scan_iter(match="test:*")), [])
+
+    def test_update_health_expected_status(self):
+        """Test update_health_many skips services not in the expected status"""
+        self.registry.register_service(ServiceInfo("expect-1", "10.0.8.1", 8000, "test"))
+        self.registry.register_service(ServiceInfo("expect-2", "10.0.8.2", 8000, "test",
+                                                   status=ServiceStatus.STARTING.value))
+
+        results = self.registry.update_health_many(["expect-1", "expect-2"],
+                                                   ServiceStatus.UNHEALTHY,
+                                                   expected_status=ServiceStatus.HEALTHY)
+        self.assertEqual(results, {"expect-1": True, "expect-2": False})
+        self.assertEqual(self.registry.get_service("expect-2").status, "starting")
+
+    def test_metadata_field_encoding(self):
+        """Test field-level metadata storage, partial updates and partial reads"""
+        registry = ServiceRegistry(
+            redis_host=REDIS_HOST,
+            redis_port=REDIS_PORT,
+            key_prefix='test:',
+            metadata_encoding='fields'
+        )
+        service_key = registry._key("service:fields-1")
+        registry.register_service(ServiceInfo(
+            "fields-1", "10.0.10.1", 8000, "test",
+            metadata={"model": "llama-3", "gpus": [0, 1], "kv_usage": 0.25}
+        ))
+        self.assertEqual(registry.redis_client.hget(service_key, "m:gpus"), "[0, 1]")
+        self.assertFalse(registry.redis_client.hexists(service_key, "metadata"))
+
+        registry.update_health("fields-1", ServiceStatus.HEALTHY, {"kv_usage": 0.123456789012345})
+        self.assertEqual(registry.get_service("fields-1").metadata,
+                         {"model": "llama-3", "gpus": [0, 1], "kv_usage": 0.123456789012345})
+        self.assertEqual(registry.get_metadata("fields-1", ["kv_usage", "missing"]),
+                         {"kv_usage": 0.123456789012345})
+        self.assertIsNone(registry.get_metadata("nonexistent", ["kv_usage"]))
+
+        # Re-registering replaces metadata instead of merging it
+        registry.register_service(ServiceInfo("fields-1", "10.0.10.1", 8000, "test",
+                                              metadata={"model": "llama-4"}))
+        self.assertEqual(registry.get_service("fields-1").metadata, {"model": "llama-4"})
+
+        # A JSON-encoding writer updates a field-encoded service without being shadowed
+        self.registry.update_health("fields-1", ServiceStatus.HEALTHY, {"model": "llama-5"})
+        self.assertEqual(registry.get_service("fields-1").metadata, {"model": "llama-5"})
+        self.assertEqual(self.registry.get_metadata("fields-1"), {"model": "llama-5"})
+
+    def test_metadata_merge_keeps_untouched_values(self):
+        """Test that a JSON metadata update leaves the other entries exactly as stored"""
+        metadata = {
+            "gpus": [],
+            "config": {},
+            "request_id": 12345678901234567890,
+            "kv_usage": 0.123456789012345,
+            "tags": ["a,b", "c}\"d", {"nested": [1, [2]]}],
+            "path/with \"quotes\"": None,
+        }
+        self.registry.register_service(ServiceInfo("merge-1", "10.0.10.2", 8000, "test",
+                                                   metadata=metadata))
+        self.registry.update_health("merge-1", ServiceStatus.HEALTHY,
+                                    {"kv_usage": 0.5, "new/entry": [], "big": 2 ** 70})
+
+        expected = dict(metadata, kv_usage=0.5, **{"new/entry": [], "big": 2 ** 70})
+        self.assertEqual(self.registry.get_service("merge-1").metadata, expected)
+        self.assertEqual(self.registry.get_metadata("merge-1"), expected)
+
+    def test_pick_least_loaded(self):
+        """Test load reports and least-loaded selection of healthy services"""
+        for i in range(5):
+            self.registry.register_service(ServiceInfo(f"load-{i}", "10.0.11.1", 8000 + i, "llm"))
+        self.registry.register_service(ServiceInfo("load-other", "10.0.11.2", 8000, "embed"))
+
+        results = self.registry.report_loads({"load-0": (8, 4), "load-1": (2, 0), "load-2": (5, 1),
+                                              "load-3": (0, 0), "load-4": (1, 0)})
+        self.assertTrue(all(results.values()))
+        self.assertFalse(self.registry.report_load("nonexistent", 1))
+        self.registry.update_health("load-3", ServiceStatus.UNHEALTHY)
+
+        picked = self.registry.pick_least_loaded("llm", k=3)
+        self.assertEqual([s.service_id for s in picked], ["load-4", "load-1", "load-2"])
+        self.assertEqual(self.registry.get_service_loads("llm")["load-0"], 12)
+
+        # New registrations start idle; deregistration leaves the load index
+        self.registry.register_service(ServiceInfo("load-5", "10.0.11.3", 8000, "llm"))
+        self.assertEqual(self.registry.pick_least_loaded("llm")[0].service_id, "load-5")
+        self.registry.deregister_service("load-5")
+        self.assertNotIn("load-5", self.registry.get_service_loads("llm"))
+        self.assertEqual(self.registry.pick_least_loaded("nonexistent"), [])
+
+    def test_health_history(self):
+        """Test status transitions and load samples are kept in the history stream"""
+        self.registry.history_load_interval = 0.2
+        self.registry.register_service(ServiceInfo("hist-1", "10.0.16.1", 8000, "llm"))
+        self.registry.register_service(ServiceInfo("hist-2", "10.0.16.2", 8000, "llm"))
+        self.registry.update_health("hist-1", ServiceStatus.HEALTHY)  # no transition
+        self.registry.update_health("hist-1", ServiceStatus.UNHEALTHY)
+        self.registry.update_health("hist-1", ServiceStatus.HEALTHY)
+        self.registry.update_health("hist-1", ServiceStatus.UNHEALTHY)
+        self.registry.report_load("hist-2", 1)  # within the sample interval
+        time.sleep(0.25)
+        self.registry.report_loads({"hist-2": (3, 2)})
+
+        history = self.registry.get_health_history("hist-1")
+        self.assertEqual([(e['event'], e.get('previous'), e['status']) for e in history], [
+            ('register', None, 'healthy'), ('status', 'healthy', 'unhealthy'),
+            ('status', 'unhealthy', 'healthy'), ('status', 'healthy', 'unhealthy')])
+        self.assertLessEqual(history[0]['timestamp'], history[-1]['timestamp'])
+        self.assertEqual(len(self.registry.get_health_history("hist-1", count=2)), 2)
+        self.assertEqual(self.registry.get_health_history("hist-1", since=time.time() + 60), [])
+
+        load = self.registry.get_health_history("hist-2", count=1)[0]
+        self.assertEqual((load['event'], load['running'], load['waiting']), ('load', 3, 2))
+        self.assertEqual(len(self.registry.get_health_history("hist-2")), 2)
+
+        self.assertEqual(self.registry.get_flapping_services(min_transitions=3), {"hist-1": 3})
+        self.assertEqual(self.registry.get_flapping_services(service_type="other"), {})
+
+        # Deregistration is recorded and the stream expires later
+        self.registry.deregister_service("hist-1")
+        last = self.registry.get_health_history("hist-1", count=1)[0]
+        self.assertEqual((last['event'], last['previous']), ('deregister', 'unhealthy'))
+        self.assertGreater(self.registry.redis_client.ttl("test:services:history:hist-1"), 0)
+
+        registry = ServiceRegistry(redis_host=REDIS_HOST, redis_port=REDIS_PORT,
+                                   key_prefix='test:', history_maxlen=0)
+        registry.register_service(ServiceInfo("hist-3", "10.0.16.3", 8000, "llm"))
+        registry.update_health("hist-3", ServiceStatus.UNHEALTHY)
+        self.assertEqual(registry.get_health_history("hist-3"), [])
+
+    def test_sweeper_lease(self):
+        """Test only the sweeper lease holder sweeps, with failover on expiry"""
+        self.assertTrue(self.registry.acquire_lease("sweeper", "node-a", 0.3))
+        self.assertFalse(self.registry.acquire_lease("sweeper", "node-b", 0.3))
+        self.assertTrue(self.registry.acquire_lease("sweeper", "node-a", 0.3))  # renewal
+        self.assertFalse(self.registry.release_lease("sweeper", "node-b"))
+        self.assertEqual(self.registry.get_lease_holder("sweeper"), "node-a")
+
+        self.registry.register_service(ServiceInfo("sweep-1", "10.0.17.1", 8000, "llm",
+                                                   last_seen=time.time() - 120))
+        self.assertIsNone(self.registry.sweep_with_lease("node-b", 0.3))
+        self.assertEqual(self.registry.get_service("sweep-1").status, "healthy")
+
+        # node-a dies without releasing; node-b takes over once the lease expires
+        time.sleep(0.4)
+        self.assertEqual(self.registry.sweep_with_lease("node-b", 0.3, cleanup=True), (1, 1))
+        self.assertIsNone(self.registry.get_service("sweep-1"))
+        self.assertEqual(self.registry.get_lease_holder("sweeper"), "node-b")
+        self.assertTrue(self.registry.release_lease("sweeper", "node-b"))
+        self.assertIsNone(self.registry.get_lease_holder("sweeper"))
+
+        # Concurrent sweepers: exactly one sweeps, and the lease is released on stop
+        self.registry.register_service(ServiceInfo("sweep-2", "10.0.17.2", 8000, "llm",
+                                                   last_seen=time.time() - 120))
+        stop_event = threading.Event()
+        sweeps = []
+        sweepers = [threading.Thread(target=self.registry.run_sweeper,
+                                     kwargs={'interval': 0.1, 'holder': f"node-{i}",
+                                             'stop_event': stop_event,
+                                             'on_sweep': lambda *result, i=i: sweeps.append(i)})
+                    for i in range(3)]
+        for sweeper in sweepers:
+            sweeper.start()
+        time.sleep(0.5)
+        stop_event.set()
+        for sweeper in sweepers:
+            sweeper.join()
+        self.assertEqual(len(set(sweeps)), 1)
+        self.assertEqual(self.registry.get_service("sweep-2").status, "unhealthy")
+        self.assertIsNone(self.registry.get_lease_holder("sweeper"))
+
+    def test_watch(self):
+        """Test watch streams a snapshot followed by live events for one type"""
+        self.registry.register_service(ServiceInfo("watch-1", "10.0.13.1", 8000, "llm"))
+
+        def changes():
+            time.sleep(0.3)
+            self.registry.register_service(ServiceInfo("watch-2", "10.0.13.2", 8000, "llm"))
+            self.registry.register_service(ServiceInfo("watch-3", "10.0.13.3", 8000, "other"))
+            self.registry.update_health("watch-1", ServiceStatus.UNHEALTHY)
+            self.registry.deregister_service("watch-2")
+
+        writer = threading.Thread(target=changes)
+        writer.start()
+        events = []
+        for event in self.registry.watch(service_type="llm", include_existing=True, timeout=10):
+            events.append((event['event'], event['service_id'], event.get('status')))
+            if event['event'] == 'deregister':
+                break
+        writer.join()
+
+        self.assertEqual(events, [
+            ('existing', 'watch-1', 'healthy'),
+            ('register', 'watch-2', 'healthy'),
+            ('update_health', 'watch-1', 'unhealthy'),
+            ('deregister', 'watch-2', None),
+        ])
+
+    def test_liveness_keys(self):
+        """Test liveness keys follow registration, heartbeats and deregistration"""
+        registry = ServiceRegistry(
+            redis_host=REDIS_HOST,
+            redis_port=REDIS_PORT,
+            key_prefix='test:',
+            liveness_ttl=30
+        )
+        alive_key = registry._key("services:alive:live-1")
+
+        registry.register_service(ServiceInfo("live-1", "10.0.9.1", 8000, "test"))
+        self.assertGreater(registry.redis_client.pttl(alive_key), 0)
+
+        registry.redis_client.delete(alive_key)
+        self.assertTrue(registry.heartbeat("live-1"))
+        self.assertGreater(registry.redis_client.pttl(alive_key), 0)
+
+        # Only healthy status writes refresh the key
+        registry.redis_client.delete(alive_key)
+        registry.update_health("live-1", ServiceStatus.STOPPING)
+        self.assertFalse(registry.redis_client.exists(alive_key))
+        registry.update_health("live-1", ServiceStatus.HEALTHY)
+        self.assertTrue(registry.redis_client.exists(alive_key))
+
+        self.assertTrue(registry.deregister_service("live-1"))
+        self.assertFalse(registry.redis_client.exists(alive_key))
+
+    def test_liveness_listener(self):
+        """Test the listener marks a service unhealthy when its liveness key expires"""
+        if not self.registry.enable_expiry_notifications():
+            self.skipTest("Redis does not allow enabling keyspace notifications")
+
+        registry = ServiceRegistry(
+            redis_host=REDIS_HOST,
+            redis_port=REDIS_PORT,
+            key_prefix='test:',
+            liveness_ttl=0.5
+        )
+        registry.register_service(ServiceInfo("live-2", "10.0.9.2", 8000, "test"))
+        registry.register_service(ServiceInfo("live-3", "10.0.9.3", 8000, "test",
+                                              status=ServiceStatus.STOPPING.value))
+
+        expired = []
+        stop_event = threading.Event()
+        listener = threading.Thread(target=registry.run_liveness_listener,
+                                    args=(stop_event, expired.extend))
+        listener.start()
+        try:
+            deadline = time.time() + 10
+            while not expired and time.time() < deadline:
+                time.sleep(0.1)
+        finally:
+            stop_event.set()
+            listener.join()
+
+        self.assertEqual(expired, ["live-2"])
+        self.assertEqual(registry.get_service("live-2").status, "unhealthy")
+        self.assertEqual(registry.get_service("live-3").status, "stopping")
+
     def test_metadata_persistence(self):
         """Test that metadata is properly stored and retrieved"""
         metadata = {
@@ -229,6 +625,254 @@ class TestServiceRegistry(unittest.TestCase):
         self.assertEqual(len(retrieved.metadata["tags"]), 2)
 
 
+class TestDiscoveryCache(unittest.TestCase):
+    """Test cases for DiscoveryCache"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.registry = ServiceRegistry(
+            redis_host=REDIS_HOST,
+            redis_port=REDIS_PORT,
+            key_prefix='test:'
+        )
+        self.registry.clear_all()
+        self.registry.register_service(ServiceInfo("cache-1", "10.0.3.1", 8000, "cache"))
+        self.cache = DiscoveryCache(self.registry, resync_interval=60).start()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.cache.stop()
+        self.registry.clear_all()
+
+    def wait_for(self, predicate, timeout=5.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def test_initial_resync(self):
+        """Test the cache is populated before start() returns"""
+        self.assertIsNotNone(self.cache.get_service("cache-1"))
+        self.assertEqual(self.cache.pick("cache").service_id, "cache-1")
+        self.assertIsNone(self.cache.pick("other"))
+
+    def test_events_update_cache(self):
+        """Test register, update_health and deregister events reach the cache"""
+        self.registry.register_service(ServiceInfo("cache-2", "10.0.3.2", 8000, "cache"))
+        self.assertTrue(self.wait_for(lambda: self.cache.get_service("cache-2")))
+
+        self.registry.update_health("cache-2", ServiceStatus.UNHEALTHY)
+        self.assertTrue(self.wait_for(lambda: self.cache.get_service("cache-2") is None))
+
+        self.registry.deregister_service("cache-1")
+        self.assertTrue(self.wait_for(lambda: not self.cache.get_healthy_services()))
+
+    def test_pick_by_key(self):
+        """Test keys stick to one service and only the departed service's keys move"""
+        for i in range(2, 6):
+            self.registry.register_service(ServiceInfo(f"cache-{i}", "10.0.3.1", 8000 + i, "cache"))
+        self.assertTrue(self.wait_for(lambda: len(self.cache.get_healthy_services("cache")) == 5))
+
+        keys = [f"genome-{i}" for i in range(200)]
+        before = {key: self.cache.pick_by_key(key, "cache").service_id for key in keys}
+        self.assertEqual(before, {key: self.cache.pick_by_key(key, "cache").service_id
+                                  for key in keys})
+
+        self.registry.deregister_service("cache-3")
+        self.assertTrue(self.wait_for(lambda: self.cache.get_service("cache-3") is None))
+        for key in keys:
+            after = self.cache.pick_by_key(key, "cache").service_id
+            self.assertNotEqual(after, "cache-3")
+            if before[key] != "cache-3":
+                self.assertEqual(after, before[key])
+        self.assertIsNone(self.cache.pick_by_key("genome-1", "other"))
+
+
+class TestHashRing(unittest.TestCase):
+    """Test cases for HashRing"""
+
+    def test_remap_on_leave_and_join(self):
+        """Test only about 1/N of keys move when a node leaves or joins"""
+        ring = HashRing([f"node-{i}" for i in range(10)])
+        keys = [f"key-{i}" for i in range(5000)]
+        before = {key: ring.get(key) for key in keys}
+
+        ring.remove("node-3")
+        moved = [key for key in keys if ring.get(key) != before[key]]
+        self.assertTrue(all(before[key] == "node-3" for key in moved))
+        self.assertLess(len(moved), len(keys) * 0.2)
+
+        ring.add("node-3")
+        self.assertEqual(before, {key: ring.get(key) for key in keys})
+
+    def test_lookup_helpers(self):
+        """Test empty rings, get_n fallbacks and sync"""
+        ring = HashRing()
+        self.assertIsNone(ring.get("key"))
+        self.assertEqual(ring.get_n("key", 2), [])
+
+        ring.sync(["a", "b", "c"])
+        self.assertEqual(len(ring), 3)
+        fallbacks = ring.get_n("key", 5)
+        self.assertEqual(sorted(fallbacks), ["a", "b", "c"])
+        self.assertEqual(fallbacks[0], ring.get("key"))
+        self.assertEqual(HashRing(["c", "a", "b"]).get("key"), ring.get("key"))
+
+
+class TestShardedServiceRegistry(unittest.TestCase):
+    """Test cases for ShardedServiceRegistry (two databases of the test server)"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.registry = ShardedServiceRegistry(
+            [f"{REDIS_HOST}:{REDIS_PORT}/1", f"{REDIS_HOST}:{REDIS_PORT}/2"],
+            key_prefix='test:'
+        )
+        self.registry.clear_all()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.registry.clear_all()
+        self.registry.close()
+
+    def test_routing_and_fan_out(self):
+        """Test services spread over shards and listing merges all of them"""
+        services = [ServiceInfo(f"shard-{i}", "10.0.14.1", 8000 + i, f"type{i % 2}")
+                    for i in range(40)]
+        self.assertTrue(all(self.registry.register_many(services).values()))
+
+        per_shard = [shard.get_service_count() for shard in self.registry.shards.values()]
+        self.assertEqual(sum(per_shard), 40)
+        self.assertTrue(all(per_shard))
+
+        self.assertEqual(self.registry.get_service_count(), 40)
+        self.assertEqual(self.registry.get_service_count("type1"), 20)
+        self.assertEqual(sorted(self.registry.get_service_types()), ["type0", "type1"])
+        self.assertEqual(len(self.registry.get_healthy_services()), 40)
+        ids = [f"shard-{i}" for i in (7, 3, 99, 12)]
+        self.assertEqual([s.service_id for s in self.registry.get_services(ids)],
+                         ["shard-7", "shard-3", "shard-12"])
+
+        results = self.registry.heartbeat_many(
+            ["shard-1", "shard-2", "missing"],
+            status_changes={"shard-5": ServiceStatus.UNHEALTHY})
+        self.assertEqual(results, {"shard-1": True, "shard-2": True, "missing": False,
+                                   "shard-5": True})
+        self.assertEqual(len(self.registry.list_services(status_filter=ServiceStatus.UNHEALTHY)), 1)
+        self.assertEqual(self.registry.cleanup_unhealthy_services(), 1)
+
+        results = self.registry.deregister_many([f"shard-{i}" for i in range(10)])
+        self.assertEqual(sum(results.values()), 9)
+        self.assertEqual(self.registry.get_service_count(), 30)
+
+    def test_pick_least_loaded_across_shards(self):
+        """Test the global least-loaded services are picked from all shards"""
+        for i in range(6):
+            self.registry.register_service(ServiceInfo(f"shard-load-{i}", "10.0.15.1", 8000, "llm"))
+        self.registry.report_loads({f"shard-load-{i}": (10 - i, 0) for i in range(6)})
+
+        picked = self.registry.pick_least_loaded("llm", k=3)
+        self.assertEqual([s.service_id for s in picked],
+                         ["shard-load-5", "shard-load-4", "shard-load-3"])
+        self.assertEqual(list(self.registry.get_service_loads("llm"))[0], "shard-load-5")
+
+    def test_batch_and_watch(self):
+        """Test sharded batches keep result order and watch merges shard events"""
+        batch = self.registry.batch()
+        for i in range(6):
+            batch.register_service(ServiceInfo(f"shard-batch-{i}", "10.0.16.1", 8000, "batch"))
+        batch.heartbeat("missing").heartbeat("shard-batch-0")
+        self.assertEqual(batch.execute(), [True] * 6 + [False, True])
+
+        def changes():
+            time.sleep(0.3)
+            self.registry.deregister_many([f"shard-batch-{i}" for i in range(6)])
+
+        writer = threading.Thread(target=changes)
+        writer.start()
+        deregistered = set()
+        for event in self.registry.watch(service_type="batch", timeout=10):
+            deregistered.add(event['service_id'])
+            if len(deregistered) == 6:
+                break
+        writer.join()
+        self.assertEqual(deregistered, {f"shard-batch-{i}" for i in range(6)})
+
+
+class TestAsyncServiceRegistry(unittest.IsolatedAsyncioTestCase):
+    """Test cases for AsyncServiceRegistry"""
+
+    async def asyncSetUp(self):
+        """Set up test fixtures"""
+        self.registry = AsyncServiceRegistry(
+            redis_host=REDIS_HOST,
+            redis_port=REDIS_PORT,
+            key_prefix='test:'
+        )
+        ServiceRegistry(redis_host=REDIS_HOST, redis_port=REDIS_PORT,
+                        key_prefix='test:').clear_all()
+
+    async def asyncTearDown(self):
+        """Clean up after each test"""
+        ServiceRegistry(redis_host=REDIS_HOST, redis_port=REDIS_PORT,
+                        key_prefix='test:').clear_all()
+        await self.registry.close()
+
+    async def test_register_and_list(self):
+        """Test async registration and listing"""
+        for i in range(3):
+            self.assertTrue(await self.registry.register_service(
+                ServiceInfo(f"async-{i}", "10.0.2.1", 8000 + i, "async")))
+
+        services = await self.registry.list_services(service_type="async")
+        self.assertEqual(len(services), 3)
+        self.assertEqual(await self.registry.get_service_count(), 3)
+
+        healthy = await self.registry.get_healthy_services(timeout_seconds=30)
+        self.assertEqual(len(healthy), 3)
+
+    async def test_concurrent_heartbeats(self):
+        """Test concurrent heartbeats are coalesced and reported per service"""
+        for i in range(20):
+            await self.registry.register_service(
+                ServiceInfo(f"async-hb-{i}", "10.0.2.2", 8000, "async",
+                            last_seen=time.time() - 60))
+
+        results = await asyncio.gather(
+            *(self.registry.heartbeat(f"async-hb-{i}") for i in range(20)),
+            self.registry.heartbeat("missing")
+        )
+        self.assertEqual(results, [True] * 20 + [False])
+
+        stale = await self.registry.get_stale_services(timeout_seconds=30)
+        self.assertEqual(stale, [])
+
+    async def test_deregister_and_update_health(self):
+        """Test async deregistration and health update"""
+        await self.registry.register_service(ServiceInfo("async-x", "10.0.2.3", 8000, "async"))
+
+        self.assertTrue(await self.registry.update_health(
+            "async-x", ServiceStatus.UNHEALTHY, metadata={"error": "oom"}))
+        service = await self.registry.get_service("async-x")
+        self.assertEqual(service.status, ServiceStatus.UNHEALTHY.value)
+        self.assertEqual(service.metadata["error"], "oom")
+
+        self.assertTrue(await self.registry.deregister_service("async-x"))
+        self.assertIsNone(await self.registry.get_service("async-x"))
+
+    async def test_pick_least_loaded(self):
+        """Test async load reports and least-loaded selection"""
+        await self.registry.register_service(ServiceInfo("async-load-1", "10.0.12.1", 8000, "llm"))
+        await self.registry.register_service(ServiceInfo("async-load-2", "10.0.12.2", 8000, "llm"))
+        self.assertTrue(await self.registry.report_load("async-load-1", 4, 2))
+        self.assertTrue(await self.registry.report_load("async-load-2", 1))
+
+        picked = await self.registry.pick_least_loaded("llm", k=2)
+        self.assertEqual([s.service_id for s in picked], ["async-load-2", "async-load-1"])
+
+
 def main():
     """Run tests"""
     global REDIS_HOST, REDIS_PORT